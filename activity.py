@@ -0,0 +1,73 @@
+"""
+Typed activity codes.
+
+Dataroma reports each trade as a string — "Buy", "Add 12.50%",
+"Reduce 3.10%", "Sell 100.00%" — and every consumer used to re-scan it
+with str.startswith. Ingest now parses it once into two columns stored in
+data/ next to the original string:
+
+    action       int8 Action code (BUY, ADD, REDUCE, SELL, SELL_ALL)
+    action_pct   the percentage in the string (NaN for a plain Buy)
+
+Files written before these columns existed are parsed on load by
+ensure_actions, so readers can rely on them either way.
+"""
+
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+
+class Action(IntEnum):
+    BUY = 1
+    ADD = 2
+    REDUCE = 3
+    SELL = 4        # partial sell
+    SELL_ALL = 5    # "Sell 100.00%": closes the position
+
+
+ACTION_COLUMNS = ["action", "action_pct"]
+_VERBS = {"Buy": Action.BUY, "Add": Action.ADD, "Reduce": Action.REDUCE, "Sell": Action.SELL}
+
+
+def parse_actions(activity: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(action codes as int8, pct as float) for a Series of activity strings."""
+    parts = activity.str.extract(r"^\s*(\w+)\s*([\d.]+)?")
+    verb = parts[0].map(_VERBS)
+    if verb.isna().any():
+        bad = activity[verb.isna()].iloc[0]
+        raise ValueError(f"Unrecognised activity: {bad!r}")
+    pct = parts[1].astype(float).to_numpy()
+    action = verb.to_numpy(np.int8)
+    action[(action == Action.SELL) & (pct >= 100)] = Action.SELL_ALL
+    return action, pct
+
+
+def add_actions(df: pd.DataFrame, activity_col: str = "activity") -> pd.DataFrame:
+    """Copy of *df* with action / action_pct parsed from *activity_col*, placed after it."""
+    action, pct = parse_actions(df[activity_col])
+    df = df.drop(columns=ACTION_COLUMNS, errors="ignore")
+    at = df.columns.get_loc(activity_col) + 1
+    df.insert(at, "action", action)
+    df.insert(at + 1, "action_pct", pct)
+    return df
+
+
+def ensure_actions(df: pd.DataFrame) -> pd.DataFrame:
+    """*df* with action columns: parsed if missing, else just narrowed to int8."""
+    if "action" not in df.columns:
+        return add_actions(df)
+    if df["action"].dtype != np.int8:
+        df = df.assign(action=df["action"].astype(np.int8))
+    return df
+
+
+def is_buy(action) -> np.ndarray:
+    """Buy or Add."""
+    return np.asarray(action) <= Action.ADD
+
+
+def is_close(action) -> np.ndarray:
+    """Full sell-out."""
+    return np.asarray(action) == Action.SELL_ALL
@@ -1,19 +1,36 @@
 """
-Analyze a single super-investor's track record. Run from this directory.
+Analyze super-investors' track records. Run from this directory.
+
+    python analyze_investor.py "Li Lu"
+    python analyze_investor.py "Li Lu" "Mohnish Pabrai" --after-year 2015
+    python analyze_investor.py --all --output-dir reports/
+
+Stats for every named investor are loaded once and their overview metrics
+computed together; reports are printed in the order given, or written one
+file per investor with --output-dir. --output writes the overview table
+itself (see export.py).
 """
 
 import argparse
+import io
 import re
 import shutil
 import warnings
+from contextlib import contextmanager, redirect_stdout
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
 
-from dataroma import get_investor_activity
-from yahoo import add_yahoo_quarter_price_stats_batch
+import export
+from activity import add_actions
+from batch_metrics import _median, after_year_rows, metrics_batch
+from incremental import save_stats
+from price_summary import PRICES_DIR, is_custom, mode_arg, scenario_stats
+from rank_investors import year_range
+from tickers import normalize_tickers
 from trade_stats import compute_stats
+from trade_store import TradeStore
 
 warnings.filterwarnings("ignore")
 
@@ -49,10 +66,11 @@ def _drop_invalid_costs(df: pd.DataFrame, min_cost: float = 0.1) -> pd.DataFrame
     return df[mask]
 
 
-def load_or_fetch_stats(investor_name: str) -> pd.DataFrame:
+def load_or_fetch_stats(investor_name: str, quiet: bool = False) -> pd.DataFrame:
     stats_cache = STATS_DIR / f"{investor_name}.csv"
     if stats_cache.exists():
-        print(f"  {DIM}Reading cached stats ({stats_cache.name}){RESET}")
+        if not quiet:
+            print(f"  {DIM}Reading cached stats ({stats_cache.name}){RESET}")
         return _drop_invalid_costs(pd.read_csv(stats_cache))
 
     data_cache = DATA_DIR / f"{investor_name}.csv"
@@ -60,27 +78,56 @@ def load_or_fetch_stats(investor_name: str) -> pd.DataFrame:
         print(f"  {DIM}Reading cached data ({data_cache.name}){RESET}")
         df = pd.read_csv(data_cache)
     else:
+        from checkpoint import Checkpoint
+        from dataroma import get_investor_activity
+        from yahoo import add_yahoo_quarter_price_stats_batch
+
+        checkpoint = Checkpoint(investor_name)
         print(f"  Fetching activity for {BOLD}{investor_name}{RESET} …")
-        df = get_investor_activity(investor_name)
-        df["stock"] = df["stock"].str.replace(".", "-", regex=False).str.upper()
+        df = get_investor_activity(investor_name, checkpoint=checkpoint)
+        df["stock"] = normalize_tickers(df["stock"])
         print(f"  Enriching with Yahoo price data …")
-        df = add_yahoo_quarter_price_stats_batch(df)
-        df = df.dropna()
+        df = add_yahoo_quarter_price_stats_batch(df, checkpoint=checkpoint, summary_dir=PRICES_DIR)
+        df = add_actions(df.dropna())
         DATA_DIR.mkdir(exist_ok=True)
         df.to_csv(data_cache, index=False)
+        checkpoint.clear()
         print(f"  {DIM}Saved data ({data_cache.name}){RESET}")
 
     print(f"  Computing per-trade stats …")
     stats = compute_stats(df)
-    STATS_DIR.mkdir(exist_ok=True)
-    stats.to_csv(stats_cache, index=False)
+    save_stats(investor_name, df, stats, STATS_DIR, data_cache)
     print(f"  {DIM}Cached stats ({stats_cache.name}){RESET}\n")
     return _drop_invalid_costs(stats)
 
 
+def load_investors(names: list[str], mode: str, refresh: bool = False) -> dict[str, pd.DataFrame]:
+    """Raw stats per investor, in *names* order, for *mode*.
+
+    Cached stats are read (or fetched and computed) once per investor;
+    custom modes go through scenario_stats. Investors that cannot be
+    loaded are reported and left out.
+    """
+    frames = {}
+    for name in names:
+        if refresh and (STATS_DIR / f"{name}.csv").exists():
+            (STATS_DIR / f"{name}.csv").unlink()
+        if is_custom(mode):
+            try:
+                frames[name] = _drop_invalid_costs(scenario_stats(name, mode, refresh=refresh))
+            except FileNotFoundError:
+                print(f"  {RED}Scenario {mode} needs data/{name}.csv — fetch it first.{RESET}\n")
+        else:
+            try:
+                frames[name] = load_or_fetch_stats(name, quiet=len(names) > 1)
+            except Exception as e:
+                print(f"  {RED}Could not load {name}: {type(e).__name__}: {e}{RESET}\n")
+    return frames
+
+
 def enrich_stats(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    for mode in ["avg", "worst", "best"]:
+    for mode in [c.removeprefix("irr_") for c in df.columns if c.startswith("irr_")]:
         df[f"return_{mode}"] = (1 + df[f"irr_{mode}"]) ** df.holding_period - 1
         ret_col = f"ret_{mode}"
         if ret_col in df.columns:
@@ -92,6 +139,18 @@ def enrich_stats(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def prepare_stats(stats: pd.DataFrame, mode: str, after_year: int | None = None) -> pd.DataFrame:
+    """Drop unusable rows, apply the --after-year filter and enrich for display."""
+    stats = stats.replace([np.inf, -np.inf], np.nan)
+    stats = stats.dropna(subset=[f"irr_{mode}"])
+    if after_year is not None:
+        buy_year = stats["period"].str.extract(r"(\d{4})", expand=False).astype(int)
+        stats = stats.loc[buy_year > after_year].copy()
+        if stats.empty:
+            return stats
+    return enrich_stats(stats)
+
+
 def _strip_ansi(s: str) -> str:
     return re.sub(r"\033\[[0-9;]*m", "", s)
 
@@ -120,7 +179,7 @@ def print_section(title: str):
     print(f"\n  {BOLD}{CYAN}{title}{RESET}")
 
 
-def print_overview(investor_name: str, stats: pd.DataFrame, mode: str):
+def compute_overview(stats: pd.DataFrame, mode: str) -> dict:
     n = len(stats)
     winners = stats[stats[f"irr_{mode}"] > 0]
     losers = stats[stats[f"irr_{mode}"] <= 0]
@@ -142,11 +201,128 @@ def print_overview(investor_name: str, stats: pd.DataFrame, mode: str):
     expectancy = (len(w_irr) / n * w_irr.mean() - len(l_irr) / n * abs(l_irr.mean())) if n else 0
     downside_std = irr_col[irr_col < 0].std()
     sortino = median_irr / downside_std if downside_std and downside_std > 0 else float("nan")
-    median_return = stats[f"return_{mode}"].median()
-    median_return_w = winners[f"return_{mode}"].median() if len(winners) else float("nan")
-    median_return_l = losers[f"return_{mode}"].median() if len(losers) else float("nan")
-    median_holding = stats.holding_period.median()
-    still_holding = stats.holding.sum() if "holding" in stats.columns else 0
+    return {
+        "trades": n,
+        "winners": len(winners),
+        "losers": len(losers),
+        "still_holding": stats.holding.sum() if "holding" in stats.columns else 0,
+        "win_rate": win_rate,
+        "weighted_return": weighted_return,
+        "cap_on_winners": cap_on_winners,
+        "median_holding": stats.holding_period.median(),
+        "median_irr": median_irr,
+        "weighted_irr": weighted_irr,
+        "expectancy": expectancy,
+        "profit_factor": profit_factor,
+        "sortino": sortino,
+        "median_return": stats[f"return_{mode}"].median(),
+        "median_return_w": winners[f"return_{mode}"].median() if len(winners) else float("nan"),
+        "median_return_l": losers[f"return_{mode}"].median() if len(losers) else float("nan"),
+    }
+
+
+def _overview_rows(columns, mode: str, idx: np.ndarray, keep: np.ndarray) -> pd.DataFrame:
+    """compute_overview for each row of a (rows, trades) selection of trades.
+
+    *columns* is prepare_stats output, or a TradeStore's columns. Row i
+    holds trades ``idx[i]`` where ``keep[i]`` is set; the rest is padding.
+    All rows go through batch_metrics together.
+    """
+    def pick(a):
+        return np.where(keep, a[idx], np.nan)
+
+    irr = pick(np.asarray(columns[f"irr_{mode}"], float))
+    ret = pick(np.asarray(columns[f"return_{mode}"], float))
+    holding_period = np.asarray(columns["holding_period"], float)[idx]
+    m = metrics_batch(
+        irr,
+        pick(np.asarray(columns[f"cost_{mode}"], float)),
+        pick(np.asarray(columns[f"dollar_return_{mode}"], float)),
+        holding_period,
+        metrics=["Win_Rate", "Weighted_Return", "Pct_Capital_Winning_Stocks", "Median_IRR",
+                 "Weighted_IRR", "Expectancy", "Profit_Factor", "Sortino", "Median_Return"],
+    )
+    holding = np.asarray(columns["holding"], bool)[idx] if "holding" in columns else np.zeros(idx.shape, bool)
+    winners, losers = (irr > 0).sum(axis=1), (irr <= 0).sum(axis=1)
+    return pd.DataFrame({
+        "trades": keep.sum(axis=1),
+        "winners": winners,
+        "losers": losers,
+        "still_holding": (keep & holding).sum(axis=1),
+        "win_rate": m["Win_Rate"],
+        "weighted_return": m["Weighted_Return"],
+        "cap_on_winners": m["Pct_Capital_Winning_Stocks"],
+        "median_holding": _median(np.where(keep, holding_period, np.nan)),
+        "median_irr": m["Median_IRR"],
+        "weighted_irr": m["Weighted_IRR"],
+        # compute_overview leaves expectancy undefined without both winners and losers
+        "expectancy": np.where((winners > 0) & (losers > 0), m["Expectancy"], np.nan),
+        "profit_factor": m["Profit_Factor"],
+        "sortino": m["Sortino"],
+        "median_return": m["Median_Return"],
+        "median_return_w": _median(np.where(irr > 0, ret, np.nan)),
+        "median_return_l": _median(np.where(irr <= 0, ret, np.nan)),
+    })
+
+
+def sweep_overview(stats: pd.DataFrame, mode: str, years: list[int]) -> pd.DataFrame:
+    """compute_overview for every --after-year cutoff in *years* in one pass.
+
+    *stats* is prepare_stats output without a cutoff. Trades are sorted by
+    buy year once; each cutoff keeps a suffix of them and all cutoffs go
+    through batch_metrics together. Cutoffs with no trades are left out.
+    """
+    order, keep = after_year_rows(
+        stats["period"].str.extract(r"(\d{4})", expand=False).astype(int).to_numpy(), years)
+    out = _overview_rows(stats, mode, np.broadcast_to(order, keep.shape), keep)
+    out.insert(0, "after_year", years)
+    return out[out["trades"] > 0].reset_index(drop=True)
+
+
+def overview_batch(store: TradeStore, mode: str) -> pd.DataFrame:
+    """compute_overview for every investor in *store* in one pass, indexed by investor.
+
+    *store* holds prepare_stats output; each investor's trades are one
+    padded row of its arrays. Investors without trades are left out.
+    """
+    idx, keep = store.padded()
+    if not keep.any():
+        return pd.DataFrame(index=pd.Index([], name="investor"))
+    out = _overview_rows(store.columns, mode, idx, keep).set_axis(pd.Index(store.names, name="investor"))
+    return out[out["trades"] > 0]
+
+
+def print_sweep(investor_name: str, sweep: pd.DataFrame, mode: str):
+    print(f"\n  {BOLD}{'═' * 70}{RESET}")
+    print(f"  {BOLD}{investor_name}{RESET}   {DIM}(mode={mode}, by --after-year cutoff: "
+          f"stocks first bought after the year){RESET}")
+    print(f"  {BOLD}{'═' * 70}{RESET}")
+    cols = [("win_rate", "WR"), ("weighted_return", "W.Ret"), ("cap_on_winners", "Cap%Win"),
+            ("median_return", "Med.Ret"), ("median_irr", "Med.IRR"), ("weighted_irr", "W.IRR"),
+            ("expectancy", "Expect.")]
+    hdr = f"{'After':>5s} │ {'Trades':>6s}" + "".join(f" │ {label:>8s}" for _, label in cols) + f" │ {'PF':>6s} │ {'Sortino':>7s}"
+    print(f"  {DIM}{hdr}{RESET}")
+    print(f"  {DIM}{'─' * len(hdr)}{RESET}")
+    for _, row in sweep.iterrows():
+        line = f"{int(row['after_year']):>5d} │ {int(row['trades']):>6d}"
+        for key, _ in cols:
+            line += f" │ {color_pct(row[key])}"
+        pf, so = row["profit_factor"], row["sortino"]
+        line += f" │ {DIM}{'n/a':>6s}{RESET}" if pd.isna(pf) else f" │ {pf:>5.2f}x"
+        line += f" │ {DIM}{'n/a':>7s}{RESET}" if pd.isna(so) else f" │ {so:>+7.2f}"
+        print(f"  {line}")
+    print()
+
+
+def print_overview(investor_name: str, stats: pd.DataFrame, mode: str, ov: dict | None = None):
+    """*ov* is this investor's overview_batch row when already computed."""
+    if ov is None:
+        ov = compute_overview(stats, mode)
+    n, still_holding = ov["trades"], ov["still_holding"]
+    win_rate, weighted_return, cap_on_winners = ov["win_rate"], ov["weighted_return"], ov["cap_on_winners"]
+    median_holding, median_irr, weighted_irr = ov["median_holding"], ov["median_irr"], ov["weighted_irr"]
+    expectancy, profit_factor, sortino = ov["expectancy"], ov["profit_factor"], ov["sortino"]
+    median_return, median_return_w, median_return_l = ov["median_return"], ov["median_return_w"], ov["median_return_l"]
     desc = stats[f"return_{mode}"].describe()
     print(f"\n  {BOLD}{'═' * 70}{RESET}")
     print(f"  {BOLD}{investor_name}{RESET}   {DIM}(mode={mode}){RESET}")
@@ -154,7 +330,7 @@ def print_overview(investor_name: str, stats: pd.DataFrame, mode: str):
     left = [
         f"  {BOLD}{CYAN}OVERVIEW{RESET}",
         f"  {DIM}{'─' * 50}{RESET}",
-        f"  Trades:       {BOLD}{n}{RESET}   ({len(winners)} W, {len(losers)} L, {still_holding:.0f} holding)",
+        f"  Trades:       {BOLD}{n}{RESET}   ({ov['winners']} W, {ov['losers']} L, {still_holding:.0f} holding)",
         f"  Win Rate:     {color_pct(win_rate)}",
         f"  W. Return:    {color_pct(weighted_return)}  {DIM}(capital-weighted){RESET}",
         f"  Cap% Winners: {color_pct(cap_on_winners)}  {DIM}(% capital on wins){RESET}",
@@ -225,43 +401,104 @@ def print_biggest_positions(stats: pd.DataFrame, mode: str, k: int):
     _print_trade_table(stats.nlargest(k, "cost_avg_pct"), mode)
 
 
+def print_report(investor_name: str, stats: pd.DataFrame, mode: str, k: int,
+                 after_year: int | None = None, ov: dict | None = None):
+    if stats.empty:
+        if after_year is not None:
+            print(f"  {DIM}No trades with first buy after {after_year}.{RESET}\n")
+        else:
+            print(f"  {DIM}No valid trades for {investor_name}.{RESET}\n")
+        return
+    if after_year is not None:
+        print(f"  {DIM}Filtered to {len(stats)} trades (first buy after {after_year}){RESET}\n")
+    print_overview(investor_name, stats, mode, ov)
+    print_top_trades(stats, mode, k)
+    print_flop_trades(stats, mode, k)
+    print_biggest_positions(stats, mode, k)
+    print()
+
+
+def print_sweep_report(investor_name: str, stats: pd.DataFrame, mode: str, years: list[int]):
+    sweep = sweep_overview(stats, mode, years) if not stats.empty else stats
+    if sweep.empty:
+        print(f"  {DIM}No trades with first buy after {years[0]}.{RESET}\n")
+        return
+    print_sweep(investor_name, sweep, mode)
+
+
+@contextmanager
+def _report_to(path: Path | None):
+    """Send prints to *path* (colours stripped) instead of the terminal; no-op for None."""
+    if path is None:
+        yield
+        return
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        yield
+    path.write_text(_strip_ansi(buf.getvalue()))
+
+
 def main():
-    parser = argparse.ArgumentParser(description="Analyze a super-investor's track record.")
-    parser.add_argument("investor", nargs="?", help="Investor name")
-    parser.add_argument("--mode", default="avg", choices=["avg", "best", "worst"])
+    parser = argparse.ArgumentParser(description="Analyze super-investors' track records.")
+    parser.add_argument("investors", nargs="*", metavar="investor", help="Investor names")
+    parser.add_argument("--all", action="store_true", help="Every investor cached in stats/ "
+                        "(data/ for custom modes)")
+    parser.add_argument("--mode", default="avg", type=mode_arg, metavar="MODE",
+                        help="avg, best, worst, or BUY/SELL price points recomputed from prices/ "
+                             "(e.g. p25/p75, mean/mean, last/last)")
     parser.add_argument("--topk", "-k", type=int, default=5)
     parser.add_argument("--list", "-l", action="store_true")
     parser.add_argument("--refresh", action="store_true")
     parser.add_argument("--after-year", type=int, default=None, metavar="YEAR",
                         help="Use only stocks first bought after this year (e.g. 2015 => 2016+)")
+    parser.add_argument("--sweep-after-year", type=year_range, default=None, metavar="START:END",
+                        help="Overview metrics at every --after-year cutoff from START to END")
+    parser.add_argument("--output-dir", "-o", type=Path, default=None, metavar="DIR",
+                        help="Write each report to DIR/<investor>.txt instead of the terminal")
+    export.add_arguments(parser)
     args = parser.parse_args()
+    fmt = export.resolve(parser, args)
     if args.list:
         print(f"\n  {BOLD}Available investors (cached in stats/):{RESET}\n")
         for f in sorted(STATS_DIR.glob("*.csv")):
             print(f"    {f.stem}")
         print()
         return
-    if not args.investor:
-        parser.error("investor name is required (or use --list)")
-    if args.refresh and (STATS_DIR / f"{args.investor}.csv").exists():
-        (STATS_DIR / f"{args.investor}.csv").unlink()
-    stats = load_or_fetch_stats(args.investor)
-    stats.replace([np.inf, -np.inf], np.nan, inplace=True)
-    stats = stats.dropna(subset=[f"irr_{args.mode}"])
-    if args.after_year is not None:
-        buy_year = stats["period"].str.extract(r"(\d{4})", expand=False).astype(int)
-        stats = stats.loc[buy_year > args.after_year].copy()
-        if stats.empty:
-            print(f"  {DIM}No trades with first buy after {args.after_year}.{RESET}\n")
-            return
-        print(f"  {DIM}Filtered to {len(stats)} trades (first buy after {args.after_year}){RESET}\n")
-    stats = enrich_stats(stats)
-    print_overview(args.investor, stats, args.mode)
-    print_top_trades(stats, args.mode, args.topk)
-    print_flop_trades(stats, args.mode, args.topk)
-    print_biggest_positions(stats, args.mode, args.topk)
-    print()
-
+    names = list(args.investors)
+    if args.all:
+        source = DATA_DIR if is_custom(args.mode) else STATS_DIR
+        names += [p.stem for p in sorted(source.glob("*.csv")) if p.stem not in names]
+    if not names:
+        parser.error("investor name is required (or use --all / --list)")
+    if args.output_dir:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    raw = load_investors(names, args.mode, args.refresh)
+    after_year = None if args.sweep_after_year else args.after_year
+    store = TradeStore.from_frames({name: prepare_stats(stats, args.mode, after_year)
+                                    for name, stats in raw.items()})
+    del raw
+    if fmt:
+        if args.sweep_after_year:
+            sweeps = {name: sweep_overview(stats, args.mode, args.sweep_after_year)
+                      for name, stats in store.items() if not stats.empty}
+            table = pd.concat(sweeps, names=["investor"]).reset_index(0) if sweeps else pd.DataFrame()
+        else:
+            table = overview_batch(store, args.mode).reset_index()
+        n = export.write(table, args.output, fmt)
+        print(f"  {DIM}Wrote {n} overview rows to {args.output}{RESET}\n")
+        return
+    overviews = overview_batch(store, args.mode).to_dict("index") if not args.sweep_after_year else {}
+
+    for name, stats in store.items():
+        path = args.output_dir / f"{name}.txt" if args.output_dir else None
+        with _report_to(path):
+            if args.sweep_after_year:
+                print_sweep_report(name, stats, args.mode, args.sweep_after_year)
+            else:
+                print_report(name, stats, args.mode, args.topk, after_year, overviews.get(name))
+    if args.output_dir:
+        print(f"  {GREEN}Wrote {len(store.names)} reports to {args.output_dir}/{RESET}\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+"""
+rank_investors metrics for many resamples of one investor at once.
+
+Inputs are 2-D arrays shaped (draws, trades): each row is one simulated
+or resampled set of trades. NaN marks a trade that is absent from that row
+(padding, a non-finite IRR), so rows may hold different numbers of trades.
+Every metric returns one value per row and matches the corresponding
+compute_* function in rank_investors.py when given a single row.
+"""
+
+import warnings
+from functools import cached_property
+
+import numpy as np
+
+
+def _median(a):
+    if not np.isnan(a).any():
+        return np.median(a, axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmedian(a, axis=1)
+
+
+def _safe_div(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / den, np.nan)
+
+
+class Rows:
+    """Shared intermediates, computed on first use so one metric costs only what it needs."""
+
+    def __init__(self, irr, cost, ret, holding_period):
+        self.irr_raw = irr
+        self.cost_raw = cost
+        self.ret_raw = ret
+        self.holding_period = np.broadcast_to(holding_period, irr.shape)
+
+    @cached_property
+    def valid(self):
+        return ~np.isnan(self.irr_raw) & ~np.isnan(self.cost_raw) & ~np.isnan(self.ret_raw)
+
+    @cached_property
+    def all_valid(self):
+        return bool(self.valid.all())
+
+    @cached_property
+    def irr(self):
+        return self.irr_raw if self.all_valid else np.where(self.valid, self.irr_raw, np.nan)
+
+    @cached_property
+    def cost(self):
+        return self.cost_raw if self.all_valid else np.where(self.valid, self.cost_raw, 0.0)
+
+    @cached_property
+    def n(self):
+        return self.valid.sum(axis=1)
+
+    @cached_property
+    def total_cost(self):
+        return self.cost.sum(axis=1)
+
+    @cached_property
+    def pnl(self):
+        ret = self.ret_raw if self.all_valid else np.where(self.valid, self.ret_raw, 0.0)
+        return self.cost * ret
+
+    @cached_property
+    def total_return(self):
+        return (1 + self.irr) ** self.holding_period - 1
+
+    @cached_property
+    def win(self):
+        return self.valid & (self.irr > 0)
+
+    @cached_property
+    def lose(self):
+        return self.valid & (self.irr <= 0)
+
+    @cached_property
+    def win_rate(self):
+        return _safe_div(self.win.sum(axis=1), self.n)
+
+    @cached_property
+    def median_irr(self):
+        return _median(self.irr)
+
+    @cached_property
+    def median_return(self):
+        return _median(self.total_return)
+
+    @cached_property
+    def weighted_return(self):
+        return _safe_div(self.pnl.sum(axis=1), self.total_cost)
+
+    @cached_property
+    def pct_capital_winning(self):
+        return _safe_div(np.where(self.win, self.cost, 0).sum(axis=1), self.total_cost)
+
+
+def _expectancy(r: Rows):
+    n_win, n_lose = r.win.sum(axis=1), r.lose.sum(axis=1)
+    avg_win = np.where(n_win > 0, _safe_div(np.where(r.win, r.irr, 0).sum(axis=1), n_win), 0.0)
+    avg_loss = np.where(n_lose > 0, np.abs(_safe_div(np.where(r.lose, r.irr, 0).sum(axis=1), n_lose)), 0.0)
+    return r.win_rate * avg_win - (1 - r.win_rate) * avg_loss
+
+
+def _sortino(r: Rows):
+    downside = np.where(r.valid & (r.irr < 0), r.irr, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        downside_std = np.nanstd(downside, axis=1, ddof=1)
+    return np.where(downside_std > 0, _safe_div(r.median_irr, downside_std), np.nan)
+
+
+def _profit_factor(r: Rows):
+    return _safe_div(r.pnl.clip(min=0).sum(axis=1), np.abs(r.pnl.clip(max=0).sum(axis=1)))
+
+
+def _safety_and_returns(r: Rows):
+    pct, wret = r.pct_capital_winning, r.weighted_return
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = 2 / (1 / pct + 1 / wret)
+    return np.where((wret > 0) & (pct > 0), harmonic, np.nan)
+
+
+BATCH_METRICS = {
+    "Num_Trades": lambda r: r.n,
+    "Win_Rate": lambda r: r.win_rate,
+    "Pct_Capital_Winning_Stocks": lambda r: r.pct_capital_winning,
+    "Median_Return": lambda r: r.median_return,
+    "Weighted_Return": lambda r: r.weighted_return,
+    "Median_IRR": lambda r: r.median_irr,
+    "Weighted_IRR": lambda r: _safe_div((r.cost * np.where(r.valid, r.irr, 0)).sum(axis=1), r.total_cost),
+    "Profit_Factor": _profit_factor,
+    "Expectancy": _expectancy,
+    "Sortino": _sortino,
+    "Median_Return_Winners": lambda r: _median(np.where(r.total_return >= 0, r.total_return, np.nan)),
+    "Median_Return_Losers": lambda r: _median(np.where(r.total_return < 0, r.total_return, np.nan)),
+    "Sizing_Skill": lambda r: r.weighted_return - r.median_return,
+    "Safety_And_Returns": _safety_and_returns,
+}
+
+
+def after_year_rows(buy_year: np.ndarray, cutoffs) -> tuple[np.ndarray, np.ndarray]:
+    """Sort trades by buy year once; one row per --after-year cutoff.
+
+    Returns (*order*, *keep*): *order* sorts the trades by buy year and
+    ``keep[i]`` marks the suffix of sorted trades bought after ``cutoffs[i]``.
+    Mask trade arrays with ``np.where(keep, a[order], np.nan)`` to get the
+    (cutoffs, trades) input metrics_batch takes.
+    """
+    order = np.argsort(buy_year, kind="stable")
+    starts = np.searchsorted(buy_year[order], np.asarray(cutoffs), side="right")
+    keep = np.arange(len(buy_year))[None, :] >= starts[:, None]
+    return order, keep
+
+
+def metrics_batch(irr, cost, ret, holding_period, metrics=None) -> dict[str, np.ndarray]:
+    """*metrics* (default: all of BATCH_METRICS) for each row of (draws, trades) arrays.
+
+    *holding_period* may be 1-D (one value per trade) or 2-D like *irr*.
+    """
+    rows = Rows(irr, cost, ret, holding_period)
+    return {m: BATCH_METRICS[m](rows) for m in (metrics or BATCH_METRICS)}
@@ -0,0 +1,427 @@
+"""
+Offline benchmark suite for the pipeline's hot paths.
+
+Runs against the bundled data.zip / stats.zip (extracted to a temp dir) and
+synthetic inputs; nothing touches the network. Reports wall time (min and
+median over repeats) and peak traced memory, and can save results as a
+baseline or compare against one.
+
+    python bench.py                                  # run everything
+    python bench.py --only xirr screener             # substring filter
+    python bench.py --save bench_baseline.json
+    python bench.py --compare bench_baseline.json    # exit 1 on regression
+    python bench.py --html-dir saved_pages/          # parse real saved pages
+    python bench.py --data-dir synthetic/data        # scale test (synth_data.py)
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+warnings.filterwarnings("ignore")
+
+ROOT = Path(__file__).parent
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+ROWS_PER_PAGE = 100
+
+
+# ── fixtures ─────────────────────────────────────────────────────────────
+
+class Fixtures:
+    """Lazily extracted datasets and synthetic inputs shared by benchmarks."""
+
+    def __init__(self, html_dir: Path | None = None, investors: int = 10, seed: int = 0,
+                 data_dir: Path | None = None):
+        self._tmp = tempfile.TemporaryDirectory(prefix="bench_")
+        self.root = Path(self._tmp.name)
+        self.html_dir = html_dir
+        self._data_dir = data_dir
+        self.investors = investors
+        self.rng = np.random.default_rng(seed)
+        self._cache = {}
+
+    def close(self):
+        self._tmp.cleanup()
+
+    def _extract(self, archive: str, subdir: str) -> Path:
+        target = self.root / subdir
+        if not target.exists():
+            with zipfile.ZipFile(ROOT / archive) as zf:
+                zf.extractall(self.root)
+        return target
+
+    @property
+    def data_dir(self) -> Path:
+        if self._data_dir is not None:
+            return self._data_dir
+        return self._extract("data.zip", "data")
+
+    @property
+    def stats_dir(self) -> Path:
+        return self._extract("stats.zip", "stats")
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def data_frames(self) -> dict[str, pd.DataFrame]:
+        return self._cached("data", lambda: {
+            p.stem: pd.read_csv(p) for p in sorted(self.data_dir.glob("*.csv"))
+        })
+
+    @property
+    def stats_frames(self) -> dict[str, pd.DataFrame]:
+        return self._cached("stats", lambda: {
+            p.stem: pd.read_csv(p) for p in sorted(self.stats_dir.glob("*.csv"))
+        })
+
+    def largest_investors(self) -> dict[str, pd.DataFrame]:
+        frames = self.data_frames
+        names = sorted(frames, key=lambda n: len(frames[n]), reverse=True)[: self.investors]
+        return {n: frames[n] for n in names}
+
+    @property
+    def last_prices(self) -> dict[str, float]:
+        """Stand-in for live prices: each ticker's most recent quarterly median."""
+        def build():
+            latest = {}
+            for df in self.data_frames.values():
+                for tk, price in zip(df["stock"], df["price_p50"]):
+                    latest.setdefault(tk, price)  # rows are newest first
+            return latest
+        return self._cached("prices", build)
+
+    @property
+    def html_pages(self) -> list[bytes]:
+        def build():
+            if self.html_dir is not None:
+                return [p.read_bytes() for p in sorted(self.html_dir.iterdir()) if p.is_file()]
+            pages = []
+            for df in self.largest_investors().values():
+                for start in range(0, len(df), ROWS_PER_PAGE):
+                    pages.append(render_activity_page(df.iloc[start:start + ROWS_PER_PAGE]).encode())
+            return pages
+        return self._cached("html", build)
+
+
+def render_activity_page(df: pd.DataFrame) -> str:
+    """Render activity rows in the m_activity.php table layout parse_activity reads."""
+    out = ['<html><body><table id="grid"><tbody>']
+    quarter = None
+    for row in df.itertuples(index=False):
+        if row.quarter != quarter:
+            quarter = row.quarter
+            q, year = quarter.split()
+            out.append(f'<tr class="q_chg"><td colspan="5"><b>{q}</b> &nbsp;<b>{year}</b></td></tr>')
+        side = "buy" if row.activity.startswith(("Buy", "Add")) else "sell"
+        out.append(
+            f'<tr><td class="hist"><a href="#"><img src="h.png"></a></td>'
+            f'<td class="stock"><a href="/m/stock.php?sym={row.stock}">{row.stock}'
+            f'<span> - {row.stock} Inc.</span></a></td>'
+            f'<td class="{side}">{row.activity}</td>'
+            f'<td class="{side}">{int(row.shares):,}</td>'
+            f'<td>{row.pct_change}</td></tr>'
+        )
+    out.append("</tbody></table></body></html>")
+    return "\n".join(out)
+
+
+def synthetic_prices(rng: np.random.Generator, tickers: int, years: int) -> dict[str, pd.Series]:
+    days = pd.bdate_range(end="2025-12-31", periods=252 * years)
+    log_ret = rng.normal(0.0003, 0.02, size=(tickers, len(days)))
+    paths = 50 * np.exp(np.cumsum(log_ret, axis=1))
+    return {f"T{i:04d}": pd.Series(paths[i], index=days) for i in range(tickers)}
+
+
+def synthetic_cash_flows(rng: np.random.Generator, n: int) -> list[list]:
+    t0 = datetime(2005, 2, 15)
+    flows = []
+    for _ in range(n):
+        k = int(rng.integers(2, 20))
+        quarters = np.sort(rng.choice(80, size=k, replace=False))
+        amounts = rng.lognormal(2, 1, size=k)
+        signs = np.where(np.arange(k) < max(1, k // 2), -1.0, 1.0)
+        flows.append([(t0 + timedelta(days=int(q) * 91), float(a * s))
+                      for q, a, s in zip(quarters, amounts, signs)])
+    return flows
+
+
+# ── registry ─────────────────────────────────────────────────────────────
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[Fixtures], Callable[[], object]]
+    requires: tuple[str, ...] = field(default_factory=tuple)
+
+    def missing(self) -> list[str]:
+        return [m for m in self.requires if importlib.util.find_spec(m) is None]
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(name: str, requires: tuple[str, ...] = ()):
+    """Register *setup(fixtures) -> run()*; only run() is timed."""
+    def deco(setup):
+        BENCHMARKS.append(Benchmark(name, setup, requires))
+        return setup
+    return deco
+
+
+@benchmark("dataroma.parse_activity", requires=("bs4",))
+def _bench_parse_activity(fx: Fixtures):
+    from bs4 import BeautifulSoup
+    from dataroma import parse_activity
+    soups = [BeautifulSoup(page, "html.parser") for page in fx.html_pages]
+    return lambda: [parse_activity(soup) for soup in soups]
+
+
+@benchmark("dataroma.parse_page (soup + parse)", requires=("bs4",))
+def _bench_parse_page(fx: Fixtures):
+    from bs4 import BeautifulSoup
+    from dataroma import parse_activity
+    pages = fx.html_pages
+    return lambda: [parse_activity(BeautifulSoup(page, "html.parser")) for page in pages]
+
+
+@benchmark("yahoo.quarter_price_stats (50 tickers x 20y)")
+def _bench_quarter_stats(fx: Fixtures):
+    from yahoo import quarter_price_stats
+    prices = synthetic_prices(fx.rng, tickers=50, years=20)
+    periods = pd.period_range("2006Q1", "2025Q4", freq="Q")
+    return lambda: [quarter_price_stats(p, tk, periods) for tk, p in prices.items()]
+
+
+@benchmark("metrics.compute_xirr (2000 trades)")
+def _bench_xirr(fx: Fixtures):
+    from metrics import compute_xirr
+    flows = synthetic_cash_flows(fx.rng, 2000)
+    return lambda: [compute_xirr(f) for f in flows]
+
+
+@benchmark("trade_stats.compute_stats (largest investors)")
+def _bench_compute_stats(fx: Fixtures):
+    from trade_stats import compute_stats
+    frames = fx.largest_investors()
+    price_fn = fx.last_prices.get
+    return lambda: [compute_stats(df, price_fn=price_fn) for df in frames.values()]
+
+
+@benchmark("montecarlo.simulate (largest investors, 1000 draws)")
+def _bench_montecarlo(fx: Fixtures):
+    import montecarlo
+    from trade_stats import episode_table
+    now = datetime.now()
+    flows = [montecarlo.build_flows(*episode_table(df), fx.last_prices, now)
+             for df in fx.largest_investors().values()]
+    return lambda: [montecarlo.simulate(f, 1000, np.random.default_rng(0)) for f in flows]
+
+
+@benchmark("portfolio.path_metrics (data.zip, all investors)")
+def _bench_portfolio(fx: Fixtures):
+    import portfolio
+    frames = fx.data_frames
+    prices_dir = fx.root / "no_prices"   # data/ p50 fallback only
+
+    def run():
+        levels, data_prices = portfolio.load_levels(frames)
+        return portfolio.path_metrics(portfolio.build_panel(levels, data_prices, prices_dir))
+    return run
+
+
+@benchmark("holdings_cube.build (data.zip)")
+def _bench_cube_build(fx: Fixtures):
+    import holdings_cube
+    data_dir, out_dir = fx.data_dir, fx.root / "cube"
+    return lambda: holdings_cube.build(data_dir, out_dir)
+
+
+@benchmark("holdings_cube open + holders / crowded (data.zip)")
+def _bench_cube_query(fx: Fixtures):
+    import holdings_cube
+    out_dir = fx.root / "cube_query"
+    holdings_cube.build(fx.data_dir, out_dir)
+
+    def run():
+        cube = holdings_cube.HoldingsCube(out_dir)
+        return cube.holders("AAPL"), cube.crowded(top=20)
+    return run
+
+
+@benchmark("trade_store.TradeStore.load (stats.zip)")
+def _bench_load_stats(fx: Fixtures):
+    from trade_store import TradeStore
+    stats_dir = fx.stats_dir
+    return lambda: TradeStore.load(stats_dir)
+
+
+@benchmark("rank_investors.build_investor_stats (stats.zip)")
+def _bench_rank(fx: Fixtures):
+    from rank_investors import build_investor_stats
+    from trade_store import TradeStore
+    store = TradeStore.from_frames(fx.stats_frames)
+    return lambda: build_investor_stats(mode="avg", frames=store)
+
+
+@benchmark("screener phase 1: load holdings")
+def _bench_screener_load(fx: Fixtures):
+    from screener import _load_all_holdings
+    data_dir = fx.data_dir
+    names = sorted(p.stem for p in data_dir.glob("*.csv"))
+    return lambda: _load_all_holdings(names, data_dir)
+
+
+@benchmark("screener phase 3: apply prices + filter")
+def _bench_screener_filter(fx: Fixtures):
+    from screener import _apply_prices_and_filter, _holdings_for_investor
+    holdings = {n: _holdings_for_investor(df) for n, df in fx.data_frames.items()}
+    holdings = {n: h for n, h in holdings.items() if not h.empty}
+    prices = {tk: p * 0.7 for tk, p in fx.last_prices.items()}
+    return lambda: _apply_prices_and_filter(holdings, prices, None, 1.0, 0.0)
+
+
+@benchmark("screener phase 4: rank hits")
+def _bench_screener_rank(fx: Fixtures):
+    from screener import _apply_prices_and_filter, _holdings_for_investor, rank_hits
+    holdings = {n: _holdings_for_investor(df) for n, df in fx.data_frames.items()}
+    holdings = {n: h for n, h in holdings.items() if not h.empty}
+    prices = {tk: p * 0.7 for tk, p in fx.last_prices.items()}
+    hits = _apply_prices_and_filter(holdings, prices, None, 1.0, 0.0)
+    return lambda: rank_hits(hits, holdings, "count")
+
+
+# ── runner ───────────────────────────────────────────────────────────────
+
+def measure(run: Callable[[], object], repeat: int, max_seconds: float) -> dict:
+    run()  # warm-up: imports, caches
+    times = []
+    budget_end = time.perf_counter() + max_seconds
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+        if time.perf_counter() > budget_end:
+            break
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "runs": len(times),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def _fmt_ratio(ratio: float, threshold: float) -> str:
+    txt = f"{ratio:.2f}x"
+    if ratio > threshold:
+        return f"{RED}{txt:>7s}{RESET}"
+    if ratio < 1 / threshold:
+        return f"{GREEN}{txt:>7s}{RESET}"
+    return f"{DIM}{txt:>7s}{RESET}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--only", nargs="+", metavar="PATTERN", help="Only benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Timed runs per benchmark (default 3)")
+    parser.add_argument("--max-seconds", type=float, default=20,
+                        help="Stop repeating a benchmark after this many seconds (default 20)")
+    parser.add_argument("--investors", type=int, default=10,
+                        help="Largest investors used for compute_stats and HTML fixtures (default 10)")
+    parser.add_argument("--html-dir", type=Path, help="Directory of saved m_activity.php pages to parse")
+    parser.add_argument("--data-dir", type=Path,
+                        help="Use this data/ directory (e.g. from synth_data.py) instead of data.zip")
+    parser.add_argument("--save", type=Path, metavar="PATH", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Median-time ratio that counts as a regression (default 1.2)")
+    args = parser.parse_args()
+
+    selected = [b for b in BENCHMARKS
+                if not args.only or any(p.lower() in b.name.lower() for p in args.only)]
+    baseline = json.loads(args.compare.read_text())["benchmarks"] if args.compare else {}
+
+    print(f"\n  {BOLD}{CYAN}BENCHMARKS{RESET}  {len(selected)} selected  ·  repeat {args.repeat}")
+    if args.compare:
+        print(f"  {DIM}Baseline: {args.compare}  (regression > {args.threshold:.2f}x){RESET}")
+    print()
+
+    NAME_W = 48
+    hdr = f"{'Benchmark':<{NAME_W}s} │ {'min':>9s} │ {'median':>9s} │ {'peak MB':>8s}"
+    if baseline:
+        hdr += f" │ {'time':>7s} │ {'mem':>7s}"
+    print(f"  {DIM}{hdr}{RESET}")
+    print(f"  {DIM}{'─' * len(hdr)}{RESET}")
+
+    fx = Fixtures(html_dir=args.html_dir, investors=args.investors, data_dir=args.data_dir)
+    results = {}
+    regressions = []
+    try:
+        for bench in selected:
+            missing = bench.missing()
+            if missing:
+                print(f"  {bench.name:<{NAME_W}s} │ {DIM}skipped (needs {', '.join(missing)}){RESET}")
+                continue
+            res = measure(bench.setup(fx), args.repeat, args.max_seconds)
+            results[bench.name] = res
+            line = (f"  {bench.name:<{NAME_W}s} │ {res['min_s'] * 1000:>7.1f}ms │ "
+                    f"{res['median_s'] * 1000:>7.1f}ms │ {res['peak_mb']:>8.1f}")
+            base = baseline.get(bench.name)
+            if base:
+                t_ratio = res["median_s"] / base["median_s"]
+                m_ratio = res["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+                line += f" │ {_fmt_ratio(t_ratio, args.threshold)} │ {_fmt_ratio(m_ratio, args.threshold)}"
+                if t_ratio > args.threshold or m_ratio > args.threshold:
+                    regressions.append(bench.name)
+            elif baseline:
+                line += f" │ {DIM}{'new':>7s}{RESET} │ {DIM}{'':>7s}{RESET}"
+            print(line)
+    finally:
+        fx.close()
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "benchmarks": results,
+        }, indent=2))
+        print(f"\n  {DIM}Saved baseline → {args.save}{RESET}")
+
+    print()
+    if regressions:
+        print(f"  {RED}{len(regressions)} regression(s): {', '.join(regressions)}{RESET}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
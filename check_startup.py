@@ -0,0 +1,103 @@
+"""
+Startup-time regression check for the CLIs.
+
+Imports each CLI module under ``python -X importtime`` and fails (exit 1)
+if a network/scraping library is pulled in at import time or the module's
+cumulative import time exceeds the budget. Run from the project root:
+
+    python check_startup.py
+    python check_startup.py --budget-ms 800 --runs 5
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+CLI_MODULES = [
+    "analyze_investor",
+    "rank_investors",
+    "show_stats",
+    "compute_all_stats",
+    "screener",
+    "server",
+]
+
+# Only needed once a fetch actually happens.
+LAZY_MODULES = ["yfinance", "bs4", "requests"]
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds for every module *module* pulls in."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def check_module(module: str, budget_ms: float, runs: int) -> tuple[bool, float, list[str]]:
+    best = float("inf")
+    loaded = []
+    for _ in range(runs):
+        times = import_times(module)
+        best = min(best, times.get(module, 0) / 1000)
+        loaded = [m for m in LAZY_MODULES if m in times]
+    return not loaded and best <= budget_ms, best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check CLI import time and lazy imports.")
+    parser.add_argument("--budget-ms", type=float, default=1000,
+                        help="Max cumulative import time per CLI module (default 1000)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per module; best is kept (default 3)")
+    parser.add_argument("--only", nargs="+", metavar="MODULE", help="Only these modules")
+    args = parser.parse_args()
+
+    modules = args.only if args.only else CLI_MODULES
+    print(f"\n  {BOLD}{CYAN}STARTUP CHECK{RESET}  budget {args.budget_ms:.0f} ms  ·  best of {args.runs}\n")
+
+    failed = 0
+    for module in modules:
+        try:
+            ok, ms, loaded = check_module(module, args.budget_ms, args.runs)
+        except RuntimeError as e:
+            failed += 1
+            print(f"  {RED}✗{RESET} {module:<20s} {RED}import failed: {e}{RESET}")
+            continue
+        note = f"  {RED}eagerly imports {', '.join(loaded)}{RESET}" if loaded else ""
+        if ok:
+            print(f"  {GREEN}✓{RESET} {module:<20s} {ms:>7.0f} ms{note}")
+        else:
+            failed += 1
+            over = f"  {RED}over budget{RESET}" if ms > args.budget_ms else ""
+            print(f"  {RED}✗{RESET} {module:<20s} {ms:>7.0f} ms{over}{note}")
+
+    print()
+    if failed:
+        print(f"  {RED}{failed} of {len(modules)} modules failed{RESET}\n")
+        sys.exit(1)
+    print(f"  {DIM}All {len(modules)} modules within budget{RESET}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Staging area for resumable fetches.
+
+While an investor is being fetched, every parsed Dataroma page and every
+ticker's quarterly price stats are written to data/.staging/<investor>/
+as soon as they complete. A rerun after a failure picks up from there
+instead of starting again at page 1. The staging directory is removed
+once the investor's data/ file has been written; staging older than
+*max_age* is discarded, since Dataroma pages shift when a new quarter
+is published.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+STAGING_DIR = Path(__file__).parent / "data" / ".staging"
+MAX_AGE_HOURS = 24
+
+
+def _atomic_write(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _read_staged(path: Path) -> pd.DataFrame:
+    # Only empty cells are missing, so tickers like "NA" survive the round trip.
+    return pd.read_csv(path, keep_default_na=False, na_values=[""], float_precision="round_trip")
+
+
+def _safe_name(ticker: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+
+
+class Checkpoint:
+    def __init__(self, investor_name: str, root: Path = STAGING_DIR,
+                 max_age_hours: float = MAX_AGE_HOURS):
+        self.investor_name = investor_name
+        self.dir = root / investor_name
+        self.pages_dir = self.dir / "pages"
+        self.tickers_dir = self.dir / "tickers"
+        self._meta_path = self.dir / "meta.json"
+        self._lock = threading.Lock()
+        meta = self._read_meta()
+        if meta and time.time() - meta.get("created", 0) > max_age_hours * 3600:
+            self.clear()
+            meta = {}
+        self.meta = meta or {"created": time.time(), "pages_complete": False}
+
+    def _read_meta(self) -> dict:
+        try:
+            return json.loads(self._meta_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self._meta_path, lambda p: p.write_text(json.dumps(self.meta)))
+
+    # ── activity pages ──────────────────────────────────────────────────
+
+    def load_pages(self) -> list[pd.DataFrame]:
+        """Consecutive staged pages from page 1 (stops at the first gap)."""
+        pages = []
+        page = 1
+        while (path := self.pages_dir / f"{page:04d}.csv").exists():
+            pages.append(_read_staged(path))
+            page += 1
+        return pages
+
+    @property
+    def pages_complete(self) -> bool:
+        return self.meta.get("pages_complete", False)
+
+    @property
+    def first_page_signature(self) -> str | None:
+        return self.meta.get("first_page_signature")
+
+    def save_page(self, page: int, df: pd.DataFrame, signature: str | None = None):
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self.pages_dir / f"{page:04d}.csv", lambda p: df.to_csv(p, index=False))
+        if page == 1:
+            with self._lock:
+                self.meta["first_page_signature"] = signature
+                self._write_meta()
+
+    def mark_pages_complete(self):
+        with self._lock:
+            self.meta["pages_complete"] = True
+            self._write_meta()
+
+    # ── per-ticker quarterly price stats ────────────────────────────────
+
+    def load_ticker(self, ticker: str) -> pd.DataFrame | None:
+        path = self.tickers_dir / f"{_safe_name(ticker)}.csv"
+        if not path.exists():
+            return None
+        stats = _read_staged(path)
+        stats["period"] = pd.PeriodIndex(stats["period"], freq="Q")
+        return stats
+
+    def save_ticker(self, ticker: str, stats: pd.DataFrame):
+        self.tickers_dir.mkdir(parents=True, exist_ok=True)
+        if not self._meta_path.exists():
+            with self._lock:
+                self._write_meta()
+        path = self.tickers_dir / f"{_safe_name(ticker)}.csv"
+        _atomic_write(path, lambda p: stats.to_csv(p, index=False))
+
+    def staged_tickers(self) -> int:
+        return len(list(self.tickers_dir.glob("*.csv"))) if self.tickers_dir.exists() else 0
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
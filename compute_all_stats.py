@@ -1,6 +1,15 @@
 """
 Compute per-trade stats from the enriched data in data/.
 Reads each investor CSV from data/, runs compute_stats(), saves to stats/.
+
+Investors whose data/ file changed since their stats were written are
+updated incrementally (see incremental.py): only tickers with new rows
+and open positions are recomputed. --refresh recomputes everything.
+
+--mark-to-market is the daily valuation refresh: data/ is not read for
+changes, the current prices of every open position across all investors
+are fetched in bulk, and only those rows' IRR, return and holding period
+are recomputed.
 """
 
 import argparse
@@ -10,7 +19,12 @@ from pathlib import Path
 
 import pandas as pd
 
+import profiling
+from incremental import (is_current, load_manifest, mark_to_market, open_positions,
+                         read_stats, save_stats, update_stats)
+from profiling import span
 from trade_stats import compute_stats
+from providers import PriceProvider, get_provider
 
 warnings.filterwarnings("ignore")
 
@@ -25,34 +39,95 @@ CYAN  = "\033[36m"
 RESET = "\033[0m"
 
 
-def compute_one(investor_name: str) -> bool:
+def compute_one(investor_name: str, full: bool = False, provider: PriceProvider | None = None) -> bool:
     data_path = DATA_DIR / f"{investor_name}.csv"
+    stats_path = STATS_DIR / f"{investor_name}.csv"
     if not data_path.exists():
         print(f"    {RED}No data file (run fetch_all_data first){RESET}")
         return False
     try:
-        df = pd.read_csv(data_path)
+        with span("csv.read", investor_name):
+            df = pd.read_csv(data_path)
         if df.empty:
             print(f"    {RED}Empty data file{RESET}")
             return False
-        stats = compute_stats(df)
+        price_fn = provider.current_price if provider is not None else None
+        manifest = None if full or not stats_path.exists() else load_manifest(investor_name, STATS_DIR)
+        if manifest is not None:
+            with span("compute_stats.incremental", investor_name):
+                stats, recomputed = update_stats(df, read_stats(stats_path), manifest, price_fn=price_fn)
+            note = f"  {DIM}({recomputed}/{df.stock.nunique()} tickers recomputed){RESET}"
+        else:
+            with span("compute_stats", investor_name):
+                stats = compute_stats(df, price_fn=price_fn)
+            note = ""
         if stats.empty:
             print(f"    {RED}No valid trades after computation{RESET}")
             return False
-        STATS_DIR.mkdir(exist_ok=True)
-        stats.to_csv(STATS_DIR / f"{investor_name}.csv", index=False)
-        print(f"    {GREEN}Saved {len(stats)} trades{RESET}")
+        with span("csv.write", investor_name):
+            save_stats(investor_name, df, stats, STATS_DIR, data_path)
+        print(f"    {GREEN}Saved {len(stats)} trades{RESET}{note}")
         return True
     except Exception as e:
         print(f"    {RED}Error: {e}{RESET}")
         return False
 
 
+def mark_all_to_market(names: list[str], provider: PriceProvider):
+    """Revalue the open positions in stats/ at current prices, fetched in bulk."""
+    print(f"\n  {BOLD}{CYAN}Mark-to-market for {len(names)} investors{RESET}")
+    t0 = time.time()
+    todo, stale = {}, []
+    for name in names:
+        data_path, stats_path = DATA_DIR / f"{name}.csv", STATS_DIR / f"{name}.csv"
+        manifest = load_manifest(name, STATS_DIR) if stats_path.exists() else None
+        if manifest is None or not data_path.exists() or not is_current(name, data_path, STATS_DIR):
+            stale.append(name)
+        elif tickers := open_positions(manifest):
+            todo[name] = tickers
+    if stale:
+        print(f"  {DIM}Skipping {len(stale)} without up-to-date stats (run without --mark-to-market): "
+              f"{', '.join(stale[:5])}{' …' if len(stale) > 5 else ''}{RESET}")
+
+    tickers = sorted({t for ts in todo.values() for t in ts})
+    print(f"  {DIM}Fetching current prices for {len(tickers)} open tickers …{RESET}")
+    with span("current_prices"):
+        prices = provider.latest(tickers)
+    missing = len(tickers) - len(prices)
+    print(f"  {DIM}Got {len(prices)} prices{f', {missing} unavailable (left unchanged)' if missing else ''}{RESET}\n")
+
+    revalued = 0
+    for i, (name, tickers) in enumerate(todo.items(), 1):
+        data_path, stats_path = DATA_DIR / f"{name}.csv", STATS_DIR / f"{name}.csv"
+        with span("investor", name):
+            df = pd.read_csv(data_path)
+            stats, n = mark_to_market(df[df["stock"].isin(tickers)], read_stats(stats_path), prices)
+            if n:
+                stats.to_csv(stats_path, index=False)
+        revalued += n
+        print(f"  [{i:>2}/{len(todo)}] {name}  {DIM}{n} open positions revalued{RESET}")
+
+    print(f"\n  {BOLD}{'═' * 50}{RESET}")
+    print(f"  {GREEN}Done in {time.time() - t0:.1f}s{RESET}  {revalued} positions across {len(todo)} investors\n")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Compute stats from cached data.")
-    parser.add_argument("--refresh", action="store_true", help="Recompute all (ignore existing stats)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Recompute all from scratch (ignore existing stats and manifests)")
+    parser.add_argument("--mark-to-market", action="store_true",
+                        help="Only revalue open positions at current prices (bulk fetch, no full recompute)")
     parser.add_argument("--only", nargs="+", metavar="NAME", help="Only these investors")
+    parser.add_argument("--prices", type=Path, metavar="DIR",
+                        help="Value open positions from DIR/<TICKER>.csv|.parquet instead of Yahoo")
+    parser.add_argument("--profile", action="store_true", help="Time each phase and write a report")
+    parser.add_argument("--profile-out", type=Path, default=Path("profile_compute.json"), metavar="PATH",
+                        help="Timing report path, .json or .csv (default profile_compute.json)")
+    parser.add_argument("--cprofile", type=Path, metavar="PATH",
+                        help="Also dump cProfile stats here (implies --profile)")
     args = parser.parse_args()
+    if args.profile or args.cprofile:
+        profiling.enable(cprofile=args.cprofile is not None)
 
     available = [p.stem for p in sorted(DATA_DIR.glob("*.csv"))] if DATA_DIR.exists() else []
     if not available:
@@ -60,6 +135,14 @@ def main():
         return
 
     names = args.only if args.only else available
+    provider = get_provider(args.prices)
+    if args.mark_to_market:
+        mark_all_to_market(names, provider)
+        if profiling.is_enabled():
+            profiling.print_summary(top_phases=("investor",))
+            profiling.write_report(args.profile_out)
+            print(f"  {DIM}Timing report → {args.profile_out}{RESET}\n")
+        return
     total = len(names)
     skipped = success = failed = 0
 
@@ -68,13 +151,16 @@ def main():
     t0 = time.time()
 
     for i, name in enumerate(names, 1):
-        stats_path = STATS_DIR / f"{name}.csv"
-        if stats_path.exists() and not args.refresh:
+        data_path, stats_path = DATA_DIR / f"{name}.csv", STATS_DIR / f"{name}.csv"
+        if not args.refresh and stats_path.exists() and (
+                not data_path.exists() or is_current(name, data_path, STATS_DIR)):
             skipped += 1
             print(f"  [{i:>2}/{total}] {DIM}{name} — cached{RESET}")
             continue
         print(f"  [{i:>2}/{total}] {BOLD}{name}{RESET}")
-        if compute_one(name):
+        with span("investor", name):
+            ok = profiling.profiled(compute_one, name, args.refresh, provider)
+        if ok:
             success += 1
         else:
             failed += 1
@@ -83,6 +169,15 @@ def main():
     print(f"\n  {BOLD}{'═' * 50}{RESET}")
     print(f"  {GREEN}Done in {elapsed:.0f}s{RESET}  {success} computed  ·  {skipped} cached  ·  {failed} failed\n")
 
+    if profiling.is_enabled():
+        profiling.print_summary(top_phases=("investor", "compute.current_price"))
+        profiling.write_report(args.profile_out)
+        print(f"  {DIM}Timing report → {args.profile_out}{RESET}")
+        if args.cprofile:
+            profiling.dump_cprofile(args.cprofile)
+            print(f"  {DIM}cProfile stats → {args.cprofile}  (python -m pstats {args.cprofile}){RESET}")
+        print()
+
 
 if __name__ == "__main__":
     main()
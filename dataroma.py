@@ -1,8 +1,7 @@
 import pandas as pd
-from bs4 import BeautifulSoup
-import requests
 
 from investors import investors
+from profiling import span
 
 
 def parse_activity(soup):
@@ -76,38 +75,66 @@ def parse_activity(soup):
     return pd.DataFrame(data, columns=["quarter", "stock", "activity", "shares", "pct_change"])
 
 
+def signature(df_activity):
+    """Identifies a parsed page; Dataroma serves page 1 again past the last page."""
+    return df_activity.head(3).to_string()
+
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
 
 def get_investor_activity_one_page(investor_id, page=1):
+    # Imported here so parsing saved pages and cached-data paths stay network-free.
+    import requests
+    from bs4 import BeautifulSoup
+
     url = f"https://www.dataroma.com/m/m_activity.php?m={investor_id}&typ=a&L={page}&o=a"
     response = requests.get(url, headers=HEADERS)
     response.raise_for_status()
     return BeautifulSoup(response.content, "html.parser")
 
 
-def get_investor_activity(investor_name):
+def get_investor_activity(investor_name, fetch_page=None, checkpoint=None):
+    """All activity pages for one investor, stitched in page order.
+
+    *fetch_page(investor_id, page)* returns a page's soup; defaults to a
+    direct request (the fetch pipeline passes a rate-limited one).
+    With a *checkpoint* (see checkpoint.py), each parsed page is staged as
+    it arrives and a rerun continues after the last staged page.
+    """
+    if fetch_page is None:
+        fetch_page = get_investor_activity_one_page
     investor_id = investors[investor_name]
     page = 1
     dfs = []
     stop = False
     first_page_signature = None
 
+    if checkpoint is not None:
+        dfs = checkpoint.load_pages()
+        if dfs:
+            first_page_signature = checkpoint.first_page_signature
+            page = len(dfs) + 1
+            stop = checkpoint.pages_complete
+            print(f"  Resuming after {len(dfs)} staged page(s)"
+                  f"{' (complete)' if stop else ''}")
+
     while not stop:
         print(f"  Fetching page {page}...", end="", flush=True)
-        activity_soup = get_investor_activity_one_page(investor_id, page=page)
-        df_activity = parse_activity(activity_soup)
+        with span("dataroma.page", f"{investor_name} p{page}"):
+            activity_soup = fetch_page(investor_id, page)
+        with span("dataroma.parse", f"{investor_name} p{page}"):
+            df_activity = parse_activity(activity_soup)
 
         if df_activity.empty:
             stop = True
             print(" (no more data)")
+            if checkpoint is not None:
+                checkpoint.mark_pages_complete()
         else:
-            if len(df_activity) >= 3:
-                page_signature = df_activity.head(3).to_string()
-            else:
-                page_signature = df_activity.to_string()
+            page_signature = signature(df_activity)
             if page == 1:
                 first_page_signature = page_signature
                 dfs.append(df_activity)
@@ -115,9 +142,13 @@ def get_investor_activity(investor_name):
             elif page_signature == first_page_signature:
                 stop = True
                 print(" (loop detected, no more pages)")
+                if checkpoint is not None:
+                    checkpoint.mark_pages_complete()
             else:
                 dfs.append(df_activity)
                 print(f" ✓ ({len(df_activity)} activities)")
+            if checkpoint is not None and not stop:
+                checkpoint.save_page(page, df_activity, page_signature)
         page += 1
 
     total_df = pd.concat(dfs, ignore_index=True)
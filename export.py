@@ -0,0 +1,63 @@
+"""
+Machine-readable output for rank_investors, analyze_investor, show_stats
+and screener.
+
+With --output PATH a command writes the DataFrame behind its table
+instead of printing it: no colours, no per-row formatting, every column
+and row rather than the top k. The format is --format, else PATH's suffix:
+
+    json      JSON Lines, one record per row
+    csv       CSV with a header row
+    parquet   Parquet (needs pyarrow or fastparquet, checked before any work)
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+
+FORMATS = ["json", "csv", "parquet"]
+SUFFIXES = {".json": "json", ".jsonl": "json", ".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}
+PARQUET_ENGINES = ["pyarrow", "fastparquet"]
+
+
+def has_parquet_engine() -> bool:
+    """Whether pandas can read and write Parquet here (optional dependency)."""
+    return any(importlib.util.find_spec(m) is not None for m in PARQUET_ENGINES)
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("machine-readable output")
+    group.add_argument("--format", choices=FORMATS, default=None,
+                       help="Output format (default: from the --output suffix)")
+    group.add_argument("--output", "-O", type=Path, default=None, metavar="PATH",
+                       help="Write the result table to PATH instead of printing it")
+
+
+def resolve(parser, args) -> str | None:
+    """The export format *args* ask for, or None to print the usual tables."""
+    if args.output is None:
+        if args.format is not None:
+            parser.error("--format needs --output PATH")
+        return None
+    fmt = args.format or SUFFIXES.get(args.output.suffix.lower())
+    if fmt is None:
+        parser.error(f"cannot tell the format of {args.output}; pass --format {{{','.join(FORMATS)}}}")
+    if fmt == "parquet" and not has_parquet_engine():
+        parser.error("parquet output needs pyarrow (pip install pyarrow); or use -O with .csv or .json")
+    return fmt
+
+
+def write(df: pd.DataFrame, path: Path, fmt: str) -> int:
+    """Write *df* (index dropped) to *path* as *fmt*; returns the row count."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = df.reset_index(drop=True)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records", lines=True, date_format="iso")
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+    return len(df)
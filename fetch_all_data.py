@@ -1,7 +1,9 @@
 """
 Fetch activity data for all investors and enrich with Yahoo price data.
 Saves raw enriched CSVs to data/ (one per investor).
-Does NOT compute stats — use compute_all_stats.py for that.
+Does NOT compute stats — use compute_all_stats.py for that — unless run
+with --pipeline, which streams each investor through fetch → enrich →
+compute_stats as soon as the previous stage hands it over.
 """
 
 import argparse
@@ -11,13 +13,28 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from threading import Lock
 
-from dataroma import get_investor_activity
-from yahoo import add_yahoo_quarter_price_stats_batch
+import pandas as pd
+
+import profiling
+from activity import add_actions
+from checkpoint import STAGING_DIR, Checkpoint
+from dataroma import get_investor_activity, get_investor_activity_one_page
+from holdings_cube import build as build_holdings_cube
+from incremental import load_manifest, read_stats, save_stats, update_stats
+from providers import PriceProvider, get_provider
+from yahoo import UNPRICEABLE, add_yahoo_quarter_price_stats_batch
 from investors import investors
+from pipeline import Pipeline, Stage
+from price_summary import PRICES_DIR
+from profiling import span
+from scheduler import HostLimits, HostScheduler
+from tickers import normalize_tickers
+from trade_stats import compute_stats
 
 warnings.filterwarnings("ignore")
 
-DATA_DIR = Path(__file__).parent / "data"
+DATA_DIR  = Path(__file__).parent / "data"
+STATS_DIR = Path(__file__).parent / "stats"
 
 BOLD  = "\033[1m"
 DIM   = "\033[2m"
@@ -27,7 +44,6 @@ CYAN  = "\033[36m"
 RESET = "\033[0m"
 
 _print_lock = Lock()
-_yahoo_lock = Lock()
 
 
 def _log(msg: str):
@@ -35,32 +51,161 @@ def _log(msg: str):
         print(msg)
 
 
-def fetch_one(investor_name: str) -> tuple[str, bool, str]:
+def default_hosts(args) -> dict[str, HostLimits]:
+    return {
+        "dataroma": HostLimits(rate=args.dataroma_rate, concurrency=args.dataroma_concurrency),
+        "yahoo": HostLimits(rate=args.yahoo_rate, concurrency=args.yahoo_concurrency, burst=4),
+    }
+
+
+def fetch_one(investor_name: str, sched: HostScheduler, provider: PriceProvider) -> tuple[str, bool, str]:
     """Returns (name, success, message)."""
-    try:
-        df = get_investor_activity(investor_name)
-        df["stock"] = df["stock"].str.replace(".", "-", regex=False).str.upper()
-        with _yahoo_lock:
-            df = add_yahoo_quarter_price_stats_batch(df)
-        df = df.dropna()
-        if df.empty:
-            return investor_name, False, "No usable data after cleaning"
-        DATA_DIR.mkdir(exist_ok=True)
+    with span("investor", investor_name):
+        return profiling.profiled(_fetch_one, investor_name, sched, provider)
+
+
+def scrape(investor_name: str, sched: HostScheduler) -> pd.DataFrame:
+    def fetch_page(investor_id, page):
+        return sched.call("dataroma", get_investor_activity_one_page, investor_id, page)
+
+    with span("dataroma.activity", investor_name):
+        df = get_investor_activity(investor_name, fetch_page=fetch_page,
+                                   checkpoint=Checkpoint(investor_name))
+    df["stock"] = normalize_tickers(df["stock"])
+    return df
+
+
+def enrich_and_save(investor_name: str, df: pd.DataFrame, provider: PriceProvider) -> pd.DataFrame:
+    """Add quarterly price stats, drop unusable rows and write data/<name>.csv.
+
+    Each ticker's full quarterly price summary goes to prices/ as well.
+
+    Staged pages and ticker stats for *investor_name* are removed once the
+    file is written; on failure they stay for the next run to resume from.
+    """
+    checkpoint = Checkpoint(investor_name)
+    with span("yahoo.enrich", investor_name):
+        df = add_yahoo_quarter_price_stats_batch(df, submit=provider.submitter(), checkpoint=checkpoint,
+                                                 summary_dir=PRICES_DIR, provider=provider)
+    df = df.dropna()
+    if df.empty:
+        checkpoint.clear()
+        raise ValueError("No usable data after cleaning")
+    df = add_actions(df)
+    DATA_DIR.mkdir(exist_ok=True)
+    with span("csv.write", investor_name):
         df.to_csv(DATA_DIR / f"{investor_name}.csv", index=False)
+    checkpoint.clear()
+    return df
+
+
+def compute_and_save(investor_name: str, df: pd.DataFrame, provider: PriceProvider) -> pd.DataFrame:
+    """compute_stats on enriched data and write stats/<name>.csv.
+
+    Existing stats with a manifest are updated incrementally."""
+    price_fn = provider.current_price
+    stats_path = STATS_DIR / f"{investor_name}.csv"
+    manifest = load_manifest(investor_name, STATS_DIR) if stats_path.exists() else None
+    with span("compute_stats", investor_name):
+        if manifest is not None:
+            stats, _ = update_stats(df, read_stats(stats_path), manifest, price_fn=price_fn)
+        else:
+            stats = compute_stats(df, price_fn=price_fn)
+    if stats.empty:
+        raise ValueError("No valid trades after computation")
+    with span("csv.write", investor_name):
+        save_stats(investor_name, df, stats, STATS_DIR, DATA_DIR / f"{investor_name}.csv")
+    return stats
+
+
+def _fetch_one(investor_name: str, sched: HostScheduler, provider: PriceProvider) -> tuple[str, bool, str]:
+    try:
+        df = enrich_and_save(investor_name, scrape(investor_name, sched), provider)
         tickers = df["stock"].nunique()
         return investor_name, True, f"{len(df)} rows ({tickers} tickers)"
     except Exception as e:
         return investor_name, False, str(e)
 
 
+def run_pipeline(names: list[str], sched: HostScheduler, provider: PriceProvider, args) -> tuple[int, int]:
+    """Stream investors through scrape → enrich → compute; returns (success, failed)."""
+    counts = {"done": 0, "success": 0, "failed": 0}
+    t0 = time.time()
+
+    def progress(name: str, ok: bool, msg: str):
+        with _print_lock:
+            counts["done"] += 1
+            counts["success" if ok else "failed"] += 1
+            mark = f"{GREEN}✓{RESET}" if ok else f"{RED}✗{RESET}"
+            detail = f"{DIM}({msg}){RESET}" if ok else f"{RED}{msg}{RESET}"
+            print(f"  [{counts['done']:>2}/{len(names)}] {mark} {name}  {detail}  "
+                  f"{DIM}+{time.time() - t0:.0f}s{RESET}")
+
+    def on_result(name, stats):
+        progress(name, True, f"{len(stats)} trades")
+
+    def on_error(stage, name, exc):
+        progress(name, False, f"{stage}: {exc}")
+
+    pipe = Pipeline(
+        [
+            Stage("scrape", lambda name, _: scrape(name, sched), args.scrape_workers),
+            Stage("enrich", lambda name, df: enrich_and_save(name, df, provider), args.enrich_workers),
+            Stage("compute", lambda name, df: compute_and_save(name, df, provider), args.compute_workers),
+        ],
+        queue_size=args.queue_size,
+        on_result=on_result,
+        on_error=on_error,
+    )
+    pipe.run((name, None) for name in names)
+    return counts["success"], counts["failed"]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Fetch and cache enriched data for all investors.")
     parser.add_argument("--refresh", action="store_true", help="Re-fetch all (ignore cache)")
     parser.add_argument("--only", nargs="+", metavar="NAME", help="Only these investors")
-    parser.add_argument("--workers", "-w", type=int, default=4, help="Parallel workers (default 4)")
+    parser.add_argument("--workers", "-w", type=int, default=8,
+                        help="Investors in flight at once (default 8); per-host limits below")
+    parser.add_argument("--dataroma-rate", type=float, default=1.0, metavar="RPS",
+                        help="Max Dataroma requests per second (default 1)")
+    parser.add_argument("--dataroma-concurrency", type=int, default=2, metavar="N",
+                        help="Max concurrent Dataroma requests (default 2)")
+    parser.add_argument("--yahoo-rate", type=float, default=4.0, metavar="RPS",
+                        help="Max Yahoo requests per second (default 4)")
+    parser.add_argument("--yahoo-concurrency", type=int, default=4, metavar="N",
+                        help="Max concurrent Yahoo requests (default 4)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Discard staged pages/tickers from interrupted runs (data/.staging/)")
+    parser.add_argument("--prices", type=Path, metavar="DIR",
+                        help="Read daily closes from DIR/<TICKER>.csv|.parquet instead of Yahoo (see providers.py)")
+    parser.add_argument("--recheck-unpriceable", action="store_true",
+                        help="Forget tickers Yahoo had no prices for (data/.unpriceable.json) and ask again")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Stream fetch → enrich → compute_stats and write stats/ too")
+    parser.add_argument("--scrape-workers", type=int, default=4, metavar="N",
+                        help="--pipeline: investors being scraped at once (default 4)")
+    parser.add_argument("--enrich-workers", type=int, default=4, metavar="N",
+                        help="--pipeline: investors being enriched at once (default 4)")
+    parser.add_argument("--compute-workers", type=int, default=2, metavar="N",
+                        help="--pipeline: compute_stats threads (default 2)")
+    parser.add_argument("--queue-size", type=int, default=4, metavar="N",
+                        help="--pipeline: max investors waiting between stages (default 4)")
+    parser.add_argument("--profile", action="store_true", help="Time each phase and write a report")
+    parser.add_argument("--profile-out", type=Path, default=Path("profile_fetch.json"), metavar="PATH",
+                        help="Timing report path, .json or .csv (default profile_fetch.json)")
+    parser.add_argument("--cprofile", type=Path, metavar="PATH",
+                        help="Also dump merged cProfile stats here (implies --profile)")
     args = parser.parse_args()
+    if args.profile or args.cprofile:
+        profiling.enable(cprofile=args.cprofile is not None)
 
     names = args.only if args.only else list(investors.keys())
+    if args.no_resume:
+        for name in names:
+            Checkpoint(name).clear()
+    if args.recheck_unpriceable:
+        UNPRICEABLE.clear()
 
     to_fetch = []
     skipped = 0
@@ -71,31 +216,62 @@ def main():
             to_fetch.append(name)
 
     total = len(names)
-    print(f"\n  {BOLD}{CYAN}Fetching data for {total} investors  ({args.workers} workers){RESET}")
+    print(f"\n  {BOLD}{CYAN}Fetching data for {total} investors  ({args.workers} in flight){RESET}")
     print(f"  {DIM}Cache: data/{RESET}")
     if skipped:
         print(f"  {DIM}{skipped} already cached, {len(to_fetch)} to fetch{RESET}")
+    resumable = [n for n in to_fetch if (STAGING_DIR / n).exists()]
+    if resumable:
+        print(f"  {DIM}{len(resumable)} resuming from data/.staging/{RESET}")
+    if len(UNPRICEABLE):
+        print(f"  {DIM}{len(UNPRICEABLE)} tickers known to have no Yahoo prices, "
+              f"rechecked with backoff (data/.unpriceable.json){RESET}")
     print()
 
     success = failed = 0
     done = 0
     t0 = time.time()
 
-    with ThreadPoolExecutor(max_workers=args.workers) as pool:
-        futures = {pool.submit(fetch_one, name): name for name in to_fetch}
-        for future in as_completed(futures):
-            done += 1
-            name, ok, msg = future.result()
-            if ok:
-                success += 1
-                _log(f"  [{done:>2}/{len(to_fetch)}] {GREEN}✓{RESET} {name}  {DIM}({msg}){RESET}")
-            else:
-                failed += 1
-                _log(f"  [{done:>2}/{len(to_fetch)}] {RED}✗{RESET} {name}  {RED}{msg}{RESET}")
+    sched = HostScheduler(default_hosts(args))
+    provider = get_provider(args.prices, sched)
+    if args.pipeline:
+        success, failed = run_pipeline(to_fetch, sched, provider, args)
+    else:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(fetch_one, name, sched, provider): name for name in to_fetch}
+            for future in as_completed(futures):
+                done += 1
+                name, ok, msg = future.result()
+                if ok:
+                    success += 1
+                    _log(f"  [{done:>2}/{len(to_fetch)}] {GREEN}✓{RESET} {name}  {DIM}({msg}){RESET}")
+                else:
+                    failed += 1
+                    _log(f"  [{done:>2}/{len(to_fetch)}] {RED}✗{RESET} {name}  {RED}{msg}{RESET}")
+
+    sched.shutdown()
 
     elapsed = time.time() - t0
     print(f"\n  {BOLD}{'═' * 50}{RESET}")
-    print(f"  {GREEN}Done in {elapsed:.0f}s{RESET}  {success} fetched  ·  {skipped} cached  ·  {failed} failed\n")
+    print(f"  {GREEN}Done in {elapsed:.0f}s{RESET}  {success} fetched  ·  {skipped} cached  ·  {failed} failed")
+    for host, st in sched.stats().items():
+        print(f"  {DIM}{host}: {st['requests']} requests · {st['throttled']} throttled · "
+              f"final rate {st['rate']:.2f}/s{RESET}")
+    print()
+
+    if success:
+        meta = build_holdings_cube(DATA_DIR)
+        print(f"  {DIM}Holdings cube rebuilt → cube/ ({len(meta['investors'])} investors, "
+              f"{len(meta['quarters'])} quarters){RESET}\n")
+
+    if profiling.is_enabled():
+        profiling.print_summary(top_phases=("investor", "stage.enrich", "yahoo.download", "dataroma.page"))
+        profiling.write_report(args.profile_out)
+        print(f"  {DIM}Timing report → {args.profile_out}{RESET}")
+        if args.cprofile:
+            profiling.dump_cprofile(args.cprofile)
+            print(f"  {DIM}cProfile stats → {args.cprofile}  (python -m pstats {args.cprofile}){RESET}")
+        print()
 
 
 if __name__ == "__main__":
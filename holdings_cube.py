@@ -0,0 +1,386 @@
+"""
+Investor × ticker × quarter holdings cube, memory-mapped. Run from this directory.
+
+Cross-investor questions (who holds X, how much do two books overlap,
+which names are crowded) otherwise mean re-reading every data/*.csv. The
+cube is built once from the activity ledgers and stored under cube/ as
+.npy files that open with mmap, so queries start instantly and slices
+are views into the files:
+
+    shares.npy        int64 (quarters, pairs)   shares held at quarter end
+    price.npy         float64 (quarters, tickers) quarter median from data/,
+                      carried forward through quarters without activity
+    pair_investor.npy / pair_ticker.npy   int32 (pairs,)  owner and ticker
+    investor_ptr.npy  int64 (investors + 1,)  pairs of investor i are
+                      investor_ptr[i]:investor_ptr[i+1] (sorted by investor)
+    ticker_pairs.npy / ticker_ptr.npy     the same index by ticker
+    meta.json         investor, ticker and quarter labels; data/ fingerprint
+
+A pair is one (investor, ticker) that ever appears in the ledger, so the
+cube stores only the non-empty slabs of the full 3-D array. Holdings are
+rebuilt as in screener: Buy/Add add shares, Reduce/Sell remove them, a
+"Sell 100%" closes the position.
+
+    python holdings_cube.py build
+    python holdings_cube.py holdings "Warren Buffett" --quarter "Q4 2020"
+    python holdings_cube.py holders AAPL
+    python holdings_cube.py overlap "Li Lu" "Warren Buffett"
+    python holdings_cube.py crowded --top 20
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from activity import ensure_actions, is_buy, is_close
+from portfolio import _ffill
+from tickers import normalize_ticker
+from trade_stats import _quarter_index
+
+ROOT = Path(__file__).parent
+DATA_DIR = ROOT / "data"
+CUBE_DIR = ROOT / "cube"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+READ_COLUMNS = {"quarter", "stock", "activity", "action", "shares", "price_p50"}
+ARRAYS = ["shares", "price", "pair_investor", "pair_ticker", "investor_ptr", "ticker_pairs", "ticker_ptr"]
+
+
+def _quarter_label(qidx: int) -> str:
+    year, q = divmod(int(qidx) - 1, 4)
+    return f"Q{q + 1} {year}"
+
+
+def data_fingerprint(data_dir: Path = DATA_DIR) -> dict:
+    paths = list(data_dir.glob("*.csv")) if data_dir.exists() else []
+    return {"files": len(paths), "mtime_ns": max((p.stat().st_mtime_ns for p in paths), default=0)}
+
+
+# ── build ───────────────────────────────────────────────────────────────
+
+def build(data_dir: Path = DATA_DIR, out_dir: Path = CUBE_DIR) -> dict:
+    """Build the cube from data/ into *out_dir*; returns its meta."""
+    fingerprint = data_fingerprint(data_dir)
+    frames = []
+    names = []
+    for path in sorted(data_dir.glob("*.csv")):
+        df = pd.read_csv(path, usecols=lambda c: c in READ_COLUMNS,
+                         keep_default_na=False, na_values=[""])
+        df = ensure_actions(df)
+        if df.empty:
+            continue
+        frames.append(df.iloc[::-1].assign(inv=len(names)))   # oldest first
+        names.append(path.stem)
+    if not frames:
+        raise SystemExit(f"No data/ files in {data_dir}")
+    d = pd.concat(frames, ignore_index=True)
+    d["qidx"] = _quarter_index(d["quarter"])
+    tickers = np.array(sorted(d["stock"].unique()))
+    d["tick"] = np.searchsorted(tickers, d["stock"])
+    d = d.sort_values(["inv", "tick", "qidx"], kind="stable", ignore_index=True)
+
+    # one cumulative share count per (investor, ticker), restarting after each close
+    pair_key = d["inv"].to_numpy(np.int64) * len(tickers) + d["tick"].to_numpy(np.int64)
+    keys, pair = np.unique(pair_key, return_inverse=True)
+    closes = pd.Series(is_close(d["action"]))
+    segment = closes.groupby(pair).cumsum() - closes
+    signed = np.where(is_buy(d["action"]), d["shares"], -d["shares"])
+    level = pd.Series(signed).groupby([pair, segment.to_numpy()]).cumsum()
+    level[closes] = 0
+    d["level"] = level.clip(lower=0).to_numpy()
+    d["pair"] = pair
+
+    q0, q1 = int(d["qidx"].min()), int(d["qidx"].max())
+    n_q, n_pairs = q1 - q0 + 1, len(keys)
+    last = d.drop_duplicates(["pair", "qidx"], keep="last")
+    shares = np.full((n_pairs, n_q), np.nan)
+    shares[last["pair"].to_numpy(), last["qidx"].to_numpy() - q0] = last["level"].to_numpy()
+    shares = np.ascontiguousarray(np.nan_to_num(_ffill(shares), nan=0.0).T.astype(np.int64))
+
+    priced = d.dropna(subset=["price_p50"]).drop_duplicates(["tick", "qidx"])
+    price = np.full((len(tickers), n_q), np.nan)
+    price[priced["tick"].to_numpy(), priced["qidx"].to_numpy() - q0] = priced["price_p50"].to_numpy()
+    price = np.ascontiguousarray(_ffill(price).T)
+
+    pair_investor = (keys // len(tickers)).astype(np.int32)
+    pair_ticker = (keys % len(tickers)).astype(np.int32)
+    ticker_pairs = np.argsort(pair_ticker, kind="stable").astype(np.int32)
+    arrays = {
+        "shares": shares,
+        "price": price,
+        "pair_investor": pair_investor,
+        "pair_ticker": pair_ticker,
+        "investor_ptr": np.searchsorted(pair_investor, np.arange(len(names) + 1)).astype(np.int64),
+        "ticker_pairs": ticker_pairs,
+        "ticker_ptr": np.searchsorted(pair_ticker[ticker_pairs], np.arange(len(tickers) + 1)).astype(np.int64),
+    }
+    meta = {
+        "investors": names,
+        "tickers": tickers.tolist(),
+        "q0": q0,
+        "quarters": [_quarter_label(q) for q in range(q0, q1 + 1)],
+        "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": fingerprint,
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "meta.json").unlink(missing_ok=True)   # readers treat a cube without meta as missing
+    for name, arr in arrays.items():
+        tmp = out_dir / f"{name}.tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, out_dir / f"{name}.npy")
+    tmp = out_dir / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, out_dir / "meta.json")
+    return meta
+
+
+# ── query ───────────────────────────────────────────────────────────────
+
+class HoldingsCube:
+    """Read-only, memory-mapped view of a built cube."""
+
+    def __init__(self, path: Path = CUBE_DIR):
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text())
+        for name in ARRAYS:
+            setattr(self, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        self.investors: list[str] = self.meta["investors"]
+        self.tickers: list[str] = self.meta["tickers"]
+        self.quarters: list[str] = self.meta["quarters"]
+        self._investor_id = {n: i for i, n in enumerate(self.investors)}
+        self._ticker_id = {t: i for i, t in enumerate(self.tickers)}
+
+    @classmethod
+    def open(cls, path: Path = CUBE_DIR, data_dir: Path = DATA_DIR, rebuild_stale: bool = True) -> "HoldingsCube":
+        """Open the cube, (re)building it first if missing or older than data/."""
+        meta_path = path / "meta.json"
+        stale = not meta_path.exists()
+        if not stale and rebuild_stale:
+            stale = json.loads(meta_path.read_text()).get("source") != data_fingerprint(data_dir)
+        if stale:
+            build(data_dir, path)
+        return cls(path)
+
+    # ── ids ─────────────────────────────────────────────────────────────
+
+    def investor_id(self, name: str) -> int:
+        if name not in self._investor_id:
+            raise KeyError(f"Unknown investor: {name}")
+        return self._investor_id[name]
+
+    def ticker_id(self, ticker: str) -> int:
+        if ticker not in self._ticker_id:
+            raise KeyError(f"Unknown ticker: {ticker}")
+        return self._ticker_id[ticker]
+
+    def quarter_pos(self, quarter: str | None) -> int:
+        """Column of *quarter* ('Q4 2020' or '2020Q4'); None -> latest."""
+        if quarter is None:
+            return len(self.quarters) - 1
+        m = re.fullmatch(r"\s*(?:Q([1-4])\s*(\d{4})|(\d{4})\s*Q([1-4]))\s*", quarter, re.IGNORECASE)
+        if not m:
+            raise KeyError(f"Bad quarter: {quarter!r} (use 'Q4 2020' or '2020Q4')")
+        q, year = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+        pos = int(year) * 4 + int(q) - self.meta["q0"]
+        if not 0 <= pos < len(self.quarters):
+            raise KeyError(f"{quarter} is outside the cube ({self.quarters[0]} … {self.quarters[-1]})")
+        return pos
+
+    # ── slices (views into the mapped files) ────────────────────────────
+
+    def investor_pairs(self, name: str) -> slice:
+        i = self.investor_id(name)
+        return slice(int(self.investor_ptr[i]), int(self.investor_ptr[i + 1]))
+
+    def investor_shares(self, name: str) -> np.ndarray:
+        """(quarters, tickers of *name*) shares; columns follow pair_ticker[investor_pairs(name)]."""
+        return self.shares[:, self.investor_pairs(name)]
+
+    def ticker_pair_ids(self, ticker: str) -> np.ndarray:
+        t = self.ticker_id(ticker)
+        return self.ticker_pairs[self.ticker_ptr[t]:self.ticker_ptr[t + 1]]
+
+    def values(self, q: int) -> np.ndarray:
+        """Market value of every pair at quarter column *q*."""
+        return self.shares[q] * np.nan_to_num(self.price[q][self.pair_ticker])
+
+    def book_values(self, q: int) -> np.ndarray:
+        """Total market value per investor at quarter column *q*."""
+        return np.add.reduceat(self.values(q), self.investor_ptr[:-1]) if len(self.shares[q]) else np.zeros(0)
+
+    # ── queries ─────────────────────────────────────────────────────────
+
+    def holdings(self, name: str, quarter: str | None = None) -> pd.DataFrame:
+        q = self.quarter_pos(quarter)
+        sl = self.investor_pairs(name)
+        shares = self.shares[q, sl]
+        value = self.values(q)[sl]
+        held = shares > 0
+        total = value[held].sum()
+        out = pd.DataFrame({
+            "ticker": np.asarray(self.tickers)[self.pair_ticker[sl][held]],
+            "shares": shares[held],
+            "value": value[held],
+            "weight": value[held] / total if total > 0 else np.nan,
+        })
+        return out.sort_values("value", ascending=False, ignore_index=True)
+
+    def holders(self, ticker: str, quarter: str | None = None) -> pd.DataFrame:
+        q = self.quarter_pos(quarter)
+        pairs = self.ticker_pair_ids(ticker)
+        shares = self.shares[q, pairs]
+        held = shares > 0
+        pairs = pairs[held]
+        inv = self.pair_investor[pairs]
+        value = self.values(q)[pairs]
+        books = self.book_values(q)[inv]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(books > 0, value / books, np.nan)
+        out = pd.DataFrame({
+            "investor": np.asarray(self.investors)[inv],
+            "shares": shares[held],
+            "value": value,
+            "weight": weight,
+        })
+        return out.sort_values("weight", ascending=False, ignore_index=True)
+
+    def overlap(self, a: str, b: str, quarter: str | None = None) -> tuple[pd.DataFrame, dict]:
+        """Shared positions of *a* and *b* and summary overlap scores."""
+        ha = self.holdings(a, quarter).set_index("ticker")
+        hb = self.holdings(b, quarter).set_index("ticker")
+        common = ha.index.intersection(hb.index)
+        both = pd.DataFrame({"weight_a": ha.loc[common, "weight"], "weight_b": hb.loc[common, "weight"]})
+        both = both.sort_values("weight_a", ascending=False).reset_index(names="ticker")
+        union = len(ha.index.union(hb.index))
+        scores = {
+            "common": len(common),
+            "jaccard": len(common) / union if union else np.nan,
+            "weight_overlap": float(np.minimum(both["weight_a"], both["weight_b"]).sum()),
+        }
+        return both, scores
+
+    def crowded(self, quarter: str | None = None, top: int = 20) -> pd.DataFrame:
+        """Tickers by number of holders, with total value and mean book weight."""
+        q = self.quarter_pos(quarter)
+        held = self.shares[q] > 0
+        value = self.values(q)
+        books = self.book_values(q)[self.pair_investor]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(held & (books > 0), value / books, 0.0)
+        n_t = len(self.tickers)
+        holders = np.bincount(self.pair_ticker, weights=held, minlength=n_t)
+        out = pd.DataFrame({
+            "ticker": self.tickers,
+            "holders": holders.astype(int),
+            "value": np.bincount(self.pair_ticker, weights=np.where(held, value, 0.0), minlength=n_t),
+            "avg_weight": np.bincount(self.pair_ticker, weights=weight, minlength=n_t) / np.maximum(holders, 1),
+        })
+        out = out[out["holders"] > 0]
+        return out.sort_values(["holders", "value"], ascending=False, ignore_index=True).head(top)
+
+
+# ── output ──────────────────────────────────────────────────────────────
+
+def _money(v: float) -> str:
+    for unit, div in (("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if abs(v) >= div:
+            return f"${v / div:.1f}{unit}"
+    return f"${v:.0f}"
+
+
+def _print_table(title: str, sub: str, df: pd.DataFrame, cols: list[tuple[str, str, int]]):
+    print()
+    print(f"  {BOLD}{CYAN}{title}{RESET}  {DIM}{sub}{RESET}")
+    hdr = " │ ".join(f"{label:<{w}s}" if i == 0 else f"{label:>{w}s}" for i, (_, label, w) in enumerate(cols))
+    print(f"  {DIM}{'─' * len(hdr)}{RESET}")
+    print(f"  {DIM}{hdr}{RESET}")
+    print(f"  {DIM}{'─' * len(hdr)}{RESET}")
+    for _, row in df.iterrows():
+        cells = []
+        for i, (key, _, w) in enumerate(cols):
+            val = row[key]
+            if key in ("value",):
+                txt = _money(val)
+            elif "weight" in key:
+                txt = "n/a" if pd.isna(val) else f"{val * 100:.1f}%"
+            elif key in ("shares", "holders", "common"):
+                txt = f"{int(val):,}"
+            else:
+                txt = str(val)
+                txt = txt if len(txt) <= w else txt[: w - 1] + "…"
+            cells.append(f"{txt:<{w}s}" if i == 0 else f"{txt:>{w}s}")
+        print("  " + " │ ".join(cells))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped holdings cube built from data/.")
+    parser.add_argument("--cube-dir", type=Path, default=CUBE_DIR)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="(Re)build the cube from data/")
+    p = sub.add_parser("holdings", help="One investor's positions at a quarter")
+    p.add_argument("investor")
+    p = sub.add_parser("holders", help="Investors holding a ticker at a quarter")
+    p.add_argument("ticker", type=normalize_ticker)
+    p = sub.add_parser("overlap", help="Shared positions of two investors")
+    p.add_argument("a")
+    p.add_argument("b")
+    p = sub.add_parser("crowded", help="Tickers with the most holders")
+    p.add_argument("--top", type=int, default=20)
+    for name, p in sub.choices.items():
+        if name != "build":
+            p.add_argument("--quarter", default=None, help="e.g. 'Q4 2020' or 2020Q4 (default: latest)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        t0 = time.time()
+        meta = build(args.data_dir, args.cube_dir)
+        shares = np.load(args.cube_dir / "shares.npy", mmap_mode="r")
+        print(f"\n  {GREEN}✓{RESET} {len(meta['investors'])} investors · {len(meta['tickers'])} tickers · "
+              f"{len(meta['quarters'])} quarters ({meta['quarters'][0]} … {meta['quarters'][-1]}) · "
+              f"{shares.shape[1]} pairs  {DIM}{time.time() - t0:.1f}s → {args.cube_dir}/{RESET}\n")
+        return
+
+    cube = HoldingsCube.open(args.cube_dir, args.data_dir)
+    try:
+        quarter = cube.quarters[cube.quarter_pos(args.quarter)]
+        if args.command == "holdings":
+            df = cube.holdings(args.investor, args.quarter)
+            _print_table(f"HOLDINGS  {args.investor}", f"{quarter} · {len(df)} positions", df,
+                         [("ticker", "Ticker", 8), ("shares", "Shares", 14), ("value", "Value", 9),
+                          ("weight", "Weight", 7)])
+        elif args.command == "holders":
+            df = cube.holders(args.ticker, args.quarter)
+            _print_table(f"HOLDERS  {args.ticker}", f"{quarter} · {len(df)} investors", df,
+                         [("investor", "Investor", 28), ("shares", "Shares", 14), ("value", "Value", 9),
+                          ("weight", "Of book", 7)])
+        elif args.command == "overlap":
+            df, scores = cube.overlap(args.a, args.b, args.quarter)
+            _print_table(f"OVERLAP  {args.a} ∩ {args.b}",
+                         f"{quarter} · {scores['common']} shared · Jaccard {scores['jaccard']:.2f} · "
+                         f"weight overlap {scores['weight_overlap'] * 100:.1f}%", df,
+                         [("ticker", "Ticker", 8), ("weight_a", "Weight A", 8), ("weight_b", "Weight B", 8)])
+        else:
+            df = cube.crowded(args.quarter, args.top)
+            _print_table("CROWDED", f"{quarter} · top {args.top} by number of holders", df,
+                         [("ticker", "Ticker", 8), ("holders", "Holders", 7), ("value", "Value", 9),
+                          ("avg_weight", "Avg weight", 10)])
+    except KeyError as e:
+        parser.error(e.args[0])
+
+
+if __name__ == "__main__":
+    main()
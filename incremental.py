@@ -0,0 +1,204 @@
+"""
+Incremental stats updates.
+
+Alongside stats/<name>.csv, stats/.manifest/<name>.json records what the
+stats were computed from: a fingerprint of each ticker's rows in data/,
+the stats labels each ticker produced (AAPL, or AAPL1, AAPL2 … after a
+sell-out and rebuy) and whether its last episode is still open.
+
+When data/<name>.csv changes, only tickers whose rows changed, new
+tickers and tickers with an open position (their value moves with the
+current price) are run through compute_stats again. Closed episodes of
+untouched tickers are copied from the existing stats, so an update costs
+in proportion to the new activity, not the investor's history.
+
+mark_to_market goes one step further for a valuation refresh: with data/
+unchanged, only the still-open episodes are revalued at new current
+prices, all of them solved at once.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from activity import ensure_actions, is_close
+from trade_stats import MODES, compute_stats, episode_table
+
+STATS_DIR = Path(__file__).parent / "stats"
+MANIFEST_VERSION = 1
+FINGERPRINT_COLUMNS = ["quarter", "activity", "shares", "price_p10", "price_p90", "price_p50"]
+
+
+def manifest_path(investor_name: str, stats_dir: Path = STATS_DIR) -> Path:
+    return stats_dir / ".manifest" / f"{investor_name}.json"
+
+
+def _source_stamp(data_path: Path) -> dict:
+    st = data_path.stat()
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def ticker_fingerprints(df: pd.DataFrame) -> dict[str, str]:
+    """Order-independent hash of each ticker's activity rows.
+
+    Prices are rounded first, so a frame and its CSV round trip hash alike.
+    """
+    cols = [c for c in FINGERPRINT_COLUMNS if c in df.columns]
+    row_hash = pd.util.hash_pandas_object(df[cols].round(6), index=False)
+    return row_hash.groupby(df["stock"].to_numpy()).sum().map(lambda h: f"{int(h):016x}").to_dict()
+
+
+def ticker_labels(df: pd.DataFrame) -> dict[str, list[str]]:
+    """Stats labels compute_stats can give each ticker, in its output order."""
+    closes = pd.Series(is_close(ensure_actions(df)["action"]), index=df.index)
+    n_closes = closes.groupby(df["stock"], sort=False).sum()
+    # newest row first: a trailing (still open) chunk exists unless the newest row is the close
+    newest_close = closes.groupby(df["stock"], sort=False).first()
+    n_splits = n_closes + (~newest_close).astype(int)
+    return {
+        t: [t] if n <= 1 else [f"{t}{i + 1}" for i in range(n)]
+        for t, n in n_splits.items()
+    }
+
+
+def open_tickers(df: pd.DataFrame) -> set[str]:
+    """Tickers whose newest activity is not a full sell-out."""
+    newest = ensure_actions(df).groupby("stock", sort=False)["action"].first()
+    return set(newest[~is_close(newest)].index)
+
+
+def load_manifest(investor_name: str, stats_dir: Path = STATS_DIR) -> dict | None:
+    try:
+        manifest = json.loads(manifest_path(investor_name, stats_dir).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("modes") != sorted(MODES):
+        return None
+    return manifest
+
+
+def save_stats(investor_name: str, df: pd.DataFrame, stats: pd.DataFrame,
+               stats_dir: Path = STATS_DIR, data_path: Path | None = None):
+    """Write stats/<name>.csv and its manifest for *df* (the data/ frame)."""
+    stats_dir.mkdir(exist_ok=True)
+    stats.to_csv(stats_dir / f"{investor_name}.csv", index=False)
+    fingerprints = ticker_fingerprints(df)
+    labels = ticker_labels(df)
+    still_open = open_tickers(df)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "modes": sorted(MODES),
+        "source": _source_stamp(data_path) if data_path is not None and data_path.exists() else None,
+        "tickers": {
+            t: {"fp": fingerprints[t], "labels": labels[t], "open": t in still_open}
+            for t in labels
+        },
+    }
+    path = manifest_path(investor_name, stats_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, path)
+
+
+def is_current(investor_name: str, data_path: Path, stats_dir: Path = STATS_DIR) -> bool:
+    """True if stats/<name>.csv was computed from the data file as it is now."""
+    stats_path = stats_dir / f"{investor_name}.csv"
+    if not stats_path.exists():
+        return False
+    manifest = load_manifest(investor_name, stats_dir)
+    if manifest is None or manifest.get("source") is None:
+        # stats from before manifests (e.g. stats.zip): trust them unless data/ is newer
+        return stats_path.stat().st_mtime_ns >= data_path.stat().st_mtime_ns
+    return manifest["source"] == _source_stamp(data_path)
+
+
+def plan_update(df: pd.DataFrame, manifest: dict) -> tuple[set[str], set[str]]:
+    """(tickers to recompute, labels to keep from the stored stats)."""
+    fingerprints = ticker_fingerprints(df)
+    old = manifest["tickers"]
+    recompute = {
+        t for t, fp in fingerprints.items()
+        if t not in old or old[t]["fp"] != fp or old[t]["open"]
+    }
+    keep = {label for t, entry in old.items()
+            if t in fingerprints and t not in recompute for label in entry["labels"]}
+    return recompute, keep
+
+
+def update_stats(df: pd.DataFrame, old_stats: pd.DataFrame, manifest: dict,
+                 price_fn=None) -> tuple[pd.DataFrame, int]:
+    """Stats for *df* reusing *old_stats* where possible; returns (stats, tickers recomputed).
+
+    Rows come out in the order a full compute_stats(df) would produce.
+    """
+    recompute, keep = plan_update(df, manifest)
+    parts = [old_stats[old_stats["ticker"].isin(keep)]]
+    if recompute:
+        parts.append(compute_stats(df[df["stock"].isin(recompute)], price_fn=price_fn))
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return old_stats.iloc[:0], len(recompute)
+    stats = pd.concat(parts, ignore_index=True)
+    order = [label for labels in ticker_labels(df).values() for label in labels]
+    rank = pd.Series(range(len(order)), index=order)
+    stats = stats.iloc[rank.reindex(stats["ticker"]).to_numpy().argsort(kind="stable")]
+    return stats.reset_index(drop=True), len(recompute)
+
+
+def open_positions(manifest: dict) -> list[str]:
+    """Tickers the manifest records as still held."""
+    return [t for t, entry in manifest["tickers"].items() if entry["open"]]
+
+
+def mark_to_market(df: pd.DataFrame, stats: pd.DataFrame, prices: dict[str, float],
+                   now: datetime | None = None) -> tuple[pd.DataFrame, int]:
+    """Revalue the open rows of *stats* at *prices*; returns (stats, rows revalued).
+
+    irr_/ret_ and holding_period of every still-held episode with a price
+    are recomputed from its rows in *df*, as compute_stats would with the
+    same prices; cost_ does not depend on the current price and is kept.
+    Closed trades and open positions without a price are left as they are.
+    """
+    from montecarlo import build_flows, evaluate
+
+    now = now or datetime.now()
+    held = df[df["stock"].isin(open_tickers(df) & prices.keys())]
+    if held.empty:
+        return stats, 0
+    rows, episodes = episode_table(held)
+    position = pd.Series(stats.index, index=stats["ticker"])
+    revalue = (episodes["holding"] & episodes["label"].isin(position.index)).to_numpy()
+    if not revalue.any():
+        return stats, 0
+    flows = build_flows(rows, episodes, prices, now).select(revalue)
+    episodes = episodes[revalue]
+    at = position[episodes["label"]].to_numpy()
+
+    buy = flows.sign < 0
+    amounts = np.stack([
+        flows.sign * flows.size * np.where(buy, getattr(flows, buy_col.removeprefix("price_")),
+                                           getattr(flows, sell_col.removeprefix("price_")))
+        for buy_col, sell_col in MODES.values()
+    ])
+    result = evaluate(flows, amounts)
+    inflows = np.add.reduceat(np.where(amounts > 0, amounts, 0.0), flows.starts, axis=1)
+
+    stats = stats.copy()
+    for i, label in enumerate(MODES):
+        cost = stats.loc[at, f"cost_{label}"].to_numpy(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = np.where(cost > 0, inflows[i] / cost - 1, 0.0)
+        stats.loc[at, f"irr_{label}"] = result["irr"][i]
+        stats.loc[at, f"ret_{label}"] = np.where(np.isfinite(ret), ret, np.nan)
+    stats.loc[at, "holding_period"] = episodes["holding_period"].to_numpy()
+    return stats.dropna().reset_index(drop=True), len(at)
+
+
+def read_stats(path: Path) -> pd.DataFrame:
+    """Stored stats, read so that rewriting them reproduces the same values."""
+    return pd.read_csv(path, keep_default_na=False, na_values=[""], float_precision="round_trip")
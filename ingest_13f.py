@@ -0,0 +1,282 @@
+"""
+Build data/ files from the SEC's Form 13F bulk data sets, read from disk.
+
+Each quarterly data set (https://www.sec.gov/data-research/sec-markets-data/form-13f-data-sets),
+as the downloaded .zip or extracted, holds SUBMISSION.tsv, COVERPAGE.tsv
+and INFOTABLE.tsv. Any number of them can be given at once; a report
+period is often split across two sets by filing date.
+
+    1. SUBMISSION + COVERPAGE (small) pick each manager's filing per report
+       period: the latest original or restatement, plus "new holdings"
+       amendments filed after it.
+    2. INFOTABLE is streamed in chunks. Only share positions (no principal
+       amounts, no options) of picked filings whose CUSIP maps to a ticker
+       are kept, summed per filing and ticker as they arrive, so memory grows
+       with distinct holdings rather than with file size.
+    3. Consecutive filings of a manager are diffed into Dataroma's schema:
+       Buy, Add x%, Reduce x%, Sell 100.00%, with shares traded and
+       pct_change as the trade's share of the portfolio's reported value.
+       A manager's first filing opens every position with a Buy; a skipped
+       period is bridged, not read as a sell-out.
+
+Tickers come from a local CUSIP table (--cusip-map, CSV with cusip and
+ticker columns). Prices are filled as ingest_html does (prices/ first,
+then the price provider, or --offline), and one data/ file is written per
+manager, named after the filing manager.
+
+13F reports do not adjust for splits, so a split shows up as an Add.
+
+    python ingest_13f.py 2024q1_form13f.zip 2024q2_form13f.zip --cusip-map cusips.csv
+    python ingest_13f.py sets/* --cusip-map cusips.csv --cik 1067983 1336528 --offline
+"""
+
+import argparse
+import re
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from activity import add_actions
+from holdings_cube import build as build_holdings_cube
+from ingest_html import enrich, stored_prices
+from providers import get_provider
+from scheduler import HostLimits, HostScheduler
+from tickers import normalize_ticker
+
+DATA_DIR = Path(__file__).parent / "data"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+CHUNK_ROWS = 500_000
+INFOTABLE_COLUMNS = ["ACCESSION_NUMBER", "CUSIP", "VALUE", "SSHPRNAMT", "SSHPRNAMTTYPE", "PUTCALL"]
+
+
+# ── reading data sets ───────────────────────────────────────────────────
+
+@contextmanager
+def _open_table(dataset: Path, table: str):
+    """A data set's TABLE.tsv as a binary stream, from a .zip or a directory."""
+    if dataset.suffix.lower() == ".zip":
+        with zipfile.ZipFile(dataset) as zf:
+            name = next(n for n in zf.namelist() if Path(n).name.upper() == f"{table}.TSV")
+            with zf.open(name) as f:
+                yield f
+    else:
+        path = next(p for p in dataset.iterdir() if p.name.upper() == f"{table}.TSV")
+        with open(path, "rb") as f:
+            yield f
+
+
+def _read_table(dataset: Path, table: str, usecols: list[str], **kw):
+    with _open_table(dataset, table) as f:
+        return pd.read_csv(f, sep="\t", usecols=lambda c: c in usecols, dtype=str,
+                           keep_default_na=False, na_values=[""], **kw)
+
+
+def _qidx(dates: pd.Series) -> np.ndarray:
+    """'31-DEC-2023' -> year * 4 + quarter - 1."""
+    d = pd.to_datetime(dates, format="%d-%b-%Y")
+    return (d.dt.year * 4 + d.dt.quarter - 1).to_numpy()
+
+
+def _quarter_label(qidx: np.ndarray) -> np.ndarray:
+    return np.array([f"Q{q % 4 + 1} {q // 4}" for q in qidx], dtype=object)
+
+
+def load_filings(datasets: list[Path], ciks: set[str] | None = None) -> pd.DataFrame:
+    """One row per 13F-HR filing to use: accession, cik, qidx, manager, filed."""
+    frames = []
+    for ds in datasets:
+        sub = _read_table(ds, "SUBMISSION", ["ACCESSION_NUMBER", "FILING_DATE", "SUBMISSIONTYPE",
+                                             "CIK", "PERIODOFREPORT"])
+        cover = _read_table(ds, "COVERPAGE", ["ACCESSION_NUMBER", "ISAMENDMENT", "AMENDMENTTYPE",
+                                              "FILINGMANAGER_NAME"])
+        frames.append(sub.merge(cover, on="ACCESSION_NUMBER", how="left"))
+    f = pd.concat(frames, ignore_index=True).drop_duplicates("ACCESSION_NUMBER")
+    f = f[f["SUBMISSIONTYPE"].isin(["13F-HR", "13F-HR/A"])]
+    f["CIK"] = f["CIK"].str.lstrip("0")
+    if ciks:
+        f = f[f["CIK"].isin(ciks)]
+    f = f.assign(
+        qidx=_qidx(f["PERIODOFREPORT"]),
+        filed=pd.to_datetime(f["FILING_DATE"], format="%d-%b-%Y"),
+        new_holdings=(f["ISAMENDMENT"].fillna("N").str.upper() == "Y")
+                     & f["AMENDMENTTYPE"].fillna("").str.upper().str.startswith("NEW HOLDINGS"),
+    ).sort_values(["filed", "ACCESSION_NUMBER"])
+
+    base = f[~f["new_holdings"]].groupby(["CIK", "qidx"], as_index=False).last()
+    adds = f[f["new_holdings"]].merge(base[["CIK", "qidx", "filed"]], on=["CIK", "qidx"],
+                                      suffixes=("", "_base"))
+    adds = adds[adds["filed"] >= adds["filed_base"]]
+    picked = pd.concat([base, adds[base.columns]], ignore_index=True)
+    # a manager's latest cover page names it
+    names = f.groupby("CIK")["FILINGMANAGER_NAME"].last()
+    return pd.DataFrame({
+        "accession": picked["ACCESSION_NUMBER"].to_numpy(),
+        "cik": picked["CIK"].to_numpy(),
+        "qidx": picked["qidx"].to_numpy(),
+        "manager": picked["CIK"].map(names).fillna(picked["CIK"]).to_numpy(),
+        "filed": picked["filed"].to_numpy(),
+    })
+
+
+def load_cusip_map(path: Path) -> dict[str, str]:
+    """CUSIP (9 characters, and its 8-character issue prefix) -> ticker."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    cols = {c.lower(): c for c in df.columns}
+    cusip = df[cols["cusip"]].str.strip().str.upper()
+    ticker = df[cols["ticker"]].map(normalize_ticker)
+    keep = (cusip != "") & (ticker != "")
+    cusip, ticker = cusip[keep], ticker[keep]
+    out = dict(zip(cusip.str[:8], ticker))
+    out.update(zip(cusip, ticker))
+    return out
+
+
+def stream_holdings(datasets: list[Path], filings: pd.DataFrame, cusips: dict[str, str],
+                    chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Shares and value per (filing, ticker), streamed from every INFOTABLE."""
+    wanted = set(filings["accession"])
+    parts = []
+    for ds in datasets:
+        with _open_table(ds, "INFOTABLE") as f:
+            reader = pd.read_csv(f, sep="\t", usecols=lambda c: c in INFOTABLE_COLUMNS, dtype=str,
+                                 keep_default_na=False, na_values=[""], chunksize=chunk_rows)
+            for chunk in reader:
+                chunk = chunk[chunk["ACCESSION_NUMBER"].isin(wanted)
+                              & (chunk["SSHPRNAMTTYPE"].str.upper() == "SH")
+                              & chunk["PUTCALL"].isna()]
+                if chunk.empty:
+                    continue
+                cusip = chunk["CUSIP"].str.strip().str.upper()
+                lookup = {c: cusips.get(c, cusips.get(c[:8])) for c in cusip.unique()}
+                ticker = cusip.map(lookup)
+                chunk = pd.DataFrame({
+                    "accession": chunk["ACCESSION_NUMBER"],
+                    "stock": ticker,
+                    "shares": pd.to_numeric(chunk["SSHPRNAMT"], errors="coerce"),
+                    "value": pd.to_numeric(chunk["VALUE"], errors="coerce"),
+                }).dropna()
+                parts.append(chunk.groupby(["accession", "stock"], as_index=False).sum())
+    if not parts:
+        return pd.DataFrame(columns=["cik", "qidx", "stock", "shares", "value"])
+    h = pd.concat(parts, ignore_index=True)
+    h = h.merge(filings[["accession", "cik", "qidx"]], on="accession")
+    return h.groupby(["cik", "qidx", "stock"], as_index=False)[["shares", "value"]].sum()
+
+
+# ── quarter-over-quarter diff ───────────────────────────────────────────
+
+def diff_filings(holdings: pd.DataFrame, filings: pd.DataFrame) -> pd.DataFrame:
+    """Activity rows (cik, quarter, stock, activity, shares, pct_change), newest first per manager."""
+    periods = filings[["cik", "qidx"]].drop_duplicates().sort_values(["cik", "qidx"])
+    periods["next_q"] = periods.groupby("cik")["qidx"].shift(-1)
+
+    cur = holdings.rename(columns={"shares": "cur", "value": "cur_value"})
+    prev = (holdings.merge(periods[["cik", "qidx", "next_q"]], on=["cik", "qidx"])
+            .dropna(subset=["next_q"])
+            .assign(qidx=lambda d: d["next_q"].astype(int))
+            .rename(columns={"shares": "prev", "value": "prev_value"})
+            .drop(columns="next_q"))
+    d = cur.merge(prev, on=["cik", "qidx", "stock"], how="outer").fillna(0.0)
+    total = holdings.groupby(["cik", "qidx"])["value"].sum().rename("total")
+    d = d.join(total, on=["cik", "qidx"])
+
+    cur_s, prev_s = d["cur"].to_numpy(), d["prev"].to_numpy()
+    traded = np.abs(cur_s - prev_s)
+    price = np.where(d["cur"] > 0, d["cur_value"] / d["cur"].where(d["cur"] > 0),
+                     d["prev_value"] / d["prev"].where(d["prev"] > 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(prev_s > 0, traded / prev_s * 100, 0.0)
+        weight = np.nan_to_num(traded * price / d["total"].to_numpy() * 100)
+    fmt = np.char.mod("%.2f%%", pct)
+    activity = np.select(
+        [(prev_s == 0) & (cur_s > 0), cur_s == 0, cur_s > prev_s, cur_s < prev_s],
+        [np.array("Buy", dtype=object), "Sell 100.00%", np.char.add("Add ", fmt), np.char.add("Reduce ", fmt)],
+        default=None,
+    )
+    out = pd.DataFrame({
+        "cik": d["cik"], "qidx": d["qidx"], "stock": d["stock"],
+        "activity": activity, "shares": traded.astype(np.int64), "pct_change": np.round(weight, 2),
+    })
+    out = out[out["activity"].notna() & (out["shares"] > 0)]
+    out = out.sort_values(["cik", "qidx", "pct_change"], ascending=[True, False, False], kind="stable")
+    out.insert(1, "quarter", _quarter_label(out["qidx"].to_numpy()))
+    return out.drop(columns="qidx").reset_index(drop=True)
+
+
+def _file_names(filings: pd.DataFrame) -> dict[str, str]:
+    """CIK -> data/ file stem: the manager's name, with the CIK added if two share it."""
+    names = filings.drop_duplicates("cik").set_index("cik")["manager"]
+    names = names.map(lambda n: re.sub(r"[\\/:*?\"<>|]+", "-", n).strip() or "manager")
+    clash = names.duplicated(keep=False)
+    names[clash] = names[clash] + " (" + names.index[clash] + ")"
+    return names.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build data/ files from SEC Form 13F data sets on disk.")
+    parser.add_argument("datasets", nargs="+", type=Path,
+                        help="Quarterly 13F data sets (.zip or extracted directories)")
+    parser.add_argument("--cusip-map", type=Path, required=True, metavar="CSV",
+                        help="CUSIP to ticker table (columns cusip, ticker)")
+    parser.add_argument("--cik", nargs="+", metavar="CIK", help="Only these filers")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, metavar="N",
+                        help=f"INFOTABLE rows per chunk (default {CHUNK_ROWS:,})")
+    parser.add_argument("--prices", type=Path, metavar="DIR",
+                        help="Daily closes for tickers prices/ does not cover (see providers.py)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only use prices/; drop tickers it does not cover instead of asking Yahoo")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Output directory (default data/)")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    ciks = {c.lstrip("0") for c in args.cik} if args.cik else None
+    print(f"\n  {BOLD}{CYAN}13F ingest{RESET}  {DIM}{len(args.datasets)} data sets{RESET}")
+    filings = load_filings(args.datasets, ciks)
+    print(f"  {DIM}{len(filings):,} filings from {filings['cik'].nunique():,} managers{RESET}")
+    cusips = load_cusip_map(args.cusip_map)
+    holdings = stream_holdings(args.datasets, filings, cusips, args.chunk_rows)
+    print(f"  {DIM}{len(holdings):,} mapped positions · {time.time() - t0:.1f}s{RESET}")
+    activity = diff_filings(holdings, filings)
+    if activity.empty:
+        print(f"\n  {RED}No activity: no filings with CUSIPs in {args.cusip_map}{RESET}\n")
+        return
+
+    names = _file_names(filings)
+    frames = {names[cik]: df.drop(columns="cik").reset_index(drop=True)
+              for cik, df in activity.groupby("cik", sort=False)}
+    summary, covered = stored_prices(frames)
+    sched = HostScheduler({"yahoo": HostLimits(rate=4.0, concurrency=4, burst=4)})
+    provider = None if args.offline else get_provider(args.prices, sched)
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    written = rows = 0
+    for name, df in frames.items():
+        out = enrich(df, summary, covered, provider)
+        if out.empty:
+            continue
+        add_actions(out).to_csv(args.data_dir / f"{name}.csv", index=False)
+        written += 1
+        rows += len(out)
+    sched.shutdown()
+
+    print(f"\n  {BOLD}{'═' * 50}{RESET}")
+    print(f"  {GREEN}Done in {time.time() - t0:.1f}s{RESET}  {written} managers · {rows:,} rows "
+          f"written to {args.data_dir}/  {DIM}({len(frames) - written} without priced activity){RESET}\n")
+    if written and args.data_dir == DATA_DIR:
+        meta = build_holdings_cube(DATA_DIR)
+        print(f"  {DIM}Holdings cube rebuilt → cube/ ({len(meta['investors'])} investors, "
+              f"{len(meta['quarters'])} quarters){RESET}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Rebuild data/ from saved Dataroma activity pages, without scraping.
+
+Point it at a directory of archived m_activity.php pages, either one
+subdirectory per investor (named by display name or Dataroma ID, the
+first number in the file name is the page) or flat files saved under their URL
+(...m=<ID>...L=<page>...):
+
+    pages/Warren Buffett/page_1.html, page_2.html, …
+    pages/BRK/1.html, …
+    pages/m_activity.php?m=BRK&typ=a&L=2&o=a.html
+
+Pages are parsed in parallel across processes and stitched per investor
+as the live fetch does: in page order, stopping at an empty page or when
+page 1 comes round again. Duplicate pages and duplicate rows are dropped.
+Prices come from the per-ticker summaries in prices/ where they cover every
+quarter needed; other tickers go to the price provider (Yahoo, or --prices
+DIR), or are dropped with --offline. Output is the usual data/ schema, so
+compute_all_stats picks the changes up incrementally.
+
+    python ingest_html.py pages/ --offline
+    python ingest_html.py pages/ --only "Li Lu" --workers 4
+"""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from activity import add_actions
+from dataroma import parse_activity, signature
+from holdings_cube import build as build_holdings_cube
+from investors import investors
+from price_summary import PRICES_DIR, load_summaries
+from providers import get_provider
+from scheduler import HostLimits, HostScheduler
+from tickers import normalize_tickers
+from yahoo import add_yahoo_quarter_price_stats_batch
+
+DATA_DIR = Path(__file__).parent / "data"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+PAGE_SUFFIXES = {".html", ".htm", ".php"}
+PRICE_COLUMNS = ["price_p10", "price_p90", "price_p50"]
+_BY_ID = {v.lower(): k for k, v in investors.items()}
+
+
+# ── discovery ───────────────────────────────────────────────────────────
+
+def _investor_name(key: str) -> str:
+    return _BY_ID.get(key.lower(), key)
+
+
+def _page_number(name: str) -> int | None:
+    m = re.search(r"[?&]L=(\d+)", name) or re.search(r"(\d+)", Path(name).stem)
+    return int(m.group(1)) if m else None
+
+
+def find_pages(pages_dir: Path) -> dict[str, list[tuple[int, Path]]]:
+    """Investor -> [(page number, file)], sorted by page."""
+    found: dict[str, list[tuple[int, Path]]] = {}
+    for path in sorted(pages_dir.rglob("*")):
+        if not path.is_file() or (path.suffix.lower() not in PAGE_SUFFIXES and "m_activity" not in path.name):
+            continue
+        flat = re.search(r"[?&]m=([^&]+)", path.name)
+        if flat:
+            investor = _investor_name(flat.group(1))
+        elif path.parent != pages_dir:
+            investor = _investor_name(path.relative_to(pages_dir).parts[0])
+        else:
+            continue
+        page = _page_number(path.name)
+        if page is not None:
+            found.setdefault(investor, []).append((page, path))
+    return {k: sorted(v) for k, v in found.items()}
+
+
+# ── parse + stitch (worker processes) ───────────────────────────────────
+
+def parse_page(path: Path) -> pd.DataFrame:
+    from bs4 import BeautifulSoup
+
+    return parse_activity(BeautifulSoup(path.read_bytes(), "html.parser"))
+
+
+def stitch(pages: list[tuple[int, pd.DataFrame]]) -> pd.DataFrame:
+    """One investor's parsed pages in page order, as get_investor_activity joins them."""
+    frames, seen, first = [], {}, None
+    for page, df in pages:
+        if df.empty:
+            break
+        sig = signature(df)
+        if seen.get(sig) == page:
+            continue   # same page saved twice
+        if first is None:
+            first = sig
+        elif sig == first:
+            break   # past the last page Dataroma serves page 1 again
+        seen[sig] = page
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["quarter", "stock", "activity", "shares", "pct_change"])
+    return pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def parse_investor(job: tuple[str, list[tuple[int, Path]]]) -> tuple[str, pd.DataFrame, int]:
+    """(investor, stitched activity, pages parsed)."""
+    investor, files = job
+    pages = [(page, parse_page(path)) for page, path in files]
+    df = stitch(pages)
+    df["stock"] = normalize_tickers(df["stock"])
+    return investor, df, len(pages)
+
+
+# ── enrich + write ──────────────────────────────────────────────────────
+
+def _period(quarters: pd.Series) -> pd.Series:
+    return quarters.str.replace(r"(Q[1-4])\s*(\d{4})", r"\2\1", regex=True)
+
+
+def stored_prices(frames: dict[str, pd.DataFrame], prices_dir: Path = PRICES_DIR) -> tuple[pd.DataFrame, set[str]]:
+    """Quarter prices from prices/ and the tickers it covers for every quarter they appear in."""
+    rows = pd.concat([df[["stock", "quarter"]] for df in frames.values()], ignore_index=True)
+    rows = rows.assign(period=_period(rows["quarter"])).drop_duplicates(["stock", "period"])
+    summary = load_summaries(rows["stock"].unique(), prices_dir, PRICE_COLUMNS)
+    summary = summary.dropna(subset=PRICE_COLUMNS).astype({"period": str})
+    have = rows.merge(summary[["stock", "period"]], how="left", indicator=True)
+    missing = set(have.loc[have["_merge"] == "left_only", "stock"])
+    covered = set(rows["stock"]) - missing
+    return summary[summary["stock"].isin(covered)], covered
+
+
+def enrich(df: pd.DataFrame, summary: pd.DataFrame, covered: set[str], provider) -> pd.DataFrame:
+    """*df* with price_p10/p90/p50 added and rows without prices dropped.
+
+    Stored summaries price the *covered* tickers, *provider* the rest.
+    """
+    columns = list(df.columns) + PRICE_COLUMNS
+    df = df.assign(_row=range(len(df)))
+    local = df[df["stock"].isin(covered)]
+    local = (local.assign(period=_period(local["quarter"]))
+             .merge(summary, on=["stock", "period"], how="left").drop(columns="period"))
+    rest = df[~df["stock"].isin(covered)]
+    if not rest.empty and provider is not None:
+        rest = add_yahoo_quarter_price_stats_batch(rest, submit=provider.submitter(),
+                                                   summary_dir=PRICES_DIR, provider=provider)
+    else:
+        rest = rest.assign(**{c: float("nan") for c in PRICE_COLUMNS})
+    out = pd.concat([local, rest]).sort_values("_row")
+    return out[columns].dropna().reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild data/ from saved Dataroma activity pages.")
+    parser.add_argument("pages", type=Path, help="Directory of saved m_activity.php pages")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Only these investors")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1,
+                        help="Parsing processes (default: all CPUs)")
+    parser.add_argument("--prices", type=Path, metavar="DIR",
+                        help="Daily closes for tickers prices/ does not cover (see providers.py)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only use prices/; drop tickers it does not cover instead of asking Yahoo")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Output directory (default data/)")
+    args = parser.parse_args()
+
+    found = find_pages(args.pages)
+    if args.only:
+        found = {k: v for k, v in found.items() if k in args.only}
+    if not found:
+        print(f"\n  {RED}No saved activity pages found in {args.pages}{RESET}\n")
+        return
+
+    n_files = sum(len(v) for v in found.values())
+    print(f"\n  {BOLD}{CYAN}Ingesting {n_files} saved pages for {len(found)} investors{RESET}  "
+          f"{DIM}({args.workers} processes){RESET}")
+    t0 = time.time()
+    jobs = sorted(found.items())
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            parsed = list(pool.map(parse_investor, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))))
+    else:
+        parsed = [parse_investor(job) for job in jobs]
+    frames = {name: df for name, df, _ in parsed if not df.empty}
+    print(f"  {DIM}Parsed in {time.time() - t0:.1f}s · "
+          f"{sum(len(df) for df in frames.values()):,} activities{RESET}\n")
+    for name, df, _ in parsed:
+        if df.empty:
+            print(f"  {RED}✗{RESET} {name}  {RED}no activity in saved pages{RESET}")
+    if not frames:
+        return
+
+    summary, covered = stored_prices(frames)
+    sched = HostScheduler({"yahoo": HostLimits(rate=4.0, concurrency=4, burst=4)})
+    provider = None if args.offline else get_provider(args.prices, sched)
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for name, df in frames.items():
+        out = enrich(df, summary, covered, provider)
+        if out.empty:
+            print(f"  {RED}✗{RESET} {name}  {RED}no usable data after pricing{RESET}")
+            continue
+        add_actions(out).to_csv(args.data_dir / f"{name}.csv", index=False)
+        written += 1
+        dropped = len(df) - len(out)
+        note = f", {dropped} without prices" if dropped else ""
+        print(f"  {GREEN}✓{RESET} {name}  {DIM}({len(out)} rows, {out['stock'].nunique()} tickers{note}){RESET}")
+    sched.shutdown()
+
+    print(f"\n  {BOLD}{'═' * 50}{RESET}")
+    print(f"  {GREEN}Done in {time.time() - t0:.1f}s{RESET}  {written} written to {args.data_dir}/  "
+          f"{DIM}(run compute_all_stats.py to update stats/){RESET}\n")
+    if written and args.data_dir == DATA_DIR:
+        meta = build_holdings_cube(DATA_DIR)
+        print(f"  {DIM}Holdings cube rebuilt → cube/ ({len(meta['investors'])} investors, "
+              f"{len(meta['quarters'])} quarters){RESET}\n")
+
+
+if __name__ == "__main__":
+    main()
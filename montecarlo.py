@@ -0,0 +1,437 @@
+"""
+Monte Carlo scenarios beyond best / avg / worst. Run from this directory.
+
+compute_stats prices every buy and sell at fixed quarter quantiles (best =
+buy at p10 and sell at p90, worst the reverse, avg at p50), which bounds a
+trade but says nothing about what lies in between. Here each buy and sell
+is priced at a random point of its quarter's price range instead — drawn
+from the piecewise-linear quantile curve through p10, p50 and p90 — for N
+draws. IRR, return and every rank_investors metric are computed per draw,
+all draws of an investor solved at once with numpy, and reported as
+confidence intervals per trade and per investor.
+
+Reads enriched activity from data/ (not stats/), since the draws need the
+per-quarter price ranges.
+"""
+
+import argparse
+import time
+import warnings
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from activity import is_buy
+from batch_metrics import metrics_batch
+from metrics import quarter_to_date
+from rank_investors import INVERSE_COLOR_METRICS, METRIC_LABELS, RATIO_METRICS, TRADE_METRICS, _drop_invalid_costs
+from trade_stats import episode_table
+
+warnings.filterwarnings("ignore")
+
+DATA_DIR = Path(__file__).parent / "data"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+XIRR_LO, XIRR_HI = -0.99, 10.0   # same bracket as metrics.compute_xirr
+XIRR_TOL = 1e-10
+XIRR_MAX_ITER = 60
+
+
+# ── cash-flow layout ────────────────────────────────────────────────────
+
+@dataclass
+class Flows:
+    """Every cash flow of one investor's episodes, flat and grouped by episode.
+
+    Per flow: *episode* index, *years* since the episode's first flow,
+    *sign* (-1 buy, +1 sell or open-position value), *size* (shares / 1e6)
+    and the price range *p10* / *p50* / *p90* (all equal for the
+    open-position flow). *starts* is each episode's first flow index.
+    """
+    labels: list[str]
+    periods: list[str]
+    holding: np.ndarray
+    holding_period: np.ndarray
+    episode: np.ndarray
+    starts: np.ndarray
+    years: np.ndarray
+    sign: np.ndarray
+    size: np.ndarray
+    p10: np.ndarray
+    p50: np.ndarray
+    p90: np.ndarray
+
+    def __len__(self):
+        return len(self.labels)
+
+    def scenario_costs(self) -> pd.DataFrame:
+        """cost_best / cost_worst / cost_avg per episode, as in compute_stats."""
+        buy = self.sign < 0
+        return pd.DataFrame({
+            f"cost_{mode}": np.bincount(self.episode[buy], (self.size * q)[buy], len(self))
+            for mode, q in (("best", self.p10), ("worst", self.p90), ("avg", self.p50))
+        })
+
+    def select(self, keep: np.ndarray) -> "Flows":
+        keep = np.asarray(keep, dtype=bool)
+        flow_keep = keep[self.episode]
+        new_index = np.cumsum(keep) - 1
+        episode = new_index[self.episode[flow_keep]]
+        counts = np.bincount(episode, minlength=int(keep.sum()))
+        return Flows(
+            labels=[l for l, k in zip(self.labels, keep) if k],
+            periods=[p for p, k in zip(self.periods, keep) if k],
+            holding=self.holding[keep],
+            holding_period=self.holding_period[keep],
+            episode=episode,
+            starts=np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(int),
+            years=self.years[flow_keep],
+            sign=self.sign[flow_keep],
+            size=self.size[flow_keep],
+            p10=self.p10[flow_keep],
+            p50=self.p50[flow_keep],
+            p90=self.p90[flow_keep],
+        )
+
+
+def build_flows(rows: pd.DataFrame, episodes: pd.DataFrame, current_prices: dict[str, float],
+                now: datetime) -> Flows:
+    """Lay out trade_stats.episode_table output as flat flow arrays.
+
+    Open positions get a final inflow at *now* valued at the ticker's price
+    in *current_prices*; without a price they get none, like compute_stats.
+    """
+    price = episodes["ticker"].map(current_prices)
+    open_eps = episodes[episodes["holding"] & price.notna()]
+    marks = pd.DataFrame({
+        "episode": open_eps.index,
+        "date": np.datetime64(now, "D"),
+        "sign": 1.0,
+        "size": open_eps["shares"].to_numpy(float) / 1e6,
+        **{f"price_{q}": price[open_eps.index].to_numpy(float) for q in ("p10", "p50", "p90")},
+    })
+    trades = pd.DataFrame({
+        "episode": rows["episode"],
+        "date": pd.to_datetime([quarter_to_date(q) for q in rows["quarter"]]).to_numpy("datetime64[D]"),
+        "sign": np.where(is_buy(rows["action"]), -1.0, 1.0),
+        "size": rows["shares"].to_numpy(float) / 1e6,
+        **{f"price_{q}": rows[f"price_{q}"].to_numpy(float) for q in ("p10", "p50", "p90")},
+    })
+    flows = pd.concat([trades, marks], ignore_index=True).sort_values("episode", kind="stable")
+    episode = flows["episode"].to_numpy(int)
+    dates = flows["date"].to_numpy("datetime64[D]")
+    first = flows.groupby("episode")["date"].transform("min").to_numpy("datetime64[D]")
+    counts = np.bincount(episode, minlength=len(episodes))
+    return Flows(
+        labels=episodes["label"].tolist(),
+        periods=episodes["period"].tolist(),
+        holding=episodes["holding"].to_numpy(bool),
+        holding_period=episodes["holding_period"].to_numpy(float),
+        episode=episode,
+        starts=np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(int),
+        years=(dates - first).astype(float) / 365.25,
+        sign=flows["sign"].to_numpy(float),
+        size=flows["size"].to_numpy(float),
+        p10=flows["price_p10"].to_numpy(float),
+        p50=flows["price_p50"].to_numpy(float),
+        p90=flows["price_p90"].to_numpy(float),
+    )
+
+
+# ── simulation ──────────────────────────────────────────────────────────
+
+def sample_prices(flows: Flows, u: np.ndarray) -> np.ndarray:
+    """Map uniform draws *u* (draws × flows) onto each flow's p10–p50–p90 range."""
+    low = flows.p10 + (flows.p50 - flows.p10) * (u / 0.5)
+    high = flows.p50 + (flows.p90 - flows.p50) * ((u - 0.5) / 0.5)
+    return np.where(u < 0.5, low, high)
+
+
+def batch_xirr(flows: Flows, amounts: np.ndarray) -> np.ndarray:
+    """compute_xirr for every (draw, episode) at once; returns draws × episodes.
+
+    Safeguarded Newton inside the same [-0.99, 10] bracket the scalar
+    version bisects, so a handful of iterations replace its ~40; episodes
+    without a sign change in the bracket fall back to the same
+    total-multiple annualisation.
+    """
+    ep, t, starts = flows.episode, flows.years, flows.starts
+    shape = (amounts.shape[0], len(flows))
+
+    def seg_sum(x):
+        return np.add.reduceat(x, starts, axis=1)
+
+    def npv(rate, with_slope=False):
+        disc = amounts * np.exp(-t * np.log1p(rate)[:, ep])
+        if not with_slope:
+            return seg_sum(disc)
+        return seg_sum(disc), -seg_sum(t * disc) / (1 + rate)
+
+    total_in = seg_sum(np.where(amounts > 0, amounts, 0.0))
+    total_out = -seg_sum(np.where(amounts < 0, amounts, 0.0))
+    valid = (total_in > 0) & (total_out > 0)
+    max_t = np.maximum.reduceat(np.broadcast_to(t, amounts.shape), starts, axis=1)
+    max_t = np.where(max_t > 0, max_t, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        multiple = (total_in / total_out) ** (1 / max_t) - 1
+
+        lo = np.full(shape, XIRR_LO)
+        hi = np.full(shape, XIRR_HI)
+        bracketed = npv(lo) * npv(hi) <= 0
+        x = np.clip(np.nan_to_num(multiple), XIRR_LO + 1e-6, XIRR_HI - 1e-6)
+        active = valid & bracketed
+        for _ in range(XIRR_MAX_ITER):
+            f, slope = npv(x, with_slope=True)
+            lo = np.where(f > 0, x, lo)
+            hi = np.where(f > 0, hi, x)
+            step = x - f / slope
+            step = np.where(np.isfinite(step) & (step >= lo) & (step <= hi), step, (lo + hi) / 2)
+            converged = np.abs(step - x) < XIRR_TOL
+            x = step
+            if converged[active].all():
+                break
+
+    return np.where(valid, np.where(bracketed, x, multiple), 0.0)
+
+
+def evaluate(flows: Flows, amounts: np.ndarray) -> dict[str, np.ndarray]:
+    """irr / cost / ret per episode for cash *amounts* shaped draws × flows."""
+    irr = batch_xirr(flows, amounts)
+    cost = -np.add.reduceat(np.where(amounts < 0, amounts, 0.0), flows.starts, axis=1)
+    inflows = np.add.reduceat(np.where(amounts > 0, amounts, 0.0), flows.starts, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(cost > 0, inflows / cost - 1, 0.0)
+    irr, ret = (np.where(np.isfinite(a), a, np.nan) for a in (irr, ret))
+    return {"irr": irr, "cost": cost, "ret": ret}
+
+
+def simulate(flows: Flows, draws: int, rng: np.random.Generator) -> dict[str, np.ndarray]:
+    """irr / cost / ret arrays shaped draws × episodes."""
+    u = rng.random((draws, len(flows.sign)))
+    return evaluate(flows, flows.sign * flows.size * sample_prices(flows, u))
+
+
+# ── inputs ──────────────────────────────────────────────────────────────
+
+def load_episodes(names: list[str], data_dir: Path = DATA_DIR) -> dict[str, tuple]:
+    """``episode_table(df)`` per investor with a data/ file."""
+    out = {}
+    for name in names:
+        path = data_dir / f"{name}.csv"
+        if path.exists():
+            out[name] = episode_table(pd.read_csv(path))
+    return out
+
+
+def offline_prices(data_dir: Path = DATA_DIR) -> dict[str, float]:
+    """Latest quarter's p50 per ticker across all data/ files."""
+    frames = [pd.read_csv(p, usecols=["quarter", "stock", "price_p50"]) for p in data_dir.glob("*.csv")]
+    if not frames:
+        return {}
+    df = pd.concat(frames, ignore_index=True)
+    df["_period"] = pd.PeriodIndex(
+        df["quarter"].str.replace(r"(Q[1-4])\s*(\d{4})", r"\2\1", regex=True), freq="Q"
+    )
+    latest = df.sort_values("_period").groupby("stock")["price_p50"].last()
+    return latest.to_dict()
+
+
+def live_prices(tickers: set[str], workers: int = 8) -> dict[str, float]:
+    from yahoo import fetch_current_price
+
+    tickers = sorted(tickers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        prices = pool.map(fetch_current_price, tickers)
+    return {t: p for t, p in zip(tickers, prices) if p is not None}
+
+
+def investor_flows(table: tuple, prices: dict[str, float], now: datetime,
+                   after_year: int | None = None) -> Flows:
+    """Flows for the episodes rank_investors would keep (same cost filter and year cut)."""
+    flows = build_flows(*table, prices, now)
+    costs = flows.scenario_costs()
+    keep = costs.index.isin(_drop_invalid_costs(costs).index)
+    if after_year is not None:
+        years = np.array([int(p.split()[1]) for p in flows.periods])
+        keep &= years > after_year
+    return flows.select(keep)
+
+
+def _rng(seed: int, name: str) -> np.random.Generator:
+    # Per-investor stream, so results do not depend on which others are run.
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+
+# ── summaries ───────────────────────────────────────────────────────────
+
+def _bounds(ci: float) -> tuple[float, float]:
+    tail = (100 - ci) / 2
+    return tail, 100 - tail
+
+
+def trade_intervals(flows: Flows, sim: dict[str, np.ndarray], ci: float = 90) -> pd.DataFrame:
+    lo, hi = _bounds(ci)
+    out = pd.DataFrame({
+        "period": flows.periods,
+        "ticker": flows.labels,
+        "holding_period": flows.holding_period,
+        "holding": flows.holding,
+    })
+    for key in ("irr", "ret", "cost"):
+        p = np.nanpercentile(sim[key], [lo, 50, hi], axis=0)
+        out[f"{key}_lo"], out[f"{key}_med"], out[f"{key}_hi"] = p
+    return out
+
+
+def investor_intervals(flows: Flows, sim: dict[str, np.ndarray], ci: float = 90) -> dict:
+    lo, hi = _bounds(ci)
+    m = metrics_batch(sim["irr"], sim["cost"], sim["ret"], flows.holding_period)
+    row = {"Num_Trades": len(flows)}
+    for metric in TRADE_METRICS:
+        vals = m[metric]
+        if np.isnan(vals).all():
+            row[f"{metric}_lo"] = row[metric] = row[f"{metric}_hi"] = np.nan
+            continue
+        row[f"{metric}_lo"], row[metric], row[f"{metric}_hi"] = np.nanpercentile(vals, [lo, 50, hi])
+    return row
+
+
+def run(
+    names: list[str],
+    draws: int = 1000,
+    seed: int = 0,
+    offline: bool = False,
+    after_year: int | None = None,
+    ci: float = 90,
+    data_dir: Path = DATA_DIR,
+) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    """(per-investor metric intervals, per-trade intervals by investor)."""
+    episodes = load_episodes(names, data_dir)
+    if offline:
+        prices = offline_prices(data_dir)
+    else:
+        open_tickers = {t for _, eps in episodes.values() for t in eps.loc[eps["holding"], "ticker"]}
+        prices = live_prices(open_tickers)
+    now = datetime.now()
+
+    rows, trades = [], {}
+    for name, table in episodes.items():
+        flows = investor_flows(table, prices, now, after_year)
+        if not len(flows):
+            continue
+        sim = simulate(flows, draws, _rng(seed, name))
+        rows.append({"Investor": name, **investor_intervals(flows, sim, ci)})
+        trades[name] = trade_intervals(flows, sim, ci)
+    return pd.DataFrame(rows), trades
+
+
+# ── output ──────────────────────────────────────────────────────────────
+
+def _fmt(val: float, metric: str, width: int = 8) -> str:
+    if pd.isna(val):
+        return f"{'n/a':>{width}s}"
+    txt = f"{val:+.2f}x" if metric in RATIO_METRICS else f"{val * 100:+.1f}%"
+    return f"{txt:>{width}s}"
+
+
+def _colored(val: float, metric: str, width: int = 8) -> str:
+    txt = _fmt(val, metric, width)
+    if pd.isna(val):
+        return f"{DIM}{txt}{RESET}"
+    good = val >= 1 if metric in RATIO_METRICS else val >= 0
+    if metric in INVERSE_COLOR_METRICS:
+        good = not good
+    return f"{GREEN if good else RED}{txt}{RESET}"
+
+
+def print_ranking(table: pd.DataFrame, metric: str, ci: float, k: int):
+    label = METRIC_LABELS.get(metric, metric)
+    ascending = metric == "Median_Return_Losers"
+    ranked = table.sort_values(metric, ascending=ascending, na_position="last").head(k)
+    print(f"  {BOLD}{'#':>3s} {'Investor':<28s} {'median':>8s}   {f'{ci:g}% interval':^19s}  {'Trades':>6s}{RESET}")
+    print(f"  {DIM}{'─' * 72}{RESET}")
+    for i, (_, row) in enumerate(ranked.iterrows()):
+        name = row["Investor"] if len(row["Investor"]) <= 28 else row["Investor"][:27] + "…"
+        band = f"[{_fmt(row[f'{metric}_lo'], metric).strip()}, {_fmt(row[f'{metric}_hi'], metric).strip()}]"
+        print(f"  {i + 1:>3d} {name:<28s} {_colored(row[metric], metric)}   "
+              f"{DIM}{band:^19s}{RESET}  {DIM}{int(row['Num_Trades']):>6d}{RESET}")
+    print(f"\n  {DIM}Ranked by the median of {label} over all draws.{RESET}\n")
+
+
+def print_investor(name: str, row: pd.Series, trades: pd.DataFrame, ci: float, k: int):
+    print(f"  {BOLD}{name}{RESET}  {DIM}{int(row['Num_Trades'])} trades{RESET}\n")
+    print(f"  {BOLD}{'Metric':<20s} {'median':>8s}   {f'{ci:g}% interval':^19s}{RESET}")
+    for metric in TRADE_METRICS:
+        band = f"[{_fmt(row[f'{metric}_lo'], metric).strip()}, {_fmt(row[f'{metric}_hi'], metric).strip()}]"
+        print(f"  {METRIC_LABELS.get(metric, metric):<20s} {_colored(row[metric], metric)}   "
+              f"{DIM}{band:^19s}{RESET}")
+    print()
+    trades = trades.sort_values("irr_med", ascending=False)
+    print(f"  {BOLD}{'Ticker':<10s} {'Bought':<8s} {'IRR':>8s}   {'interval':^19s} "
+          f"{'Return':>8s}   {'interval':^19s}{RESET}")
+    for _, t in pd.concat([trades.head(k), trades.tail(k)]).drop_duplicates("ticker").iterrows():
+        irr_band = f"[{_fmt(t['irr_lo'], 'irr').strip()}, {_fmt(t['irr_hi'], 'irr').strip()}]"
+        ret_band = f"[{_fmt(t['ret_lo'], 'ret').strip()}, {_fmt(t['ret_hi'], 'ret').strip()}]"
+        mark = "*" if t["holding"] else " "
+        print(f"  {t['ticker']:<9s}{mark} {t['period']:<8s} {_colored(t['irr_med'], 'irr')}   "
+              f"{DIM}{irr_band:^19s}{RESET} {_colored(t['ret_med'], 'ret')}   {DIM}{ret_band:^19s}{RESET}")
+    print(f"\n  {DIM}Top and bottom {k} trades by median IRR; * = still held.{RESET}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo confidence intervals for trades and investors.")
+    parser.add_argument("investor", nargs="?", help="Show one investor's metrics and per-trade intervals")
+    parser.add_argument("--draws", "-n", type=int, default=1000, help="Price draws per trade (default 1000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ci", type=float, default=90, help="Interval width in percent (default 90)")
+    parser.add_argument("--metric", "-m", default="Weighted_Return", choices=TRADE_METRICS)
+    parser.add_argument("--min-trades", type=int, default=5)
+    parser.add_argument("--topk", "-k", type=int, default=10)
+    parser.add_argument("--after-year", type=int, default=None, metavar="YEAR",
+                        help="Use only stocks first bought after this year")
+    parser.add_argument("--offline", action="store_true",
+                        help="Value open positions at their latest quarterly p50 instead of a live price")
+    parser.add_argument("--output", type=Path, metavar="PATH",
+                        help="Also write the per-investor (or per-trade) intervals to this CSV")
+    args = parser.parse_args()
+
+    names = [args.investor] if args.investor else sorted(p.stem for p in DATA_DIR.glob("*.csv"))
+    if args.investor and not (DATA_DIR / f"{args.investor}.csv").exists():
+        print(f"  {RED}No data/{args.investor}.csv — run fetch_all_data.py --only \"{args.investor}\"{RESET}")
+        return
+
+    print(f"\n  {BOLD}{CYAN}MONTE CARLO{RESET}  {DIM}{args.draws} draws · {len(names)} investors · "
+          f"{'offline prices' if args.offline else 'live prices'}"
+          f"{f' · after_year={args.after_year}' if args.after_year else ''}{RESET}\n")
+    t0 = time.time()
+    table, trades = run(names, args.draws, args.seed, args.offline, args.after_year, args.ci)
+    if table.empty:
+        print(f"  {RED}No usable trades.{RESET}\n")
+        return
+
+    if args.investor:
+        print_investor(args.investor, table.iloc[0], trades[args.investor], args.ci, args.topk)
+        out = trades[args.investor]
+    else:
+        table = table[table["Num_Trades"] >= args.min_trades]
+        print_ranking(table, args.metric, args.ci, args.topk)
+        out = table
+    print(f"  {DIM}{time.time() - t0:.1f}s{RESET}\n")
+    if args.output:
+        out.to_csv(args.output, index=False)
+        print(f"  {DIM}Saved → {args.output}{RESET}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Persistent negative cache for Yahoo lookups.
+
+Delisted and unknown symbols return nothing from Yahoo, but finding that
+out costs a full round trip on every run and for every investor that ever
+traded them. data/.unpriceable.json records each ticker that failed, with
+the reason, when it first and last failed and when to try again. The wait
+starts at a day and doubles with every consecutive failure up to 90 days,
+so a symbol that comes back is picked up eventually; a success removes
+the entry. Rate limits and network errors say nothing about the symbol
+and are never recorded.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from scheduler import rate_limit_delay
+
+CACHE_PATH = Path(__file__).parent / "data" / ".unpriceable.json"
+BASE_RECHECK_HOURS = 24
+MAX_RECHECK_DAYS = 90
+
+
+TRANSIENT_WORDS = ("timeout", "timed out", "connection", "temporarily", "dnserror",
+                   "could not resolve", "curl: (")
+
+
+def is_transient_message(text: str) -> bool:
+    """True if an error message (e.g. one of yfinance's per-ticker errors) reads as a network failure."""
+    text = text.lower()
+    return any(w in text for w in TRANSIENT_WORDS)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for failures that say nothing about the ticker (throttling, network).
+
+    The whole ``__cause__``/``__context__`` chain is checked: yfinance
+    re-raises some connection errors as ticker errors.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if rate_limit_delay(exc) is not None or isinstance(exc, OSError):
+            return True
+        if is_transient_message(f"{type(exc).__name__} {exc}"):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def recheck_delay(failures: int) -> float:
+    """Seconds to wait before retrying a ticker that failed *failures* times in a row."""
+    hours = BASE_RECHECK_HOURS * 2 ** max(failures - 1, 0)
+    return min(hours, MAX_RECHECK_DAYS * 24) * 3600
+
+
+class NegativeCache:
+    def __init__(self, path: Path = CACHE_PATH):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._entries, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+
+    def skip(self, ticker: str) -> bool:
+        """True while *ticker* failed before and is not yet due for a recheck."""
+        with self._lock:
+            entry = self._load().get(ticker)
+        return entry is not None and time.time() < entry["recheck_after"]
+
+    def entry(self, ticker: str) -> dict | None:
+        with self._lock:
+            return self._load().get(ticker)
+
+    def record_failure(self, ticker: str, reason: str):
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            old = entries.get(ticker)
+            failures = old["failures"] + 1 if old else 1
+            entries[ticker] = {
+                "reason": reason,
+                "first_failed": old["first_failed"] if old else now,
+                "last_failed": now,
+                "failures": failures,
+                "recheck_after": now + recheck_delay(failures),
+            }
+            self._save()
+
+    def record_success(self, ticker: str):
+        with self._lock:
+            if self._load().pop(ticker, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self.path.unlink(missing_ok=True)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
@@ -0,0 +1,99 @@
+"""
+Bounded-queue stage pipeline.
+
+Items are ``(key, value)`` pairs. Each stage runs ``fn(key, value)`` on its
+own worker threads and passes the return value to the next stage through a
+bounded queue, so stages overlap across keys and a slow stage applies
+backpressure instead of buffering everything. Returning None drops the
+item; an exception is reported through *on_error* and drops it too, as is
+one raised by *on_result*.
+"""
+
+import queue
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Callable
+
+from profiling import span
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[str, object], object]
+    workers: int = 1
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: list[Stage],
+        queue_size: int = 4,
+        on_result: Callable[[str, object], None] | None = None,
+        on_error: Callable[[str, str, Exception], None] | None = None,
+    ):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.on_result = on_result or (lambda key, value: None)
+        self.on_error = on_error or (lambda stage, key, exc: None)
+        self._remaining = [s.workers for s in stages]
+        self._lock = threading.Lock()
+
+    def _report(self, stage: str, key: str, exc: Exception):
+        try:
+            self.on_error(stage, key, exc)
+        except Exception:
+            traceback.print_exc()    # a broken callback must not take the worker down
+
+    def _worker(self, i: int):
+        stage = self.stages[i]
+        inbox = self.queues[i]
+        last = i == len(self.stages) - 1
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                key, value = item
+                try:
+                    with span(f"stage.{stage.name}", key):
+                        out = stage.fn(key, value)
+                except Exception as e:
+                    self._report(stage.name, key, e)
+                    continue
+                if out is None:
+                    continue
+                if last:
+                    try:
+                        self.on_result(key, out)
+                    except Exception as e:
+                        self._report(stage.name, key, e)
+                else:
+                    self.queues[i + 1].put((key, out))
+        finally:
+            # always hand shutdown on, or the next stage waits forever
+            with self._lock:
+                self._remaining[i] -= 1
+                finished = self._remaining[i] == 0
+            if finished and not last:
+                for _ in range(self.stages[i + 1].workers):
+                    self.queues[i + 1].put(_DONE)
+
+    def run(self, items):
+        """Feed ``(key, value)`` items through every stage; returns when all are done."""
+        threads = [
+            threading.Thread(target=self._worker, args=(i,), name=f"{stage.name}-{w}", daemon=True)
+            for i, stage in enumerate(self.stages)
+            for w in range(stage.workers)
+        ]
+        for t in threads:
+            t.start()
+        for item in items:
+            self.queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            self.queues[0].put(_DONE)
+        for t in threads:
+            t.join()
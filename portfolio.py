@@ -0,0 +1,304 @@
+"""
+Quarterly portfolio NAV and path metrics. Run from this directory.
+
+Per-trade stats say nothing about how an investor's book behaved as a
+whole. Here every investor's holdings are rebuilt quarter by quarter from
+data/ (the trades compute_stats keeps: episodes that start with a Buy)
+and marked to the quarter-end close in prices/, falling back to the
+quarter's p50 from data/ for tickers without a stored summary.
+
+All investors live in one (investor × ticker) × quarter position matrix.
+Positions change at quarter end, as 13F filings report them, so quarter q's
+return is the price move of the book held at the end of q-1:
+
+    r[q] = Σ pos[q-1] · (price[q] - price[q-1]) / Σ pos[q-1] · price[q-1]
+
+Chaining r gives a NAV series (1.0 at the first invested quarter) and the
+path metrics rank_investors can sort by: TWR (time-weighted return,
+annualized), Max_Drawdown and Quarterly_Vol.
+
+    python portfolio.py                       # path metrics for every investor
+    python portfolio.py "Warren Buffett"      # NAV series of one investor
+"""
+
+import argparse
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from activity import is_buy, is_close
+from price_summary import PRICES_DIR, load_summaries
+from trade_stats import _quarter_index, episode_table
+
+warnings.filterwarnings("ignore")
+
+DATA_DIR = Path(__file__).parent / "data"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+PATH_METRICS = ["TWR", "Max_Drawdown", "Quarterly_Vol"]
+
+
+def _ffill(a: np.ndarray) -> np.ndarray:
+    """Forward-fill NaN along axis 1."""
+    idx = np.where(np.isnan(a), 0, np.arange(a.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return a[np.arange(a.shape[0])[:, None], idx]
+
+
+def _period_label(qidx: int) -> str:
+    year, q = divmod(int(qidx) - 1, 4)
+    return f"{year}Q{q + 1}"
+
+
+@dataclass
+class Panel:
+    """Positions and prices of all investors on one quarter grid.
+
+    *positions* is (rows, quarters): shares held at each quarter end, one
+    row per investor and episode, rows grouped by investor (*row_starts*
+    is each investor's first row). *prices* is (tickers, quarters) and
+    *row_ticker* indexes it. *q0* is the quarter index of column 0.
+    """
+    investors: list[str]
+    tickers: list[str]
+    q0: int
+    row_starts: np.ndarray
+    row_ticker: np.ndarray
+    positions: np.ndarray
+    prices: np.ndarray
+
+    @property
+    def quarters(self) -> list[str]:
+        return [_period_label(self.q0 + i) for i in range(self.positions.shape[1])]
+
+
+def _position_levels(rows: pd.DataFrame) -> pd.DataFrame:
+    """Shares held after each activity row of episode_table(df) rows."""
+    signed = np.where(is_buy(rows["action"]), rows["shares"], -rows["shares"])
+    level = pd.Series(signed, index=rows.index).groupby(rows["episode"]).cumsum()
+    level[is_close(rows["action"])] = 0
+    return rows[["episode", "stock"]].assign(
+        qidx=_quarter_index(rows["quarter"]), level=level.clip(lower=0)
+    )
+
+
+def load_data_frames(names: list[str] | None = None, data_dir: Path = DATA_DIR) -> dict[str, pd.DataFrame]:
+    """data/ frames of *names* (default: every investor)."""
+    paths = [data_dir / f"{n}.csv" for n in names] if names else sorted(data_dir.glob("*.csv"))
+    return {p.stem: pd.read_csv(p, keep_default_na=False, na_values=[""]) for p in paths if p.exists()}
+
+
+def load_levels(frames: dict[str, pd.DataFrame]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(levels, data prices) from data/ frames keyed by investor.
+
+    *levels* has investor, row (global episode id), stock, qidx, level;
+    *data prices* the p50 per stock and quarter index.
+    """
+    levels, p50 = [], []
+    next_row = 0
+    for name, df in frames.items():
+        if df.empty:
+            continue
+        rows, episodes = episode_table(df)
+        if rows.empty:
+            continue
+        lv = _position_levels(rows)
+        lv["row"] = lv["episode"] + next_row
+        lv["investor"] = name
+        next_row += len(episodes)
+        levels.append(lv)
+        if "price_p50" in df.columns:
+            p50.append(pd.DataFrame({
+                "stock": df["stock"], "qidx": _quarter_index(df["quarter"]), "price": df["price_p50"],
+            }))
+    if not levels:
+        return pd.DataFrame(columns=["investor", "row", "stock", "qidx", "level"]), pd.DataFrame()
+    return pd.concat(levels, ignore_index=True), pd.concat(p50, ignore_index=True)
+
+
+def build_panel(levels: pd.DataFrame, data_prices: pd.DataFrame, prices_dir: Path = PRICES_DIR,
+                last_q: int | None = None) -> Panel:
+    """Dense position and price matrices from load_levels output.
+
+    The grid ends at *last_q* (default: the latest quarter with a price),
+    so quarters nobody has priced yet don't count as flat returns.
+    """
+    tickers = sorted(levels["stock"].unique())
+    stored = load_summaries(tickers, prices_dir, ["price_last"]).dropna(subset=["price_last"])
+    period = stored["period"].astype(str)
+    stored_q = period.str[:4].astype(int) * 4 + period.str[-1].astype(int)
+    if last_q is None:
+        last_q = int(max(levels["qidx"].max(), stored_q.max() if len(stored_q) else 0))
+    q0 = int(levels["qidx"].min())
+    n_q = last_q - q0 + 1
+    per_row = levels.drop_duplicates("row").set_index("row").sort_index()
+    n_rows = len(per_row)
+    investors = list(dict.fromkeys(per_row["investor"]))
+
+    # one level per (row, quarter): the last activity of the quarter wins
+    last = levels.drop_duplicates(["row", "qidx"], keep="last")
+    positions = np.full((n_rows, n_q), np.nan)
+    positions[last["row"].to_numpy(), last["qidx"].to_numpy() - q0] = last["level"].to_numpy()
+    positions = np.nan_to_num(_ffill(positions), nan=0.0)
+
+    ticker_id = pd.Series(np.arange(len(tickers)), index=tickers)
+    prices = np.full((len(tickers), n_q), np.nan)
+    fallback = data_prices.dropna(subset=["price"])
+    fallback = fallback[fallback["qidx"].between(q0, last_q) & fallback["stock"].isin(ticker_id.index)]
+    prices[ticker_id[fallback["stock"]].to_numpy(), fallback["qidx"].to_numpy() - q0] = fallback["price"].to_numpy()
+    inside = stored_q.between(q0, last_q).to_numpy()
+    prices[ticker_id[stored.loc[inside, "stock"]].to_numpy(), stored_q[inside].to_numpy() - q0] = \
+        stored.loc[inside, "price_last"].to_numpy()
+
+    row_starts = np.flatnonzero(per_row["investor"].ne(per_row["investor"].shift()).to_numpy())
+    row_ticker = ticker_id[per_row["stock"]].to_numpy()
+    return Panel(investors, tickers, q0, row_starts, row_ticker, positions, _ffill(prices))
+
+
+def quarterly_returns(panel: Panel) -> np.ndarray:
+    """(investors, quarters) time-weighted quarterly returns; NaN while nothing is held."""
+    price = panel.prices[panel.row_ticker]
+    prev_pos, prev_px, px = panel.positions[:, :-1], price[:, :-1], price[:, 1:]
+    priced = np.isfinite(prev_px) & np.isfinite(px) & (prev_pos > 0)
+    value = np.where(priced, prev_pos * prev_px, 0.0)
+    gain = np.where(priced, prev_pos * (px - prev_px), 0.0)
+    value = np.add.reduceat(value, panel.row_starts, axis=0)
+    gain = np.add.reduceat(gain, panel.row_starts, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.where(value > 0, gain / value, np.nan)
+    return np.hstack([np.full((len(panel.investors), 1), np.nan), r])
+
+
+def nav_series(returns: np.ndarray) -> np.ndarray:
+    """NAV per quarter from quarterly_returns: 1.0 before the first invested quarter."""
+    return np.cumprod(1 + np.nan_to_num(returns), axis=1)
+
+
+def path_metrics(panel: Panel, after_year: int | None = None) -> pd.DataFrame:
+    """TWR (annualized), Max_Drawdown and Quarterly_Vol per investor.
+
+    With *after_year*, only quarters from the following year on count.
+    """
+    r = quarterly_returns(panel)
+    if after_year is not None:
+        start = (after_year + 1) * 4 + 1 - panel.q0
+        r[:, : max(start, 0)] = np.nan
+    n = (~np.isnan(r)).sum(axis=1)
+    nav = nav_series(r)
+    growth = nav[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        twr = np.where(n > 0, growth ** (4 / np.maximum(n, 1)) - 1, np.nan)
+    drawdown = nav / np.maximum.accumulate(nav, axis=1) - 1
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        vol = np.nanstd(r, axis=1, ddof=1)
+    return pd.DataFrame({
+        "Investor": panel.investors,
+        "TWR": twr,
+        "Total_TWR": growth - 1,
+        "Max_Drawdown": np.where(n > 0, drawdown.min(axis=1), np.nan),
+        "Quarterly_Vol": np.where(n > 1, vol, np.nan),
+        "Quarters": n,
+    })
+
+
+def investor_path_metrics(frames: dict[str, pd.DataFrame] | None = None, after_year: int | None = None,
+                          prices_dir: Path = PRICES_DIR) -> pd.DataFrame:
+    """path_metrics for data/ *frames* (default: every data/ file) and prices/."""
+    levels, data_prices = load_levels(load_data_frames() if frames is None else frames)
+    if levels.empty:
+        return pd.DataFrame(columns=["Investor", "Total_TWR", "Quarters"] + PATH_METRICS)
+    return path_metrics(build_panel(levels, data_prices, prices_dir), after_year)
+
+
+def path_metrics_sweep(years: list[int], frames: dict[str, pd.DataFrame] | None = None,
+                       prices_dir: Path = PRICES_DIR) -> pd.DataFrame:
+    """path_metrics for every --after-year cutoff in *years*, from one panel."""
+    levels, data_prices = load_levels(load_data_frames() if frames is None else frames)
+    if levels.empty:
+        return pd.DataFrame(columns=["After_Year", "Investor"] + PATH_METRICS)
+    panel = build_panel(levels, data_prices, prices_dir)
+    return pd.concat([path_metrics(panel, y).assign(After_Year=y) for y in years], ignore_index=True)
+
+
+# ── output ──────────────────────────────────────────────────────────────
+
+def _pct(val: float, width: int = 9, inverse: bool = False) -> str:
+    if pd.isna(val):
+        return f"{DIM}{'n/a':>{width}s}{RESET}"
+    col = (RED if val >= 0 else GREEN) if inverse else (GREEN if val >= 0 else RED)
+    return f"{col}{f'{val * 100:+.1f}%':>{width}s}{RESET}"
+
+
+def print_metrics(metrics: pd.DataFrame, sort_by: str):
+    metrics = metrics.sort_values(sort_by, ascending=sort_by == "Quarterly_Vol", na_position="last")
+    print()
+    print(f"  {BOLD}{CYAN}PORTFOLIO PATH METRICS{RESET}  {DIM}sorted by {sort_by}, {len(metrics)} investors{RESET}")
+    sep = "─" * 80
+    print(f"  {DIM}{sep}{RESET}")
+    print(f"  {DIM}{'Investor':<28s} │ {'TWR/yr':>9s} │ {'TWR':>9s} │ {'Max DD':>9s} │ {'Q.Vol':>9s} │ {'Qtrs':>4s}{RESET}")
+    print(f"  {DIM}{sep}{RESET}")
+    for _, row in metrics.iterrows():
+        name = row["Investor"] if len(row["Investor"]) <= 28 else row["Investor"][:27] + "…"
+        print(f"  {name:<28s} │ {_pct(row['TWR'])} │ {_pct(row['Total_TWR'])} │ "
+              f"{_pct(row['Max_Drawdown'])} │ {DIM}{_pct(row['Quarterly_Vol'])}{RESET} │ "
+              f"{DIM}{int(row['Quarters']):>4d}{RESET}")
+    print()
+
+
+def print_nav(panel: Panel, investor: str):
+    i = panel.investors.index(investor)
+    r = quarterly_returns(panel)[i]
+    nav = nav_series(r[None, :])[0]
+    drawdown = nav / np.maximum.accumulate(nav) - 1
+    first = np.flatnonzero(~np.isnan(r))
+    if not len(first):
+        print(f"\n  {DIM}No priced holdings for {investor}.{RESET}\n")
+        return
+    quarters = panel.quarters
+    print()
+    print(f"  {BOLD}{CYAN}NAV{RESET}  {BOLD}{investor}{RESET}  {DIM}(1.00 at {quarters[first[0] - 1]}){RESET}")
+    print(f"  {DIM}{'Quarter':<8s} │ {'NAV':>7s} │ {'Return':>9s} │ {'Drawdown':>9s}{RESET}")
+    for q in range(first[0] - 1, len(quarters)):
+        print(f"  {quarters[q]:<8s} │ {nav[q]:>7.2f} │ {_pct(r[q])} │ {_pct(drawdown[q], inverse=False)}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quarterly portfolio NAV and path metrics from data/ + prices/.")
+    parser.add_argument("investor", nargs="?", help="Print this investor's NAV series")
+    parser.add_argument("--sort", default="TWR", choices=PATH_METRICS)
+    parser.add_argument("--after-year", type=int, default=None, metavar="YEAR",
+                        help="Only count quarters from the following year on")
+    parser.add_argument("--output", type=Path, default=None, metavar="CSV",
+                        help="Write the metrics (or the investor's NAV series) to CSV")
+    args = parser.parse_args()
+
+    if args.investor:
+        levels, data_prices = load_levels(load_data_frames([args.investor]))
+        if levels.empty:
+            parser.error(f"no data/ activity for {args.investor!r}")
+        panel = build_panel(levels, data_prices)
+        print_nav(panel, args.investor)
+        if args.output:
+            r = quarterly_returns(panel)
+            pd.DataFrame({"quarter": panel.quarters, "return": r[0], "nav": nav_series(r)[0]}).to_csv(
+                args.output, index=False)
+        return
+    metrics = investor_path_metrics(after_year=args.after_year)
+    print_metrics(metrics, args.sort)
+    if args.output:
+        metrics.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Per-ticker quarterly price summaries and local scenario recompute.
+
+For every ticker it downloads, fetch_all_data keeps a compact summary in
+prices/<TICKER>.csv — one row per quarter with the daily-close quantile
+grid (p0, p5, … p100), first and last close, mean close and trading-day
+count — instead of only the p10/p50/p90 it merges into data/. Any buy/sell
+price scenario can then be recomputed from data/ + prices/ without going
+back to Yahoo:
+
+    --mode p25/p75     buy at the quarter's 25th percentile, sell at the 75th
+    --mode mean/mean   buy and sell at the quarter's mean close
+    --mode last/last   quarter close
+
+Quantiles between grid points are interpolated linearly. Open positions
+are valued at the last stored close. Results are cached per scenario in
+stats/.scenarios/<scenario>/ until data/ or prices/ change.
+
+    python price_summary.py --backfill         # summaries for every ticker in data/
+    python price_summary.py --show AAPL
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from tickers import normalize_ticker
+from trade_stats import MODES, compute_stats, episode_table
+from yahoo import SUMMARY_COLUMNS
+
+ROOT = Path(__file__).parent
+DATA_DIR = ROOT / "data"
+STATS_DIR = ROOT / "stats"
+PRICES_DIR = ROOT / "prices"
+SCENARIO_DIR = STATS_DIR / ".scenarios"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+RED   = "\033[31m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+_POINTS = {"mean": "price_mean", "first": "price_first", "last": "price_last", "close": "price_last"}
+_write_lock = threading.Lock()
+
+
+# ── scenario names ──────────────────────────────────────────────────────
+
+def price_column(point: str) -> str:
+    """'p25' / 'mean' / 'first' / 'last' (or 'close') -> summary column name."""
+    point = point.strip().lower()
+    if point in _POINTS:
+        return _POINTS[point]
+    m = re.fullmatch(r"p(\d+(?:\.\d+)?)", point)
+    if m and 0 <= float(m.group(1)) <= 100:
+        return f"price_p{float(m.group(1)):g}"
+    raise ValueError(f"unknown price point {point!r} (use pNN, mean, first or last)")
+
+
+def mode_columns(mode: str) -> tuple[str, str]:
+    """(buy price column, sell price column) for a standard or custom mode."""
+    if mode in MODES:
+        return MODES[mode]
+    parts = re.split(r"[/_]", mode)
+    if len(parts) != 2:
+        raise ValueError(f"mode must be avg, best, worst or BUY/SELL like p25/p75, got {mode!r}")
+    return price_column(parts[0]), price_column(parts[1])
+
+
+def mode_label(mode: str) -> str:
+    """Canonical scenario name used in column names: 'avg', 'p25_p75', 'mean_last'."""
+    if mode in MODES:
+        return mode
+    buy, sell = mode_columns(mode)
+    return f"{buy.removeprefix('price_')}_{sell.removeprefix('price_')}"
+
+
+def mode_arg(text: str) -> str:
+    """argparse ``type=`` for --mode."""
+    try:
+        return mode_label(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def is_custom(mode: str) -> bool:
+    return mode not in MODES
+
+
+# ── store ───────────────────────────────────────────────────────────────
+
+def _path(ticker: str, prices_dir: Path) -> Path:
+    return prices_dir / f"{re.sub(r'[^A-Za-z0-9._-]', '_', ticker)}.csv"
+
+
+def save_summaries(summaries: pd.DataFrame, prices_dir: Path = PRICES_DIR, ticker_col: str = "stock"):
+    """Merge quarter_price_summary rows into prices/<TICKER>.csv (new quarters win)."""
+    summaries = summaries[summaries["n_days"] > 0]
+    if summaries.empty:
+        return
+    prices_dir.mkdir(parents=True, exist_ok=True)
+    for ticker, new in summaries.groupby(ticker_col):
+        new = new[["period"] + SUMMARY_COLUMNS].assign(period=new["period"].astype(str))
+        path = _path(ticker, prices_dir)
+        with _write_lock:
+            if path.exists():
+                old = pd.read_csv(path)
+                new = pd.concat([old[~old["period"].isin(new["period"])], new])
+            tmp = path.with_name(path.name + ".tmp")
+            new.sort_values("period").to_csv(tmp, index=False, float_format="%.6g")
+            os.replace(tmp, path)
+
+
+def load_summary(ticker: str, prices_dir: Path = PRICES_DIR, columns: list[str] | None = None) -> pd.DataFrame | None:
+    path = _path(ticker, prices_dir)
+    usecols = ["period"] + columns if columns else None
+    return pd.read_csv(path, usecols=usecols) if path.exists() else None
+
+
+def load_summaries(tickers, prices_dir: Path = PRICES_DIR, columns: list[str] | None = None) -> pd.DataFrame:
+    """Stored summaries of *tickers* stacked, with a ``stock`` column; period as '2020Q1'.
+
+    *columns* limits the summary columns read (period is always included).
+    """
+    frames = []
+    for ticker in tickers:
+        summary = load_summary(ticker, prices_dir, columns)
+        if summary is not None:
+            frames.append(summary.assign(stock=ticker))
+    if not frames:
+        return pd.DataFrame(columns=["stock", "period"] + (columns or SUMMARY_COLUMNS))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _interpolate(summary: pd.DataFrame, col: str) -> pd.Series:
+    if col in summary.columns:
+        return summary[col]
+    q = float(col.removeprefix("price_p"))
+    lo = min(int(q // 5) * 5, 95)
+    w = (q - lo) / 5
+    return (1 - w) * summary[f"price_p{lo}"] + w * summary[f"price_p{lo + 5}"]
+
+
+def add_scenario_prices(df: pd.DataFrame, mode: str, prices_dir: Path = PRICES_DIR) -> pd.DataFrame:
+    """*df* (a data/ frame) plus the price columns *mode* needs, from the store."""
+    needed = [c for c in dict.fromkeys(mode_columns(mode)) if c not in df.columns]
+    if not needed:
+        return df
+    summary = load_summaries(df["stock"].unique(), prices_dir)
+    cols = pd.DataFrame({c: _interpolate(summary, c) for c in needed})
+    cols["stock"] = summary["stock"]
+    cols["_period"] = summary["period"].astype(str)
+    period = df["quarter"].str.replace(r"(Q[1-4])\s*(\d{4})", r"\2\1", regex=True)
+    out = df.assign(_period=period).merge(cols, on=["stock", "_period"], how="left")
+    return out.drop(columns="_period")
+
+
+def last_close(tickers, prices_dir: Path = PRICES_DIR) -> dict[str, float]:
+    """Latest stored quarter's last close per ticker."""
+    summary = load_summaries(tickers, prices_dir, ["price_last"]).dropna(subset=["price_last"])
+    return summary.sort_values("period").groupby("stock")["price_last"].last().to_dict()
+
+
+# ── scenario recompute ──────────────────────────────────────────────────
+
+def scenario_path(investor: str, mode: str) -> Path:
+    return SCENARIO_DIR / mode_label(mode) / f"{investor}.csv"
+
+
+def scenario_stats(
+    investor: str,
+    mode: str,
+    data_dir: Path = DATA_DIR,
+    prices_dir: Path = PRICES_DIR,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """compute_stats for *investor* with best/worst/avg plus *mode*, from local files.
+
+    Trades with a quarter that has no stored summary are dropped, since
+    they cannot be priced under the scenario.
+    """
+    label = mode_label(mode)
+    data_path = data_dir / f"{investor}.csv"
+    if not data_path.exists():
+        raise FileNotFoundError(data_path)
+    cache = scenario_path(investor, label)
+    inputs_mtime = max(data_path.stat().st_mtime, prices_dir.stat().st_mtime if prices_dir.exists() else 0)
+    if not refresh and cache.exists() and cache.stat().st_mtime >= inputs_mtime:
+        return pd.read_csv(cache)
+
+    buy_col, sell_col = mode_columns(label)
+    frame = add_scenario_prices(pd.read_csv(data_path), label, prices_dir)
+    prices = last_close(frame["stock"].unique(), prices_dir)
+    stats = compute_stats(frame, price_fn=prices.get, modes={**MODES, label: (buy_col, sell_col)})
+
+    missing = frame[[buy_col, sell_col]].isna().any(axis=1)
+    if missing.any() and not stats.empty:
+        rows, episodes = episode_table(frame.assign(missing_price=missing))
+        unpriced = episodes.loc[rows.loc[rows["missing_price"], "episode"].unique(), "label"]
+        stats = stats[~stats["ticker"].isin(unpriced)]
+
+    if not stats.empty:    # nothing priced yet: recompute once prices/ is backfilled
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        stats.to_csv(cache, index=False)
+    return stats
+
+
+def scenario_frames(mode: str, names: list[str] | None = None, data_dir: Path = DATA_DIR,
+                    prices_dir: Path = PRICES_DIR) -> dict[str, pd.DataFrame]:
+    """scenario_stats for every investor with a data/ file (or *names*)."""
+    if names is None:
+        names = sorted(p.stem for p in data_dir.glob("*.csv"))
+    return {name: scenario_stats(name, mode, data_dir, prices_dir) for name in names
+            if (data_dir / f"{name}.csv").exists()}
+
+
+# ── backfill ────────────────────────────────────────────────────────────
+
+def ticker_ranges(data_dir: Path = DATA_DIR) -> pd.DataFrame:
+    """First and last quarter each ticker appears in across data/."""
+    frames = [pd.read_csv(p, usecols=["quarter", "stock"]) for p in data_dir.glob("*.csv")]
+    df = pd.concat(frames, ignore_index=True)
+    df["period"] = pd.PeriodIndex(
+        df["quarter"].str.replace(r"(Q[1-4])\s*(\d{4})", r"\2\1", regex=True), freq="Q"
+    )
+    return df.groupby("stock")["period"].agg(["min", "max"])
+
+
+def backfill(tickers: list[str] | None, refresh: bool, rate: float, concurrency: int,
+             data_dir: Path = DATA_DIR, prices_dir: Path = PRICES_DIR):
+    from scheduler import HostLimits, HostScheduler
+    from yahoo import ticker_quarter_stats
+
+    ranges = ticker_ranges(data_dir)
+    if tickers:
+        ranges = ranges.loc[ranges.index.intersection(tickers)]
+    if not refresh:
+        ranges = ranges[[not _path(t, prices_dir).exists() for t in ranges.index]]
+    print(f"\n  {BOLD}{CYAN}Price summaries{RESET}  {DIM}{len(ranges)} tickers to download → {prices_dir}/{RESET}\n")
+    if ranges.empty:
+        return
+
+    sched = HostScheduler({"yahoo": HostLimits(rate=rate, concurrency=concurrency, burst=4)})
+    t0 = time.time()
+    futures = {
+        t: sched.submit("yahoo", ticker_quarter_stats, t, r["min"].start_time, r["max"].end_time,
+                        pd.period_range(r["min"], r["max"], freq="Q"))
+        for t, r in ranges.iterrows()
+    }
+    stored = failed = 0
+    for i, (ticker, future) in enumerate(futures.items(), 1):
+        try:
+            summary = future.result()
+        except Exception as e:
+            failed += 1
+            print(f"  [{i:>4}/{len(futures)}] {RED}✗{RESET} {ticker}  {RED}{e}{RESET}")
+            continue
+        save_summaries(summary, prices_dir)
+        if summary["n_days"].gt(0).any():
+            stored += 1
+        else:
+            print(f"  [{i:>4}/{len(futures)}] {DIM}– {ticker}  (no prices){RESET}")
+    sched.shutdown()
+    print(f"\n  {GREEN}Done in {time.time() - t0:.0f}s{RESET}  {stored} stored · "
+          f"{len(futures) - stored - failed} without prices · {failed} failed\n")
+
+
+def show(ticker: str, prices_dir: Path = PRICES_DIR):
+    summary = load_summary(ticker, prices_dir)
+    if summary is None:
+        print(f"\n  {RED}No summary for {ticker}{RESET} — run {BOLD}python price_summary.py --backfill{RESET}\n")
+        return
+    cols = ["period", "price_p10", "price_p25", "price_p50", "price_p75", "price_p90",
+            "price_first", "price_last", "price_mean", "n_days"]
+    print(f"\n  {BOLD}{ticker}{RESET}  {DIM}{len(summary)} quarters{RESET}\n")
+    with pd.option_context("display.float_format", "{:,.2f}".format, "display.width", 140):
+        print(summary[cols].rename(columns=lambda c: c.removeprefix("price_")).to_string(index=False))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store and inspect per-ticker quarterly price summaries.")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Download summaries for tickers in data/ that have none yet")
+    parser.add_argument("--refresh", action="store_true", help="--backfill: re-download every ticker")
+    parser.add_argument("--only", nargs="+", type=normalize_ticker, metavar="TICKER",
+                        help="--backfill: only these tickers")
+    parser.add_argument("--yahoo-rate", type=float, default=4.0, metavar="RPS")
+    parser.add_argument("--yahoo-concurrency", type=int, default=4, metavar="N")
+    parser.add_argument("--show", type=normalize_ticker, metavar="TICKER", help="Print a ticker's stored summary")
+    args = parser.parse_args()
+    if args.show:
+        show(args.show)
+    elif args.backfill:
+        backfill(args.only, args.refresh, args.yahoo_rate, args.yahoo_concurrency)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
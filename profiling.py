@@ -0,0 +1,153 @@
+"""
+Named-span timing for the fetch and compute pipelines.
+
+Code wraps each phase in ``span(name, label)``; spans cost a flag check
+unless ``enable()`` has been called (the CLIs' ``--profile`` flag). At the
+end the collected spans are summarised per phase, with the slowest labels
+(investors, tickers, pages), and written as a JSON or CSV report.
+``profiled(fn)`` additionally collects cProfile data per worker thread.
+"""
+
+import cProfile
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+_enabled = False
+_cprofile = False
+_lock = threading.Lock()
+_spans: list[tuple[str, str, float, float, str]] = []
+_profiles: list[cProfile.Profile] = []
+_t0 = time.perf_counter()
+
+
+def enable(cprofile: bool = False):
+    global _enabled, _cprofile, _t0
+    _enabled = True
+    _cprofile = cprofile
+    _t0 = time.perf_counter()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+@contextmanager
+def span(name: str, label: str = ""):
+    """Time the enclosed block as phase *name* (e.g. "yahoo.download") for *label*."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            _spans.append((name, label, start - _t0, end - start, threading.current_thread().name))
+
+
+def profiled(fn, *args, **kwargs):
+    """Call *fn*, collecting cProfile data for this thread when enabled with cprofile."""
+    if not _cprofile:
+        return fn(*args, **kwargs)
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        prof.disable()
+        with _lock:
+            _profiles.append(prof)
+
+
+def spans() -> pd.DataFrame:
+    with _lock:
+        rows = list(_spans)
+    return pd.DataFrame(rows, columns=["phase", "label", "start_s", "duration_s", "thread"])
+
+
+def summary(df: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Per-phase count / total / mean / p95 / max seconds, slowest total first."""
+    df = spans() if df is None else df
+    if df.empty:
+        return pd.DataFrame(columns=["phase", "count", "total_s", "mean_s", "p95_s", "max_s", "slowest"])
+    g = df.groupby("phase")["duration_s"]
+    out = pd.DataFrame({
+        "count": g.size(),
+        "total_s": g.sum(),
+        "mean_s": g.mean(),
+        "p95_s": g.quantile(0.95),
+        "max_s": g.max(),
+    })
+    out["slowest"] = df.loc[g.idxmax(), ["phase", "label"]].set_index("phase")["label"]
+    return out.sort_values("total_s", ascending=False).reset_index()
+
+
+def slowest(phase: str, k: int = 10, df: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Labels with the largest total time in *phase* (e.g. slowest investors)."""
+    df = spans() if df is None else df
+    sub = df[df["phase"] == phase]
+    return (sub.groupby("label")["duration_s"].sum()
+            .sort_values(ascending=False).head(k).reset_index())
+
+
+def write_report(path: Path):
+    """JSON report (summary + all spans), or the raw spans as CSV for *.csv paths."""
+    path = Path(path)
+    df = spans()
+    if path.suffix.lower() == ".csv":
+        df.to_csv(path, index=False)
+        return
+    report = {
+        "wall_s": time.perf_counter() - _t0,
+        "summary": json.loads(summary(df).to_json(orient="records")),
+        "spans": json.loads(df.to_json(orient="records")),
+    }
+    path.write_text(json.dumps(report, indent=2))
+
+
+def dump_cprofile(path: Path):
+    with _lock:
+        profiles = list(_profiles)
+    if not profiles:
+        return
+    stats = pstats.Stats(profiles[0])
+    for prof in profiles[1:]:
+        stats.add(prof)
+    stats.dump_stats(str(path))
+
+
+def print_summary(top_phases: tuple[str, ...] = (), k: int = 5):
+    """Per-phase table, then the *k* slowest labels for each phase in *top_phases*."""
+    df = spans()
+    table = summary(df)
+    if table.empty:
+        return
+    PH_W, N_W, T_W = 22, 7, 9
+    print(f"\n  {BOLD}{CYAN}PROFILE{RESET}  {DIM}({len(df)} spans){RESET}")
+    hdr = (f"{'Phase':<{PH_W}s} │ {'Count':>{N_W}s} │ {'Total':>{T_W}s} │ {'Mean':>{T_W}s} │ "
+           f"{'p95':>{T_W}s} │ {'Max':>{T_W}s} │ Slowest")
+    print(f"  {DIM}{hdr}{RESET}")
+    print(f"  {DIM}{'─' * (len(hdr) + 12)}{RESET}")
+    for r in table.itertuples(index=False):
+        print(f"  {r.phase:<{PH_W}s} │ {r.count:>{N_W}d} │ {r.total_s:>{T_W - 1}.2f}s │ "
+              f"{r.mean_s:>{T_W - 1}.3f}s │ {r.p95_s:>{T_W - 1}.3f}s │ {r.max_s:>{T_W - 1}.2f}s │ "
+              f"{DIM}{r.slowest}{RESET}")
+    for phase in top_phases:
+        worst = slowest(phase, k, df)
+        if worst.empty:
+            continue
+        items = "  ".join(f"{lbl} {sec:.1f}s" for lbl, sec in worst.itertuples(index=False))
+        print(f"\n  {DIM}Slowest {phase}:{RESET} {items}")
+    print()
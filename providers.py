@@ -0,0 +1,133 @@
+"""
+Where prices come from.
+
+A PriceProvider answers two bulk questions: daily closes of some tickers
+over a date range (history) and their latest close (latest). Enrichment,
+compute_stats and the screener ask one instead of calling yfinance
+directly, so they run just as well offline against a directory of our
+own daily closes:
+
+    YahooProvider   yfinance, through the fetch scheduler when given one
+    LocalProvider   <dir>/<TICKER>.csv or .parquet with date and close
+                    columns (ticker as normalize_ticker spells it);
+                    .parquet needs pyarrow, checked when it is built
+
+get_provider(dir) picks LocalProvider for a directory, else Yahoo. The
+scripts expose it as --prices DIR.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import pandas as pd
+
+from export import has_parquet_engine
+from tickers import normalize_ticker
+from yahoo import download_close_history, fetch_current_price, fetch_current_prices
+
+
+class PriceProvider(ABC):
+    @abstractmethod
+    def history(self, tickers, start, end) -> dict[str, pd.Series]:
+        """Daily closes per ticker in [start, end), indexed by date; empty if none."""
+
+    @abstractmethod
+    def latest(self, tickers) -> dict[str, float]:
+        """Most recent close per ticker; tickers without one are left out."""
+
+    def current_price(self, ticker: str) -> float | None:
+        """One ticker's latest close, shaped as compute_stats' *price_fn*."""
+        return self.latest([ticker]).get(ticker)
+
+    def submitter(self):
+        """*submit(fn, *args)* to run per-ticker enrichment on, or None to run inline."""
+        return None
+
+
+class YahooProvider(PriceProvider):
+    """yfinance.
+
+    With a HostScheduler, latest prices are rate-limited on its "yahoo"
+    host; history downloads run on it when submitted through submitter(),
+    as enrichment does. history() is one request per ticker on purpose, so
+    the scheduler can rate-limit and retry each download on its own.
+    """
+
+    def __init__(self, sched=None):
+        self.sched = sched
+
+    def _call(self, fn, *args):
+        return self.sched.call("yahoo", fn, *args) if self.sched is not None else fn(*args)
+
+    def history(self, tickers, start, end) -> dict[str, pd.Series]:
+        return {t: download_close_history(t, start, end) for t in tickers}
+
+    def latest(self, tickers) -> dict[str, float]:
+        return self._call(fetch_current_prices, list(tickers))
+
+    def current_price(self, ticker: str) -> float | None:
+        return self._call(fetch_current_price, ticker)
+
+    def submitter(self):
+        return self.sched.submitter("yahoo") if self.sched is not None else None
+
+
+class LocalProvider(PriceProvider):
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise FileNotFoundError(f"Price directory not found: {self.root}")
+        if not has_parquet_engine() and next(self.root.glob("*.parquet"), None) is not None:
+            raise ImportError(f"{self.root} has .parquet price files; reading them needs pyarrow (pip install pyarrow)")
+        self._closes: dict[str, pd.Series] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, ticker: str) -> pd.Series:
+        symbol = normalize_ticker(ticker)
+        path = self.root / f"{symbol}.parquet"
+        if path.exists():
+            df = pd.read_parquet(path)
+        elif (path := self.root / f"{symbol}.csv").exists():
+            df = pd.read_csv(path)
+        else:
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([]), name=symbol)
+        cols = {c.lower().replace(" ", "_"): c for c in df.columns}
+        close = cols.get("adj_close", cols.get("close"))
+        date = cols.get("date", df.columns[0])
+        if close is None:
+            raise ValueError(f"{path}: no close column")
+        prices = pd.Series(df[close].to_numpy(float), index=pd.to_datetime(df[date]), name=symbol)
+        if getattr(prices.index, "tz", None) is not None:
+            prices.index = prices.index.tz_localize(None)
+        return prices.dropna().sort_index()
+
+    def closes(self, ticker: str) -> pd.Series:
+        """Every stored close of *ticker*, read once per provider."""
+        with self._lock:
+            cached = self._closes.get(ticker)
+        if cached is None:
+            cached = self._read(ticker)
+            with self._lock:
+                self._closes[ticker] = cached
+        return cached
+
+    def history(self, tickers, start, end) -> dict[str, pd.Series]:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        out = {}
+        for t in tickers:
+            prices = self.closes(t)
+            out[t] = prices[(prices.index >= start) & (prices.index < end)]
+        return out
+
+    def latest(self, tickers) -> dict[str, float]:
+        out = {}
+        for t in tickers:
+            prices = self.closes(t)
+            if not prices.empty:
+                out[t] = float(prices.iloc[-1])
+        return out
+
+
+def get_provider(prices_dir: Path | None = None, sched=None) -> PriceProvider:
+    return LocalProvider(prices_dir) if prices_dir is not None else YahooProvider(sched)
@@ -3,11 +3,17 @@ Rank super-investors by a chosen metric. Run from this directory so stats/ is fo
 """
 
 import argparse
+import warnings
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
 
+import export
+from portfolio import PATH_METRICS, investor_path_metrics, path_metrics_sweep
+from price_summary import is_custom, mode_arg, scenario_frames
+from trade_store import TradeStore
+
 pd.set_option("display.float_format", "{:.4f}".format)
 
 STATS_DIR = Path(__file__).parent / "stats"
@@ -109,7 +115,7 @@ def compute_sortino(df: pd.DataFrame, mode: str) -> float:
 
 # ── build the full comparison table ─────────────────────────────────────
 
-SORTABLE_METRICS = [
+TRADE_METRICS = [
     "Win_Rate",
     "Pct_Capital_Winning_Stocks",
     "Median_Return",
@@ -125,35 +131,30 @@ SORTABLE_METRICS = [
     "Safety_And_Returns",
 ]
 
-
-def build_investor_stats(mode: str = "avg", after_year: int | None = None) -> pd.DataFrame:
-    rows = []
-    for csv_path in sorted(STATS_DIR.glob("*.csv")):
-        investor_name = csv_path.stem
-        df = _drop_invalid_costs(pd.read_csv(csv_path))
-        if df.empty:
-            continue
-        if after_year is not None and "period" in df.columns:
-            buy_year = df["period"].str.extract(r"(\d{4})", expand=False).astype(int)
-            df = df.loc[buy_year > after_year]
-        if df.empty:
-            continue
-        rows.append({
-            "Investor": investor_name,
-            "Num_Trades": len(df),
-            "Win_Rate": compute_win_rate(df, mode),
-            "Pct_Capital_Winning_Stocks": compute_percentage_capital_on_winning_stocks(df, mode),
-            "Median_Return": compute_median_return(df, mode),
-            "Weighted_Return": compute_weighted_return(df, mode),
-            "Median_IRR": compute_median_irr(df, mode),
-            "Weighted_IRR": compute_weighted_irr(df, mode),
-            "Profit_Factor": compute_profit_factor(df, mode),
-            "Expectancy": compute_expectancy(df, mode),
-            "Sortino": compute_sortino(df, mode),
-            "Median_Return_Winners": compute_median_return_on_winners(df, mode),
-            "Median_Return_Losers": compute_median_return_on_losers(df, mode),
-        })
-    stats = pd.DataFrame(rows)
+# Per-trade metrics come from stats/; path metrics from the portfolio NAV (portfolio.py).
+SORTABLE_METRICS = TRADE_METRICS + PATH_METRICS
+LOWER_IS_BETTER = {"Quarterly_Vol"}
+
+
+def investor_metrics(investor_name: str, df: pd.DataFrame, mode: str) -> dict:
+    return {
+        "Investor": investor_name,
+        "Num_Trades": len(df),
+        "Win_Rate": compute_win_rate(df, mode),
+        "Pct_Capital_Winning_Stocks": compute_percentage_capital_on_winning_stocks(df, mode),
+        "Median_Return": compute_median_return(df, mode),
+        "Weighted_Return": compute_weighted_return(df, mode),
+        "Median_IRR": compute_median_irr(df, mode),
+        "Weighted_IRR": compute_weighted_irr(df, mode),
+        "Profit_Factor": compute_profit_factor(df, mode),
+        "Expectancy": compute_expectancy(df, mode),
+        "Sortino": compute_sortino(df, mode),
+        "Median_Return_Winners": compute_median_return_on_winners(df, mode),
+        "Median_Return_Losers": compute_median_return_on_losers(df, mode),
+    }
+
+
+def add_derived_metrics(stats: pd.DataFrame) -> pd.DataFrame:
     stats["Sizing_Skill"] = stats["Weighted_Return"] - stats["Median_Return"]
     mask = (stats["Weighted_Return"] > 0) & (stats["Pct_Capital_Winning_Stocks"] > 0)
     stats["Safety_And_Returns"] = np.where(
@@ -164,6 +165,174 @@ def build_investor_stats(mode: str = "avg", after_year: int | None = None) -> pd
     return stats
 
 
+def buy_years(df: pd.DataFrame) -> pd.Series:
+    return df["period"].str.extract(r"(\d{4})", expand=False).astype(int)
+
+
+def year_range(text: str) -> list[int]:
+    """argparse type for START:END[:STEP] (inclusive)."""
+    try:
+        parts = [int(p) for p in text.split(":")]
+    except ValueError:
+        parts = []
+    if len(parts) not in (2, 3) or parts[0] > parts[1] or (len(parts) == 3 and parts[2] < 1):
+        raise argparse.ArgumentTypeError(f"expected START:END[:STEP], got {text!r}")
+    return list(range(parts[0], parts[1] + 1, parts[2] if len(parts) == 3 else 1))
+
+
+def _trade_arrays(df: pd.DataFrame, mode: str) -> list[np.ndarray]:
+    """irr, cost, dollar return and holding period as batch_metrics inputs."""
+    return [
+        df[f"irr_{mode}"].to_numpy(float),
+        df[f"cost_{mode}"].to_numpy(float),
+        _get_dollar_return(df, mode).to_numpy(float),
+        df["holding_period"].to_numpy(float),
+    ]
+
+
+def eligible_trades(frames: dict[str, pd.DataFrame], after_year: int | None = None):
+    """Yield (investor, trades) after the cost sanity filter and --after-year cut.
+
+    *frames* is a dict of stats DataFrames or a TradeStore (same items()).
+    """
+    for investor_name, raw in frames.items():
+        df = _drop_invalid_costs(raw)
+        if df.empty:
+            continue
+        if after_year is not None and "period" in df.columns:
+            df = df.loc[buy_years(df) > after_year]
+        if df.empty:
+            continue
+        yield investor_name, df
+
+
+def build_investor_stats(
+    mode: str = "avg",
+    after_year: int | None = None,
+    frames: "dict[str, pd.DataFrame] | TradeStore | None" = None,
+) -> pd.DataFrame:
+    """One row of metrics per investor. *frames* maps investor name to its raw
+    stats DataFrame, or is a TradeStore; when omitted stats/ is loaded into one."""
+    if frames is None:
+        frames = TradeStore.load(STATS_DIR)
+    rows = [investor_metrics(name, df, mode) for name, df in eligible_trades(frames, after_year)]
+    return add_derived_metrics(pd.DataFrame(rows))
+
+
+def bootstrap_metric(
+    frames: dict[str, pd.DataFrame],
+    metric: str,
+    mode: str = "avg",
+    n_resamples: int = 1000,
+    after_year: int | None = None,
+    investors: list[str] | None = None,
+    seed: int = 0,
+    max_cells: int = 2_000_000,
+) -> pd.DataFrame:
+    """*metric* on *n_resamples* with-replacement resamples of each investor's trades.
+
+    Returns one column per investor, one row per resample. Each block of
+    resamples is an index matrix into the trade arrays, evaluated by
+    batch_metrics in one pass; blocks are sized to stay under *max_cells*.
+    """
+    from batch_metrics import metrics_batch
+
+    rng = np.random.default_rng(seed)
+    out = {}
+    for name, df in eligible_trades(frames, after_year):
+        if investors is not None and name not in investors:
+            continue
+        arrays = _trade_arrays(df, mode)
+        n = len(df)
+        block = max(1, max_cells // n)
+        values = []
+        for start in range(0, n_resamples, block):
+            idx = rng.integers(0, n, size=(min(block, n_resamples - start), n))
+            values.append(metrics_batch(*(a[idx] for a in arrays), metrics=[metric])[metric])
+        out[name] = np.concatenate(values)
+    return pd.DataFrame(out)
+
+
+def sweep_after_year(frames: dict[str, pd.DataFrame], years: list[int], mode: str = "avg") -> pd.DataFrame:
+    """build_investor_stats for every --after-year cutoff in *years* in one pass.
+
+    One row per (After_Year, Investor) with at least one trade. Each
+    investor's trades are sorted by buy year once and every cutoff is a
+    suffix of them, evaluated together by batch_metrics.
+    """
+    from batch_metrics import after_year_rows, metrics_batch
+
+    out = []
+    for name, df in eligible_trades(frames):
+        order, keep = after_year_rows(buy_years(df).to_numpy(), years)
+        irr, cost, ret, holding_period = (a[order] for a in _trade_arrays(df, mode))
+        m = metrics_batch(*(np.where(keep, a, np.nan) for a in (irr, cost, ret)), holding_period)
+        m["Num_Trades"] = keep.sum(axis=1)
+        out.append(pd.DataFrame({"After_Year": years, "Investor": name, **m}))
+    if not out:
+        return pd.DataFrame(columns=["After_Year", "Investor", "Num_Trades"] + TRADE_METRICS)
+    table = pd.concat(out, ignore_index=True)
+    return table[table["Num_Trades"] > 0].reset_index(drop=True)
+
+
+def sweep_ranks(table: pd.DataFrame, metric: str, min_trades: int) -> pd.DataFrame:
+    """Investor × After_Year rank matrix (1 = top) from sweep_after_year output."""
+    ranks = {}
+    for year, stats in table.groupby("After_Year"):
+        _, ordered, _ = rank_investors(stats, metric, min_trades, len(stats))
+        ranks[year] = pd.Series(np.arange(1, len(ordered) + 1), index=ordered["Investor"].to_numpy())
+    return pd.DataFrame(ranks)
+
+
+def rank_probabilities(boot: pd.DataFrame, nan_first: bool = False) -> pd.DataFrame:
+    """P(rank = r) per investor from bootstrap_metric output; rank 1 = highest value.
+
+    NaN resamples rank last, or first with *nan_first* (the losers metric,
+    where NaN means no losing trades), matching rank_investors.
+    """
+    values = boot.to_numpy()
+    n_resamples, n_investors = values.shape
+    key = np.where(np.isnan(values), -np.inf if nan_first else np.inf, -values)
+    order = np.argsort(key, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(n_investors)[None, :], axis=1)
+    flat = (np.arange(n_investors)[None, :] * n_investors + ranks).ravel()
+    counts = np.bincount(flat, minlength=n_investors * n_investors).reshape(n_investors, n_investors)
+    return pd.DataFrame(counts / n_resamples, index=boot.columns, columns=np.arange(1, n_investors + 1))
+
+
+def add_path_metrics(stats: pd.DataFrame, path_metrics: pd.DataFrame) -> pd.DataFrame:
+    """*stats* plus the PATH_METRICS columns of portfolio.path_metrics output."""
+    return stats.drop(columns=PATH_METRICS, errors="ignore").merge(
+        path_metrics[["Investor"] + PATH_METRICS], on="Investor", how="left")
+
+
+def rank_investors(stats: pd.DataFrame, metric: str, min_trades: int, k: int):
+    """Return (eligible, top, flop) for *metric*; losers-metric sorts ascending."""
+    stats = stats[stats["Num_Trades"] >= min_trades].copy()
+    stats.replace([np.inf, -np.inf], np.nan, inplace=True)
+    if metric in LOWER_IS_BETTER:
+        sorted_df = stats.sort_values(by=metric, ascending=True, na_position="last")
+        return stats, sorted_df.head(k), sorted_df.tail(k).iloc[::-1]
+    ascending_for_losers = metric == "Median_Return_Losers"
+    sorted_df = stats.sort_values(by=metric, ascending=ascending_for_losers, na_position="last")
+    top = sorted_df.head(k) if not ascending_for_losers else sorted_df.tail(k).iloc[::-1]
+    flop = sorted_df.tail(k).iloc[::-1] if not ascending_for_losers else sorted_df.head(k)
+    return stats, top, flop
+
+
+def ranking(stats: pd.DataFrame, metric: str, min_trades: int) -> pd.DataFrame:
+    """Every eligible investor from first to last place, as rank_investors orders them."""
+    stats, _, _ = rank_investors(stats, metric, min_trades, 0)
+    ascending = metric in LOWER_IS_BETTER or metric == "Median_Return_Losers"
+    ranked = stats.sort_values(by=metric, ascending=ascending, na_position="last")
+    if metric == "Median_Return_Losers":
+        ranked = ranked.iloc[::-1]
+    ranked = ranked.reset_index(drop=True)
+    ranked.insert(0, "Rank", ranked.index + 1)
+    return ranked
+
+
 # ── ANSI helpers ─────────────────────────────────────────────────────────
 
 BOLD  = "\033[1m"
@@ -187,10 +356,14 @@ METRIC_LABELS = {
     "Median_Return_Losers":         "Med. Return (L)",
     "Sizing_Skill":                 "Sizing Skill",
     "Safety_And_Returns":           "Safety & Returns",
+    "TWR":                          "TWR (annual)",
+    "Max_Drawdown":                 "Max Drawdown",
+    "Quarterly_Vol":                "Quarterly Vol",
 }
 
 
 RATIO_METRICS = {"Profit_Factor", "Sortino"}
+INVERSE_COLOR_METRICS = {"Median_Return_Losers", "Quarterly_Vol"}
 
 
 def color_pct(val: float, width: int = 8, inverse: bool = False) -> str:
@@ -264,8 +437,8 @@ def print_ranking_block(title: str, df: pd.DataFrame, metric: str, *, is_top: bo
     hdr += f" │ {'Trades':>{TRADE_W}s}"
     print(f"  {DIM}{hdr}{RESET}")
     print(f"  {DIM}{sep}{RESET}")
-    is_loser_metric = metric == "Median_Return_Losers"
-    fmt_main = color_ratio if metric in RATIO_METRICS else lambda v, w: color_pct(v, w, inverse=is_loser_metric)
+    main_inverse = metric in INVERSE_COLOR_METRICS
+    fmt_main = color_ratio if metric in RATIO_METRICS else lambda v, w: color_pct(v, w, inverse=main_inverse)
     for i, (_, row) in enumerate(df.iterrows()):
         investor = row["Investor"]
         trades = int(row["Num_Trades"])
@@ -286,31 +459,146 @@ def print_ranking_block(title: str, df: pd.DataFrame, metric: str, *, is_top: bo
     print()
 
 
+def print_bootstrap_block(df: pd.DataFrame, boot: pd.DataFrame, probs: pd.DataFrame,
+                          metric: str, ci: float, k: int, *, is_top: bool):
+    """Bootstrap CI and rank probabilities for the investors of one ranking block."""
+    accent = GREEN if is_top else RED
+    inverse = metric in INVERSE_COLOR_METRICS
+    fmt = color_ratio if metric in RATIO_METRICS else lambda v, w: color_pct(v, w, inverse=inverse)
+    n_investors = probs.shape[1]
+    shown_ranks = list(range(1, min(k, 5) + 1)) if is_top else list(range(n_investors, max(n_investors - min(k, 5), 0), -1))
+    tail = probs.columns[:k] if is_top else probs.columns[-k:]
+    lo_q, hi_q = (100 - ci) / 2, (100 + ci) / 2
+    INV_W, COL_W, P_W = 25, 8, 7
+    print(f"  {accent}{BOLD}{'▲' if is_top else '▼'} {'TOP' if is_top else 'FLOP'} {k} · bootstrap{RESET}")
+    hdr = f"{'Investor':<{INV_W}s} │ {f'{ci:g}% CI':^{2 * COL_W + 1}s}"
+    for r in shown_ranks:
+        hdr += f" │ {f'P(#{r})':>{P_W}s}"
+    which = "top" if is_top else "flop"
+    hdr += f" │ {f'P({which} {k})':>{P_W + 3}s}"
+    sep = "─" * _visual_len(hdr)
+    print(f"  {DIM}{sep}{RESET}")
+    print(f"  {DIM}{hdr}{RESET}")
+    print(f"  {DIM}{sep}{RESET}")
+    for investor in df["Investor"]:
+        if investor not in boot.columns:
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            lo, hi = np.nanpercentile(boot[investor].to_numpy(), [lo_q, hi_q])
+        name = investor if len(investor) <= INV_W else investor[: INV_W - 1] + "…"
+        line = f"  {_pad_right(name, INV_W)} │ {fmt(lo, COL_W)} {fmt(hi, COL_W)}"
+        for r in shown_ranks:
+            line += f" │ {probs.at[investor, r]:>{P_W}.1%}"
+        line += f" │ {BOLD}{probs.loc[investor, tail].sum():>{P_W + 3}.1%}{RESET}"
+        print(line)
+    print()
+
+
+def print_sweep(ranks: pd.DataFrame, metric: str, mode: str, min_trades: int, k: int):
+    """Rank of every investor that reaches the top *k* at some cutoff, per cutoff."""
+    label = METRIC_LABELS.get(metric, metric)
+    shown = ranks[(ranks <= k).any(axis=1)]
+    shown = shown.loc[shown.mean(axis=1).sort_values(kind="stable").index]
+    INV_W, COL_W = 25, 5
+    print()
+    print(f"  {BOLD}{CYAN}RANK OVER --after-year{RESET}  {BOLD}{label}{RESET}")
+    print(f"  {DIM}mode={mode}  min_trades={min_trades}  top {k} at any cutoff; "
+          f"cutoff Y keeps stocks first bought after Y{RESET}")
+    print()
+    hdr = f"{'Investor':<{INV_W}s} │" + "".join(f"{str(y):>{COL_W}s}" for y in ranks.columns)
+    print(f"  {DIM}{'─' * _visual_len(hdr)}{RESET}")
+    print(f"  {DIM}{hdr}{RESET}")
+    print(f"  {DIM}{'─' * _visual_len(hdr)}{RESET}")
+    for investor, row in shown.iterrows():
+        name = investor if len(investor) <= INV_W else investor[: INV_W - 1] + "…"
+        cells = ""
+        for r in row:
+            if pd.isna(r):
+                cells += f"{DIM}{'·':>{COL_W}s}{RESET}"
+            elif r <= k:
+                cells += f"{GREEN}{BOLD}{int(r):>{COL_W}d}{RESET}"
+            else:
+                cells += f"{DIM}{int(r):>{COL_W}d}{RESET}"
+        print(f"  {_pad_right(name, INV_W)} │{cells}")
+    counts = "".join(f"{int(n):>{COL_W}d}" for n in ranks.notna().sum())
+    print(f"  {DIM}{'─' * _visual_len(hdr)}{RESET}")
+    print(f"  {DIM}{'investors ranked':<{INV_W}s} │{counts}{RESET}")
+    print()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Rank super-investors by a chosen metric.")
     parser.add_argument("--metric", "-m", default="Weighted_Return", choices=SORTABLE_METRICS)
-    parser.add_argument("--mode", default="avg", choices=["avg", "best", "worst"])
+    parser.add_argument("--mode", default="avg", type=mode_arg, metavar="MODE",
+                        help="avg, best, worst, or BUY/SELL price points recomputed from prices/ "
+                             "(e.g. p25/p75, mean/mean, last/last)")
     parser.add_argument("--min-trades", type=int, default=5)
     parser.add_argument("--topk", "-k", type=int, default=3)
     parser.add_argument("--list-metrics", action="store_true")
     parser.add_argument("--after-year", type=int, default=None, metavar="YEAR",
                         help="Use only stocks first bought after this year (e.g. 2015 => 2016+)")
+    parser.add_argument("--sweep-after-year", type=year_range, default=None, metavar="START:END",
+                        help="Rank at every --after-year cutoff from START to END in one pass")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                        help="Resample each investor's trades N times: CI and rank probabilities")
+    parser.add_argument("--ci", type=float, default=90, help="Bootstrap interval width in percent")
+    parser.add_argument("--seed", type=int, default=0, help="Bootstrap random seed")
+    parser.add_argument("--rank-probs", type=Path, default=None, metavar="CSV",
+                        help="Write the full investor x rank probability matrix (with --bootstrap)")
+    export.add_arguments(parser)
     args = parser.parse_args()
+    fmt = export.resolve(parser, args)
+    if fmt and args.bootstrap > 0:
+        parser.error("--output writes the ranking only; use --rank-probs for bootstrap results")
+    if args.bootstrap > 0 and args.metric in PATH_METRICS:
+        parser.error("--bootstrap resamples trades; it supports the per-trade metrics only")
     if args.list_metrics:
         for m in SORTABLE_METRICS:
             print(f"  - {m}")
         return
-    stats = build_investor_stats(mode=args.mode, after_year=args.after_year)
-    stats = stats[stats["Num_Trades"] >= args.min_trades]
-    stats.replace([np.inf, -np.inf], np.nan, inplace=True)
-    ascending_for_losers = args.metric == "Median_Return_Losers"
-    sorted_df = stats.sort_values(by=args.metric, ascending=ascending_for_losers, na_position="last")
+    if is_custom(args.mode):
+        print(f"\n  {DIM}Scenario {args.mode}: recomputing from data/ + prices/ "
+              f"(cached in stats/.scenarios/){RESET}")
+        frames = TradeStore.from_frames(scenario_frames(args.mode))
+    else:
+        frames = TradeStore.load(STATS_DIR)
+    if args.sweep_after_year:
+        table = sweep_after_year(frames, args.sweep_after_year, args.mode)
+        if args.metric in PATH_METRICS:
+            table = table.merge(path_metrics_sweep(args.sweep_after_year)[["After_Year", "Investor"] + PATH_METRICS],
+                                on=["After_Year", "Investor"], how="left")
+        if fmt:
+            n = export.write(table, args.output, fmt)
+            print(f"  {DIM}Wrote {n} rows (investor x cutoff) to {args.output}{RESET}")
+            return
+        print_sweep(sweep_ranks(table, args.metric, args.min_trades), args.metric, args.mode,
+                    args.min_trades, args.topk)
+        return
+    stats = build_investor_stats(mode=args.mode, after_year=args.after_year, frames=frames)
+    if args.metric in PATH_METRICS:
+        stats = add_path_metrics(stats, investor_path_metrics(after_year=args.after_year))
+    if fmt:
+        n = export.write(ranking(stats, args.metric, args.min_trades), args.output, fmt)
+        print(f"  {DIM}Wrote {n} ranked investors to {args.output}{RESET}")
+        return
     k = args.topk
-    top = sorted_df.head(k) if not ascending_for_losers else sorted_df.tail(k).iloc[::-1]
-    flop = sorted_df.tail(k).iloc[::-1] if not ascending_for_losers else sorted_df.head(k)
+    stats, top, flop = rank_investors(stats, args.metric, args.min_trades, k)
     print_header(args.metric, args.mode, args.min_trades, len(stats), args.after_year)
     print_ranking_block(f"TOP {k}", top, args.metric, is_top=True)
     print_ranking_block(f"FLOP {k}", flop, args.metric, is_top=False)
+    if args.bootstrap > 0:
+        boot = bootstrap_metric(frames, args.metric, args.mode, args.bootstrap,
+                                after_year=args.after_year, investors=list(stats["Investor"]),
+                                seed=args.seed)
+        probs = rank_probabilities(boot, nan_first=args.metric == "Median_Return_Losers")
+        print(f"  {DIM}{args.bootstrap} resamples of each investor's trades · seed={args.seed}{RESET}")
+        print()
+        print_bootstrap_block(top, boot, probs, args.metric, args.ci, k, is_top=True)
+        print_bootstrap_block(flop, boot, probs, args.metric, args.ci, k, is_top=False)
+        if args.rank_probs is not None:
+            probs.to_csv(args.rank_probs, index_label="Investor", float_format="%.4f")
+            print(f"  {DIM}Rank probabilities written to {args.rank_probs}{RESET}\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+"""
+Per-host request scheduler for the fetch pipeline.
+
+Each host (Dataroma, Yahoo) gets its own worker pool (concurrency cap) and
+token bucket (request rate). Work is submitted per request — one Dataroma
+page or one Yahoo ticker — so both hosts stay busy independently of how
+many investors are in flight. When a host answers 429 / rate-limit, its
+rate is halved and the bucket paused for the Retry-After (or an
+exponential backoff) before the request is retried; successes raise the
+rate back towards its configured ceiling.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+import profiling
+from profiling import span
+
+RATE_LIMIT_STATUS = {429, 503}
+
+
+class RateLimited(Exception):
+    """Raised by request functions that detect throttling themselves."""
+
+    def __init__(self, message: str = "rate limited", retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def rate_limit_delay(exc: BaseException) -> float | None:
+    """Seconds to wait if *exc* is a throttling signal (0 if unspecified), else None."""
+    if isinstance(exc, RateLimited):
+        return exc.retry_after or 0.0
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status in RATE_LIMIT_STATUS:
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        return float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 0.0
+    text = f"{type(exc).__name__} {exc}".lower()
+    if "ratelimit" in text or "rate limit" in text or "too many requests" in text:
+        return 0.0
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    start = max(self._updated, self._paused_until)
+                    self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+
+@dataclass
+class HostLimits:
+    rate: float          # requests per second at full speed
+    concurrency: int     # requests in flight
+    burst: int = 2
+    min_rate: float = 0.05
+    backoff: float = 5.0  # first pause after a 429 without Retry-After, doubles per repeat
+
+
+class HostLimiter:
+    """Token bucket + AIMD rate control for one host."""
+
+    def __init__(self, name: str, limits: HostLimits):
+        self.name = name
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self._lock = threading.Lock()
+        self._strikes = 0
+        self.requests = 0
+        self.throttled = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def acquire(self):
+        with span(f"{self.name}.wait"):
+            self.bucket.acquire()
+
+    def on_success(self):
+        with self._lock:
+            self.requests += 1
+            self._strikes = 0
+            step = self.limits.rate / 20
+            self.bucket.rate = min(self.limits.rate, self.bucket.rate + step)
+
+    def on_rate_limited(self, retry_after: float):
+        with self._lock:
+            self.requests += 1
+            self.throttled += 1
+            if self.bucket.paused:
+                return  # same burst of 429s as the one already being backed off
+            self._strikes += 1
+            self.bucket.rate = max(self.limits.min_rate, self.bucket.rate / 2)
+            pause = retry_after or self.limits.backoff * 2 ** (self._strikes - 1)
+        self.bucket.pause(pause * random.uniform(1.0, 1.2))
+
+
+class HostScheduler:
+    """Routes request-level work items to per-host pools and limiters."""
+
+    def __init__(self, hosts: dict[str, HostLimits], max_retries: int = 6):
+        self.limiters = {name: HostLimiter(name, lim) for name, lim in hosts.items()}
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=lim.concurrency, thread_name_prefix=name)
+            for name, lim in hosts.items()
+        }
+        self.max_retries = max_retries
+
+    def _run(self, host: str, fn, args, kwargs):
+        limiter = self.limiters[host]
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            try:
+                result = profiling.profiled(fn, *args, **kwargs)
+            except Exception as e:
+                delay = rate_limit_delay(e)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                limiter.on_rate_limited(delay)
+                continue
+            limiter.on_success()
+            return result
+
+    def submit(self, host: str, fn, *args, **kwargs) -> Future:
+        return self.pools[host].submit(self._run, host, fn, args, kwargs)
+
+    def call(self, host: str, fn, *args, **kwargs):
+        """Submit and wait; for callers that need the result before continuing."""
+        return self.submit(host, fn, *args, **kwargs).result()
+
+    def submitter(self, host: str):
+        """``submit(fn, *args)`` bound to *host*, for APIs that take an executor-like callable."""
+        return lambda fn, *args, **kwargs: self.submit(host, fn, *args, **kwargs)
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            name: {"requests": lim.requests, "throttled": lim.throttled, "rate": lim.rate}
+            for name, lim in self.limiters.items()
+        }
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
@@ -7,16 +7,16 @@ Reads enriched data from data/, fetches live prices from Yahoo.
 
 import argparse
 import sys
-import threading
 import warnings
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
 
+import export
+from activity import Action, ensure_actions
 from metrics import quarter_to_date
-from yahoo import fetch_current_price
+from providers import PriceProvider, get_provider
 
 warnings.filterwarnings("ignore")
 
@@ -38,6 +38,7 @@ def _holdings_for_investor(df: pd.DataFrame) -> pd.DataFrame:
     Processes chronologically so Sell-100% → rebuy cycles are handled.
     """
     rows = []
+    df = ensure_actions(df)
     for ticker in df.stock.unique():
         hist = df[df.stock == ticker].iloc[::-1]  # oldest first
 
@@ -45,24 +46,23 @@ def _holdings_for_investor(df: pd.DataFrame) -> pd.DataFrame:
         cost_basis = 0.0
         initiated_quarter = None
 
-        for _, row in hist.iterrows():
-            act = row.activity
-            if act.startswith("Sell 100"):
+        for act, quarter, shares, price in zip(hist.action, hist.quarter, hist.shares, hist.price_p50):
+            if act == Action.SELL_ALL:
                 shares_held = 0
                 cost_basis = 0.0
                 initiated_quarter = None
-            elif act.startswith("Buy"):
+            elif act == Action.BUY:
                 if shares_held == 0:
-                    initiated_quarter = row.quarter
-                shares_held += row.shares
-                cost_basis += row.shares * row.price_p50
-            elif act.startswith("Add"):
-                shares_held += row.shares
-                cost_basis += row.shares * row.price_p50
-            elif act.startswith("Reduce"):
-                frac_sold = row.shares / shares_held if shares_held > 0 else 0
+                    initiated_quarter = quarter
+                shares_held += shares
+                cost_basis += shares * price
+            elif act == Action.ADD:
+                shares_held += shares
+                cost_basis += shares * price
+            elif act == Action.REDUCE:
+                frac_sold = shares / shares_held if shares_held > 0 else 0
                 cost_basis *= (1 - frac_sold)
-                shares_held -= row.shares
+                shares_held -= shares
 
         if shares_held <= 0:
             continue
@@ -77,11 +77,11 @@ def _holdings_for_investor(df: pd.DataFrame) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
-def _load_all_holdings(names: list[str]) -> dict[str, pd.DataFrame]:
+def _load_all_holdings(names: list[str], data_dir: Path = DATA_DIR) -> dict[str, pd.DataFrame]:
     """Phase 1: read CSVs and compute holdings (CPU-only, fast)."""
     investor_holdings = {}
     for name in names:
-        data_path = DATA_DIR / f"{name}.csv"
+        data_path = data_dir / f"{name}.csv"
         if not data_path.exists():
             continue
         df = pd.read_csv(data_path)
@@ -93,28 +93,10 @@ def _load_all_holdings(names: list[str]) -> dict[str, pd.DataFrame]:
     return investor_holdings
 
 
-def _fetch_prices_parallel(tickers: set[str], workers: int) -> dict[str, float]:
-    """Phase 2: fetch current prices for all unique tickers in parallel."""
-    prices = {}
-    done = 0
-    total = len(tickers)
-    lock = threading.Lock()
-
-    def _fetch(tk):
-        nonlocal done
-        p = fetch_current_price(tk)
-        with lock:
-            done += 1
-            print(f"  {DIM}Fetching prices … {done}/{total}{RESET}   ", end="\r")
-        return tk, p
-
-    with ThreadPoolExecutor(max_workers=workers) as pool:
-        futures = [pool.submit(_fetch, tk) for tk in tickers]
-        for fut in as_completed(futures):
-            tk, p = fut.result()
-            if p is not None:
-                prices[tk] = p
-
+def _fetch_prices(tickers: set[str], provider: PriceProvider) -> dict[str, float]:
+    """Phase 2: current prices for all unique tickers, in one bulk provider call."""
+    print(f"  {DIM}Fetching {len(tickers)} prices …{RESET}", end="\r")
+    prices = provider.latest(sorted(tickers))
     print(" " * 50, end="\r")
     return prices
 
@@ -159,6 +141,29 @@ def _apply_prices_and_filter(
     return all_hits
 
 
+def rank_hits(
+    all_hits: list[pd.DataFrame],
+    investor_holdings: dict[str, pd.DataFrame],
+    sort: str,
+) -> pd.DataFrame:
+    """Phase 4: combine hits, count holders per ticker and sort."""
+    result = pd.concat(all_hits, ignore_index=True)
+
+    ticker_counts = {}
+    for name, h in investor_holdings.items():
+        for tk in h.ticker.unique():
+            ticker_counts[tk] = ticker_counts.get(tk, 0) + 1
+    result["n_investors"] = result.ticker.map(ticker_counts).fillna(1).astype(int)
+
+    sort_map = {
+        "discount": ("discount", True),
+        "pct":      ("pct_portfolio", False),
+        "count":    ("n_investors", False),
+    }
+    sort_col, ascending = sort_map[sort]
+    return result.sort_values(sort_col, ascending=ascending)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Find conviction positions trading below the investor's avg buy price."
@@ -172,11 +177,16 @@ def main():
     parser.add_argument("--sort", choices=["discount", "pct", "count"],
                         default="discount",
                         help="Sort results by: discount, pct (portfolio weight), count (# holders)")
-    parser.add_argument("--workers", type=int, default=8,
-                        help="Parallel workers for price fetching (default 8)")
     parser.add_argument("--only", nargs="+", metavar="NAME",
                         help="Only these investors")
+    parser.add_argument("--prices", type=Path, metavar="DIR",
+                        help="Read current prices from DIR/<TICKER>.csv|.parquet instead of Yahoo")
+    # prices are one bulk provider.latest call now; kept so old invocations still parse
+    parser.add_argument("--workers", type=int, help=argparse.SUPPRESS)
+    export.add_arguments(parser)
     args = parser.parse_args()
+    fmt = export.resolve(parser, args)
+    provider = get_provider(args.prices)
 
     from dateutil.relativedelta import relativedelta
     cutoff = datetime.now() - relativedelta(months=args.max_age * 3)
@@ -195,8 +205,8 @@ def main():
         all_tickers.update(h.ticker.tolist())
     print(f"  {DIM}{len(investor_holdings)} investors · {len(all_tickers)} unique tickers{RESET}")
 
-    # --- Phase 2: fetch prices in parallel ---
-    prices = _fetch_prices_parallel(all_tickers, args.workers)
+    # --- Phase 2: fetch prices in bulk ---
+    prices = _fetch_prices(all_tickers, provider)
     print(f"  {DIM}{len(prices)} prices fetched{RESET}\n")
 
     # --- Phase 3: apply prices and filter ---
@@ -206,21 +216,11 @@ def main():
         print(f"  {DIM}No matches found.{RESET}\n")
         return
 
-    result = pd.concat(all_hits, ignore_index=True)
-
-    ticker_counts = {}
-    for name, h in investor_holdings.items():
-        for tk in h.ticker.unique():
-            ticker_counts[tk] = ticker_counts.get(tk, 0) + 1
-    result["n_investors"] = result.ticker.map(ticker_counts).fillna(1).astype(int)
-
-    sort_map = {
-        "discount": ("discount", True),
-        "pct":      ("pct_portfolio", False),
-        "count":    ("n_investors", False),
-    }
-    sort_col, ascending = sort_map[args.sort]
-    result = result.sort_values(sort_col, ascending=ascending)
+    result = rank_hits(all_hits, investor_holdings, args.sort)
+    if fmt:
+        n = export.write(result, args.output, fmt)
+        print(f"  {DIM}Wrote {n} matches to {args.output}{RESET}\n")
+        return
 
     TK_W, INV_W, BUY_W, PRC_W, AVG_W, DISC_W, PCT_W, CNT_W = 8, 22, 7, 12, 10, 9, 8, 10
     hdr = (f"{'Ticker':<{TK_W}s} │ {'Investor':<{INV_W}s} │ "
@@ -0,0 +1,398 @@
+"""
+Local query server: loads data/ and stats/ once and answers rank, analyze,
+show-stats and screen queries as JSON over HTTP on localhost.
+
+Investors whose CSV files change on disk are reloaded on the next request,
+so a running server picks up fetch_all_data / compute_all_stats output
+without a restart.
+
+    python server.py --port 8765
+    curl 'http://127.0.0.1:8765/rank?metric=Win_Rate&topk=5'
+    curl 'http://127.0.0.1:8765/analyze?investor=Warren%20Buffett&mode=worst'
+    curl 'http://127.0.0.1:8765/rank?metric=Win_Rate&mode=p25/p75'
+    curl 'http://127.0.0.1:8765/show-stats?investor=Li%20Lu&sort=ret'
+    curl 'http://127.0.0.1:8765/screen?min_pct=5&discount=20&max_age=4'
+"""
+
+import argparse
+import json
+import threading
+import time
+import warnings
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import analyze_investor
+import portfolio
+import rank_investors
+import screener
+import show_stats
+from price_summary import PRICES_DIR, add_scenario_prices, is_custom, mode_label, scenario_frames, scenario_stats
+from providers import get_provider
+
+warnings.filterwarnings("ignore")
+
+DATA_DIR  = Path(__file__).parent / "data"
+STATS_DIR = Path(__file__).parent / "stats"
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+class QueryError(Exception):
+    """Bad request parameters; reported to the client as HTTP 400/404."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class Dataset:
+    """In-memory copy of data/ and stats/, reloaded per file on mtime change."""
+
+    def __init__(self, data_dir: Path = DATA_DIR, stats_dir: Path = STATS_DIR,
+                 reload_interval: float = 2.0):
+        self.data_dir = data_dir
+        self.stats_dir = stats_dir
+        self.reload_interval = reload_interval
+        self.stats: dict[str, pd.DataFrame] = {}
+        self.data: dict[str, pd.DataFrame] = {}
+        self._holdings: dict[str, pd.DataFrame] = {}
+        self._rank_cache: dict[tuple, pd.DataFrame] = {}
+        self._path_cache: dict[int | None, pd.DataFrame] = {}
+        self._mtimes: dict[Path, int] = {}
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+        self.generation = 0
+
+    def _scan(self, directory: Path, frames: dict[str, pd.DataFrame]) -> list[str]:
+        seen = set()
+        changed = []
+        for path in sorted(directory.glob("*.csv")) if directory.exists() else []:
+            seen.add(path)
+            mtime = path.stat().st_mtime_ns
+            if self._mtimes.get(path) == mtime:
+                continue
+            try:
+                frames[path.stem] = pd.read_csv(path)
+            except (OSError, pd.errors.ParserError, pd.errors.EmptyDataError):
+                continue  # file mid-write; retry on the next scan
+            self._mtimes[path] = mtime
+            changed.append(path.stem)
+        for path in [p for p in self._mtimes if p.parent == directory and p not in seen]:
+            del self._mtimes[path]
+            frames.pop(path.stem, None)
+            changed.append(path.stem)
+        return changed
+
+    def refresh(self, force: bool = False) -> list[str]:
+        """Reload changed files; returns the names of investors that changed."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.reload_interval:
+            return []
+        with self._lock:
+            self._last_check = now
+            changed_stats = self._scan(self.stats_dir, self.stats)
+            changed_data = self._scan(self.data_dir, self.data)
+            for name in changed_data:
+                self._holdings.pop(name, None)
+            if changed_stats or changed_data:
+                self._rank_cache.clear()
+            if changed_data:
+                self._path_cache.clear()
+            if changed_stats or changed_data:
+                self.generation += 1
+            return sorted(set(changed_stats) | set(changed_data))
+
+    def investor_stats(self, name: str, mode: str = "avg") -> pd.DataFrame:
+        """*name*'s stats; custom modes are recomputed from data/ and prices/ (see price_summary)."""
+        if is_custom(mode):
+            if name not in self.data:
+                raise QueryError(f"Unknown investor: {name}", status=404)
+            return scenario_stats(name, mode, self.data_dir)
+        if name not in self.stats:
+            raise QueryError(f"Unknown investor: {name}", status=404)
+        return self.stats[name]
+
+    def ranking_table(self, mode: str, after_year: int | None) -> pd.DataFrame:
+        custom = is_custom(mode)
+        # custom modes also depend on prices/, which the scans above do not watch
+        key = (mode, after_year, PRICES_DIR.stat().st_mtime_ns if custom and PRICES_DIR.exists() else None)
+        with self._lock:
+            table = self._rank_cache.get(key)
+            if table is None:
+                frames = scenario_frames(mode, sorted(self.data), self.data_dir) if custom else dict(self.stats)
+                table = rank_investors.build_investor_stats(
+                    mode=mode, after_year=after_year, frames=frames,
+                )
+                self._rank_cache[key] = table
+            return table
+
+    def path_table(self, after_year: int | None) -> pd.DataFrame:
+        """portfolio.path_metrics of every investor in data/."""
+        with self._lock:
+            table = self._path_cache.get(after_year)
+            if table is None:
+                table = portfolio.investor_path_metrics(dict(self.data), after_year)
+                self._path_cache[after_year] = table
+            return table
+
+    def holdings(self, names: list[str]) -> dict[str, pd.DataFrame]:
+        out = {}
+        with self._lock:
+            for name in names:
+                if name not in self._holdings:
+                    df = self.data.get(name)
+                    self._holdings[name] = (
+                        screener._holdings_for_investor(df)
+                        if df is not None and not df.empty else pd.DataFrame()
+                    )
+                if not self._holdings[name].empty:
+                    out[name] = self._holdings[name]
+        return out
+
+
+class PriceCache:
+    """Current prices shared across screen queries, refetched after *ttl* seconds."""
+
+    def __init__(self, ttl: float, provider):
+        self.ttl = ttl
+        self.provider = provider
+        self._prices: dict[str, tuple[float, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tickers: set[str]) -> dict[str, float]:
+        now = time.monotonic()
+        with self._lock:
+            stale = {tk for tk in tickers
+                     if tk not in self._prices or now - self._prices[tk][0] > self.ttl}
+            if stale:
+                fetched = screener._fetch_prices(stale, self.provider)
+                for tk in stale:
+                    self._prices[tk] = (now, fetched.get(tk))
+            return {tk: self._prices[tk][1] for tk in tickers if self._prices[tk][1] is not None}
+
+
+# ── query parameters ─────────────────────────────────────────────────────
+
+def _param(params: dict, key: str, default=None, cast=str):
+    values = params.get(key)
+    if not values or values[0] == "":
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise QueryError(f"Invalid value for '{key}': {values[0]!r}")
+
+
+def _choice(params: dict, key: str, default: str, choices: list[str]) -> str:
+    value = _param(params, key, default)
+    if value not in choices:
+        raise QueryError(f"'{key}' must be one of {', '.join(choices)}")
+    return value
+
+
+def _mode(params: dict) -> str:
+    """avg, best, worst or a custom BUY/SELL scenario like p25/p75, as its mode_label."""
+    try:
+        return mode_label(_param(params, "mode", "avg"))
+    except ValueError as e:
+        raise QueryError(str(e))
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    return json.loads(df.to_json(orient="records"))
+
+
+def _clean(value):
+    if isinstance(value, (np.floating, float)):
+        return None if not np.isfinite(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+# ── handlers ─────────────────────────────────────────────────────────────
+
+def handle_rank(ds: Dataset, params: dict, **_) -> dict:
+    metric = _choice(params, "metric", "Weighted_Return", rank_investors.SORTABLE_METRICS)
+    mode = _mode(params)
+    min_trades = _param(params, "min_trades", 5, int)
+    k = _param(params, "topk", 3, int)
+    after_year = _param(params, "after_year", None, int)
+    table = ds.ranking_table(mode, after_year)
+    if metric in rank_investors.PATH_METRICS:
+        table = rank_investors.add_path_metrics(table, ds.path_table(after_year))
+    eligible, top, flop = rank_investors.rank_investors(table, metric, min_trades, k)
+    return {
+        "metric": metric,
+        "mode": mode,
+        "min_trades": min_trades,
+        "after_year": after_year,
+        "investors": len(eligible),
+        "top": _records(top),
+        "flop": _records(flop),
+    }
+
+
+def handle_analyze(ds: Dataset, params: dict, **_) -> dict:
+    investor = _param(params, "investor")
+    if not investor:
+        raise QueryError("'investor' is required")
+    mode = _mode(params)
+    k = _param(params, "topk", 5, int)
+    after_year = _param(params, "after_year", None, int)
+    stats = analyze_investor._drop_invalid_costs(ds.investor_stats(investor, mode))
+    stats = analyze_investor.prepare_stats(stats, mode, after_year)
+    if stats.empty:
+        return {"investor": investor, "mode": mode, "after_year": after_year, "overview": None,
+                "top": [], "flop": [], "positions": []}
+    overview = {key: _clean(val) for key, val in
+                analyze_investor.compute_overview(stats, mode).items()}
+    return {
+        "investor": investor,
+        "mode": mode,
+        "after_year": after_year,
+        "overview": overview,
+        "top": _records(stats.nlargest(k, f"return_{mode}")),
+        "flop": _records(stats.nsmallest(k, f"return_{mode}")),
+        "positions": _records(stats.nlargest(k, "cost_avg_pct")),
+    }
+
+
+def handle_show_stats(ds: Dataset, params: dict, **_) -> dict:
+    investor = _param(params, "investor")
+    if not investor:
+        raise QueryError("'investor' is required")
+    mode = _mode(params)
+    sort_by = _choice(params, "sort", "irr", ["irr", "cost", "ret", "holding"])
+    ascending = _param(params, "asc", False, _flag)
+    df = ds.investor_stats(investor, mode).copy()
+    raw = ds.data.get(investor)
+    if raw is not None and is_custom(mode):
+        raw = add_scenario_prices(raw, mode)
+    cps_map = show_stats.cost_per_share(raw, mode) if raw is not None else {}
+    df["cost_per_share"] = df["ticker"].map(cps_map)
+    df = show_stats.sort_stats(df, sort_by, ascending, mode)
+    return {"investor": investor, "mode": mode, "trades": _records(df)}
+
+
+def handle_screen(ds: Dataset, params: dict, prices: PriceCache, **_) -> dict:
+    min_pct = _param(params, "min_pct", 5.0, float)
+    discount = _param(params, "discount", 20.0, float)
+    max_age = _param(params, "max_age", 4, int)
+    sort = _choice(params, "sort", "discount", ["discount", "pct", "count"])
+    only = params.get("only")
+    cutoff = pd.Timestamp(datetime.now()) - pd.DateOffset(months=max_age * 3)
+    names = only if only else sorted(ds.data)
+    investor_holdings = ds.holdings(names)
+    all_tickers = set()
+    for h in investor_holdings.values():
+        all_tickers.update(h.ticker.tolist())
+    current = prices.get(all_tickers)
+    all_hits = screener._apply_prices_and_filter(
+        investor_holdings, current, cutoff.to_pydatetime(), min_pct, discount,
+    )
+    matches = screener.rank_hits(all_hits, investor_holdings, sort) if all_hits else pd.DataFrame()
+    return {
+        "min_pct": min_pct,
+        "discount": discount,
+        "max_age": max_age,
+        "investors": len(investor_holdings),
+        "tickers": len(all_tickers),
+        "prices": len(current),
+        "matches": _records(matches),
+    }
+
+
+def handle_investors(ds: Dataset, params: dict, **_) -> dict:
+    return {"stats": sorted(ds.stats), "data": sorted(ds.data), "generation": ds.generation}
+
+
+ROUTES = {
+    "/rank": handle_rank,
+    "/analyze": handle_analyze,
+    "/show-stats": handle_show_stats,
+    "/screen": handle_screen,
+    "/investors": handle_investors,
+}
+
+
+def make_handler(ds: Dataset, prices: PriceCache, quiet: bool = False):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            handler = ROUTES.get(url.path.rstrip("/") or "/")
+            if handler is None:
+                self._send(404, {"error": f"Unknown endpoint {url.path}", "endpoints": sorted(ROUTES)})
+                return
+            ds.refresh()
+            try:
+                self._send(200, handler(ds, parse_qs(url.query), prices=prices))
+            except QueryError as e:
+                self._send(e.status, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, fmt, *args):
+            if not quiet:
+                super().log_message(fmt, *args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve rank/analyze/show-stats/screen queries from memory.")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=8765, help="Port (default 8765)")
+    parser.add_argument("--reload-interval", type=float, default=2.0,
+                        help="Min seconds between checks for changed files (default 2)")
+    parser.add_argument("--price-ttl", type=float, default=900,
+                        help="Seconds to reuse fetched current prices in /screen (default 900)")
+    parser.add_argument("--prices", type=Path, metavar="DIR",
+                        help="Read current prices from DIR/<TICKER>.csv|.parquet instead of Yahoo")
+    # prices are one bulk provider.latest call now; kept so old invocations still parse
+    parser.add_argument("--workers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--quiet", "-q", action="store_true", help="Don't log each request")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    ds = Dataset(reload_interval=args.reload_interval)
+    ds.refresh(force=True)
+    prices = PriceCache(ttl=args.price_ttl, provider=get_provider(args.prices))
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(ds, prices, args.quiet))
+
+    print(f"\n  {BOLD}{CYAN}QUERY SERVER{RESET}  http://{args.host}:{args.port}")
+    print(f"  {DIM}Loaded {len(ds.stats)} stats · {len(ds.data)} data files in {time.time() - t0:.1f}s{RESET}")
+    print(f"  {DIM}Endpoints: {'  '.join(sorted(ROUTES))}{RESET}\n")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n  {GREEN}Stopped{RESET}\n")
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
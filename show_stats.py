@@ -7,7 +7,10 @@ from pathlib import Path
 
 import pandas as pd
 
-from trade_stats import split_by_sells
+import export
+from activity import is_buy
+from price_summary import add_scenario_prices, is_custom, mode_arg, mode_columns, scenario_path, scenario_stats
+from trade_stats import episode_table
 
 DATA_DIR  = Path(__file__).parent / "data"
 STATS_DIR = Path(__file__).parent / "stats"
@@ -42,66 +45,79 @@ def _compute_cost_per_share(investor: str, mode: str) -> dict[str, float]:
     data_path = DATA_DIR / f"{investor}.csv"
     if not data_path.exists():
         return {}
-
-    price_col_map = {"best": "price_p10", "worst": "price_p90", "avg": "price_p50"}
-    price_col = price_col_map[mode]
-
     raw = pd.read_csv(data_path)
-    result = {}
-
-    for ticker in raw.stock.unique():
-        stock_hist = raw[raw.stock == ticker]
-        splits = split_by_sells(stock_hist)
-
-        for idx, split in enumerate(splits):
-            buys = split[split["activity"].str.startswith(("Add", "Buy"))]
-            if buys.empty or buys.iloc[-1].activity != "Buy":
-                continue
+    if is_custom(mode):
+        raw = add_scenario_prices(raw, mode)
+    return cost_per_share(raw, mode)
 
-            total_shares = buys.shares.sum()
-            total_cost = (buys.shares * buys[price_col]).sum()
-            avg_price = total_cost / total_shares if total_shares > 0 else float("nan")
 
-            use_ticker = ticker + str(idx + 1) if len(splits) > 1 else ticker
-            result[use_ticker] = avg_price
+def cost_per_share(raw: pd.DataFrame, mode: str) -> dict[str, float]:
+    """Weighted avg cost per share for each trade label of an enriched data frame."""
+    price_col = mode_columns(mode)[0]
+    rows, episodes = episode_table(raw)
+    buys = rows[is_buy(rows["action"].to_numpy())]
+    shares = buys["shares"].groupby(buys["episode"]).sum()
+    cost = (buys["shares"] * buys[price_col]).groupby(buys["episode"]).sum()
+    avg = (cost / shares).where(shares > 0)
+    return dict(zip(episodes["label"].to_numpy()[avg.index], avg.to_numpy()))
 
-    return result
 
-
-def show_stats(investor: str, sort_by: str, ascending: bool, mode: str):
-    path = STATS_DIR / f"{investor}.csv"
-    if not path.exists():
+def sort_stats(df: pd.DataFrame, sort_by: str, ascending: bool, mode: str) -> pd.DataFrame:
+    irr_col = f"irr_{mode}"
+    if sort_by == "irr":
+        return df.sort_values(irr_col, ascending=ascending)
+    if sort_by == "cost":
+        return df.sort_values("cost_per_share", ascending=ascending)
+    if sort_by == "ret":
+        return df.sort_values(f"ret_{mode}", ascending=ascending)
+    if sort_by == "holding":
+        return df.sort_values("holding_period", ascending=ascending)
+    return df.sort_values(irr_col, ascending=False)
+
+
+def stats_path(investor: str, mode: str) -> Path:
+    """The stats file behind *mode*: stats/, or the scenario cache for custom modes."""
+    if is_custom(mode) and (DATA_DIR / f"{investor}.csv").exists():
+        return scenario_path(investor, mode)
+    return STATS_DIR / f"{investor}.csv"
+
+
+def load_stats_table(investor: str, sort_by: str, ascending: bool, mode: str) -> tuple[pd.DataFrame | None, Path]:
+    """(trades with cost_per_share, sorted; source file). None, with a message, if unusable."""
+    path = stats_path(investor, mode)
+    if is_custom(mode) and (DATA_DIR / f"{investor}.csv").exists():
+        df = scenario_stats(investor, mode)
+    elif path.exists():
+        df = pd.read_csv(path)
+    else:
         print(f"\n  {RED}Stats file not found:{RESET} {path}")
         print(f"  Run {BOLD}python compute_all_stats.py{RESET} first, or check the name with --list\n")
-        return
+        return None, path
 
-    df = pd.read_csv(path)
     if df.empty:
-        print(f"\n  {DIM}No stats for {investor}.{RESET}\n")
-        return
-
-    irr_col = f"irr_{mode}"
-    cost_col = f"cost_{mode}"
-    ret_col = f"ret_{mode}"
+        if is_custom(mode):
+            print(f"\n  {DIM}No trades of {investor} could be priced under {mode}: prices/ has no summaries for them.{RESET}")
+            print(f"  Run {BOLD}python price_summary.py --backfill{RESET} first\n")
+        else:
+            print(f"\n  {DIM}No stats for {investor}.{RESET}\n")
+        return None, path
 
-    for col in [irr_col, cost_col, ret_col]:
+    for col in [f"irr_{mode}", f"cost_{mode}", f"ret_{mode}"]:
         if col not in df.columns:
-            print(f"\n  {RED}Column '{col}' not found. Available modes: avg, best, worst{RESET}\n")
-            return
+            print(f"\n  {RED}Column '{col}' not found. Modes: avg, best, worst or BUY/SELL like p25/p75{RESET}\n")
+            return None, path
 
     cps_map = _compute_cost_per_share(investor, mode)
     df["cost_per_share"] = df["ticker"].map(cps_map)
+    return sort_stats(df, sort_by, ascending, mode), path
 
-    if sort_by == "irr":
-        df = df.sort_values(irr_col, ascending=ascending)
-    elif sort_by == "cost":
-        df = df.sort_values("cost_per_share", ascending=ascending)
-    elif sort_by == "ret":
-        df = df.sort_values(ret_col, ascending=ascending)
-    elif sort_by == "holding":
-        df = df.sort_values("holding_period", ascending=ascending)
-    else:
-        df = df.sort_values(irr_col, ascending=False)
+
+def show_stats(investor: str, sort_by: str, ascending: bool, mode: str):
+    df, path = load_stats_table(investor, sort_by, ascending, mode)
+    if df is None:
+        return
+    irr_col = f"irr_{mode}"
+    ret_col = f"ret_{mode}"
 
     n_trades = len(df)
     n_holding = df["holding"].sum() if "holding" in df.columns else 0
@@ -179,21 +195,38 @@ def list_investors():
 def main():
     parser = argparse.ArgumentParser(description="Display an investor's stats file.")
     parser.add_argument("investor", nargs="?", help="Investor name (e.g. 'Warren Buffett')")
-    parser.add_argument("--mode", default="avg", choices=["avg", "best", "worst"],
-                        help="Which price scenario to display (default: avg)")
+    parser.add_argument("--mode", default="avg", type=mode_arg, metavar="MODE",
+                        help="Which price scenario to display (default: avg); BUY/SELL "
+                             "like p25/p75 is recomputed from prices/")
     parser.add_argument("--sort", default="irr", choices=["irr", "cost", "ret", "holding"],
                         help="Sort trades by this column (default: irr)")
     parser.add_argument("--asc", action="store_true", help="Sort ascending (default: descending)")
     parser.add_argument("--list", "-l", action="store_true", help="List available investors")
+    parser.add_argument("--all", action="store_true", help="Every investor in stats/ (with --output)")
+    export.add_arguments(parser)
     args = parser.parse_args()
+    fmt = export.resolve(parser, args)
 
     if args.list:
         list_investors()
         return
 
-    if not args.investor:
+    if args.all and not fmt:
+        parser.error("--all needs --output (one table with every investor's trades)")
+    if not args.investor and not args.all:
         parser.error("investor name is required (or use --list)")
 
+    if fmt:
+        names = [p.stem for p in sorted(STATS_DIR.glob("*.csv"))] if args.all else [args.investor]
+        tables = {name: load_stats_table(name, args.sort, args.asc, args.mode)[0] for name in names}
+        tables = {name: df for name, df in tables.items() if df is not None}
+        if not tables:
+            return
+        table = pd.concat(tables, names=["investor"]).reset_index(0)
+        n = export.write(table, args.output, fmt)
+        print(f"  {DIM}Wrote {n} trades of {len(tables)} investors to {args.output}{RESET}\n")
+        return
+
     show_stats(args.investor, sort_by=args.sort, ascending=args.asc, mode=args.mode)
 
 
@@ -0,0 +1,182 @@
+"""
+Generate a synthetic data/ directory for scalability testing.
+
+Writes one CSV per fake investor in exactly the schema fetch_all_data.py
+produces (quarter, stock, activity, action, action_pct, shares,
+pct_change, price_p10, price_p90, price_p50; newest quarter first).
+Positions go through Buy → Add/Reduce → Sell 100.00% cycles, some are
+re-bought later and some are still open at the last quarter. Output is
+fully determined by --seed, independent of --workers.
+
+    python synth_data.py --investors 800 --out synthetic/data          # ~10x today
+    python synth_data.py --investors 8000 --tickers 20000 --workers 8  # ~100x
+    python bench.py --data-dir synthetic/data
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from activity import add_actions
+
+BOLD  = "\033[1m"
+DIM   = "\033[2m"
+GREEN = "\033[32m"
+CYAN  = "\033[36m"
+RESET = "\033[0m"
+
+COLUMNS = ["quarter", "stock", "activity", "shares", "pct_change", "price_p10", "price_p90", "price_p50"]
+
+
+def _symbol(i: int) -> str:
+    letters = ""
+    for _ in range(3):
+        i, r = divmod(i, 26)
+        letters = chr(ord("A") + r) + letters
+    return "X" + letters if i == 0 else f"X{letters}{i}"
+
+
+def quarter_labels(n_quarters: int, end: str | None = None) -> list[str]:
+    """Oldest-first 'Q1 2020' labels ending at *end* (default: last full quarter)."""
+    if end:
+        q, year = end.split()
+        last = pd.Period(f"{year}{q}", freq="Q")
+    else:
+        last = pd.Period(pd.Timestamp.now(), freq="Q") - 1
+    periods = pd.period_range(end=last, periods=n_quarters, freq="Q")
+    return [f"Q{p.quarter} {p.year}" for p in periods]
+
+
+@lru_cache(maxsize=1)
+def ticker_universe(seed: int, n_tickers: int, n_quarters: int):
+    """Symbols, popularity weights and [ticker, quarter] p10/p50/p90 price grids."""
+    rng = np.random.default_rng([seed, 0])
+    symbols = np.array([_symbol(i) for i in range(n_tickers)])
+    popularity = 1.0 / np.arange(1, n_tickers + 1) ** 0.8  # a few crowded names, a long tail
+    popularity = rng.permutation(popularity / popularity.sum())
+    vol = rng.uniform(0.05, 0.25, size=(n_tickers, 1))
+    drift = rng.normal(0.02, 0.02, size=(n_tickers, 1))
+    log_ret = drift + vol * rng.standard_normal((n_tickers, n_quarters))
+    p50 = rng.lognormal(3.5, 1.0, size=(n_tickers, 1)) * np.exp(np.cumsum(log_ret, axis=1))
+    width = np.clip(vol * rng.uniform(0.4, 1.0, size=(n_tickers, n_quarters)), 0.01, 0.6)
+    p10 = p50 * (1 - width * 0.5)
+    p90 = p50 * (1 + width)
+    return symbols, popularity, p10, p50, p90
+
+
+def generate_investor(index: int, seed: int, n_tickers: int, quarters: list[str],
+                      positions: int) -> pd.DataFrame:
+    symbols, popularity, p10, p50, p90 = ticker_universe(seed, n_tickers, len(quarters))
+    rng = np.random.default_rng([seed, 1, index])
+    n_q = len(quarters)
+    n_pos = min(max(1, rng.poisson(positions)), n_tickers)
+    tickers = rng.choice(n_tickers, size=n_pos, replace=False, p=popularity)
+    portfolio_value = rng.lognormal(20.5, 1.2)  # dollars
+    style_turnover = rng.uniform(0.2, 0.8)      # chance of an add/reduce in a held quarter
+
+    q_idx, tk_idx, activity, shares, pct = [], [], [], [], []
+
+    def emit(q, tk, act, n_shares):
+        q_idx.append(q)
+        tk_idx.append(tk)
+        activity.append(act)
+        shares.append(n_shares)
+        pct.append(round(n_shares * p50[tk, q] / portfolio_value * 100, 2))
+
+    for tk in tickers:
+        t = int(rng.integers(0, n_q))
+        while t < n_q:
+            hold = int(rng.geometric(1 / 10))
+            target = portfolio_value / n_pos * rng.uniform(0.3, 2.0)
+            held = max(1, int(target / p50[tk, t]))
+            emit(t, tk, "Buy", held)
+            end = t + hold
+            for q in range(t + 1, min(end, n_q)):
+                if rng.random() >= style_turnover:
+                    continue
+                if rng.random() < 0.5:
+                    frac = rng.uniform(0.01, 1.5)
+                    delta = max(1, int(held * frac))
+                    emit(q, tk, f"Add {delta / held * 100:.2f}%", delta)
+                    held += delta
+                else:
+                    frac = rng.uniform(0.01, 0.9)
+                    delta = int(held * frac)
+                    if delta < 1 or delta >= held:
+                        continue
+                    emit(q, tk, f"Reduce {delta / held * 100:.2f}%", delta)
+                    held -= delta
+            if end >= n_q:
+                break  # still open at the last quarter
+            emit(end, tk, "Sell 100.00%", held)
+            if rng.random() < 0.7:
+                break  # most names are never re-bought
+            t = end + int(rng.geometric(1 / 6))
+
+    q_idx = np.asarray(q_idx, dtype=np.int64)
+    tk_idx = np.asarray(tk_idx, dtype=np.int64)
+    df = pd.DataFrame({
+        "quarter": np.asarray(quarters, dtype=object)[q_idx],
+        "stock": symbols[tk_idx],
+        "activity": activity,
+        "shares": np.asarray(shares, dtype=np.int64),
+        "pct_change": pct,
+        "price_p10": p10[tk_idx, q_idx],
+        "price_p90": p90[tk_idx, q_idx],
+        "price_p50": p50[tk_idx, q_idx],
+    }, columns=COLUMNS)
+    order = np.lexsort((np.arange(len(df)), -q_idx))  # newest quarter first, stable within
+    return add_actions(df.iloc[order].reset_index(drop=True))
+
+
+def _write_one(args) -> int:
+    index, seed, n_tickers, quarters, positions, out = args
+    df = generate_investor(index, seed, n_tickers, quarters, positions)
+    df.to_csv(Path(out) / f"Synthetic Investor {index + 1:05d}.csv", index=False)
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic investor data in the data/ schema.")
+    parser.add_argument("--investors", "-n", type=int, default=810, help="Number of investors (default 810 ≈ 10x)")
+    parser.add_argument("--tickers", type=int, default=5000, help="Size of the ticker universe (default 5000)")
+    parser.add_argument("--quarters", type=int, default=100, help="History length in quarters (default 100)")
+    parser.add_argument("--end", default=None, metavar="'Q4 2025'", help="Last quarter (default: last full quarter)")
+    parser.add_argument("--positions", type=int, default=75,
+                        help="Mean distinct tickers per investor (default 75)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default 42)")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Parallel processes (default 1)")
+    parser.add_argument("--out", type=Path, default=Path("synthetic") / "data", help="Output directory")
+    args = parser.parse_args()
+
+    quarters = quarter_labels(args.quarters, args.end)
+    args.out.mkdir(parents=True, exist_ok=True)
+    print(f"\n  {BOLD}{CYAN}SYNTHETIC DATA{RESET}  {args.investors} investors · {args.tickers} tickers · "
+          f"{quarters[0]} → {quarters[-1]}  (seed {args.seed})")
+    print(f"  {DIM}Output: {args.out}/{RESET}\n")
+
+    t0 = time.time()
+    jobs = [(i, args.seed, args.tickers, quarters, args.positions, str(args.out)) for i in range(args.investors)]
+    total_rows = 0
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for done, rows in enumerate(pool.map(_write_one, jobs, chunksize=16), 1):
+                total_rows += rows
+                if done % 100 == 0 or done == len(jobs):
+                    print(f"  {DIM}{done}/{len(jobs)} investors · {total_rows:,} rows{RESET}", end="\r")
+    else:
+        for done, job in enumerate(jobs, 1):
+            total_rows += _write_one(job)
+            if done % 100 == 0 or done == len(jobs):
+                print(f"  {DIM}{done}/{len(jobs)} investors · {total_rows:,} rows{RESET}", end="\r")
+
+    print(f"\n\n  {GREEN}Done in {time.time() - t0:.0f}s{RESET}  {total_rows:,} activity rows\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Dataroma symbol -> canonical (Yahoo) price symbol.
+
+normalize_ticker is the one place ticker spelling is decided: ingest
+stores its result in data/, and every Yahoo lookup passes through it
+again, so files written before a new alias still resolve.
+"""
+
+from functools import lru_cache
+
+import pandas as pd
+
+# Renamed symbols whose price history Yahoo keeps under the new one.
+# Keys and values are in normalized form (upper case, "-" for share classes).
+# Acquired companies are not aliases: their history is not the acquirer's.
+ALIASES = {
+    "ABC": "COR",       # AmerisourceBergen -> Cencora (2023)
+    "ANTM": "ELV",      # Anthem -> Elevance Health (2022)
+    "BBT": "TFC",       # BB&T -> Truist (2019)
+    "BLL": "BALL",      # Ball Corp (2022)
+    "COG": "CTRA",      # Cabot Oil & Gas -> Coterra (2021)
+    "CTL": "LUMN",      # CenturyLink -> Lumen (2020)
+    "FB": "META",       # Facebook -> Meta Platforms (2022)
+    "FLT": "CPAY",      # FleetCor -> Corpay (2024)
+    "GPS": "GAP",       # Gap Inc (2024)
+    "HRS": "LHX",       # Harris -> L3Harris (2019)
+    "KFT": "MDLZ",      # Kraft Foods -> Mondelez (2012)
+    "LB": "BBWI",       # L Brands -> Bath & Body Works (2021)
+    "NLOK": "GEN",      # NortonLifeLock -> Gen Digital (2022)
+    "PCLN": "BKNG",     # Priceline -> Booking Holdings (2018)
+    "PKI": "RVTY",      # PerkinElmer -> Revvity (2023)
+    "RDS-A": "SHEL",    # Royal Dutch Shell -> Shell (2022)
+    "SQ": "XYZ",        # Square -> Block (2025)
+    "SYMC": "GEN",      # Symantec -> NortonLifeLock -> Gen Digital
+    "TOT": "TTE",       # Total -> TotalEnergies (2021)
+    "UTX": "RTX",       # United Technologies -> RTX (2020)
+    "WLP": "ELV",       # WellPoint -> Anthem -> Elevance Health
+}
+
+
+@lru_cache(maxsize=None)
+def normalize_ticker(symbol: str) -> str:
+    """Canonical price symbol for a Dataroma (or user-typed) ticker.
+
+    Upper case, share-class separators "." and "/" become "-" as Yahoo
+    writes them (BRK.B -> BRK-B), then ALIASES maps renamed symbols.
+    """
+    s = symbol.strip().upper().replace(".", "-").replace("/", "-")
+    return ALIASES.get(s, s)
+
+
+def normalize_tickers(symbols: pd.Series) -> pd.Series:
+    """normalize_ticker over a Series, once per distinct symbol."""
+    return symbols.map({s: normalize_ticker(s) for s in symbols.unique()})
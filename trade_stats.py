@@ -3,53 +3,112 @@ import numpy as np
 import warnings
 from datetime import datetime
 
+from activity import Action, ensure_actions, is_buy, is_close
 from metrics import compute_xirr, quarter_to_date, quarter_diff_years
+from profiling import span
 from yahoo import fetch_current_price
 
 warnings.filterwarnings("ignore")
 
 
-def split_by_sells(df, activity_col="activity"):
-    split_dfs = []
-    current_chunk = []
-    for _, row in df.iloc[::-1].iterrows():
-        current_chunk.append(row)
-        if row[activity_col].startswith("Sell 100.00%"):
-            chunk_df = pd.DataFrame(current_chunk)
-            split_dfs.append(chunk_df.iloc[::-1].reset_index(drop=True))
-            current_chunk = []
-    if current_chunk:
-        chunk_df = pd.DataFrame(current_chunk)
-        split_dfs.append(chunk_df.iloc[::-1].reset_index(drop=True))
-    return split_dfs
+def split_by_sells(df):
+    """Split one ticker's rows (newest first) at each full sell-out.
+
+    Returns the episodes oldest first, each newest row first, as compute_stats
+    walks them.
+    """
+    df = ensure_actions(df)
+    closes = is_close(df["action"].to_numpy())[::-1]
+    ends = np.flatnonzero(closes) + 1
+    if not len(ends) or ends[-1] != len(df):
+        ends = np.append(ends, len(df))
+    oldest_first = df.iloc[::-1]
+    starts = np.concatenate([[0], ends[:-1]])
+    return [oldest_first.iloc[a:b].iloc[::-1].reset_index(drop=True) for a, b in zip(starts, ends)]
+
+
+def _quarter_index(quarters: pd.Series) -> np.ndarray:
+    parts = quarters.str.extract(r"Q([1-4])\s*(\d{4})").astype(int)
+    return (parts[1] * 4 + parts[0]).to_numpy()
+
+
+def episode_table(df):
+    """Vectorized form of the episode split compute_stats does per ticker.
+
+    Returns ``(rows, episodes)``. *rows* are the activity rows of every
+    episode compute_stats keeps (one that starts with a Buy), oldest first
+    and grouped by episode, with an ``episode`` column indexing *episodes*.
+    *episodes* has one row per episode: ticker, label (ticker, numbered
+    when the ticker was sold out and rebought), period (first quarter),
+    holding_period in years, holding and shares (still held).
+    """
+    d = ensure_actions(df).iloc[::-1].reset_index(drop=True)
+    closes = pd.Series(is_close(d["action"]))
+    by_stock = closes.groupby(d["stock"])
+    split = (by_stock.cumsum() - closes).astype(int)
+    n_splits = split.groupby(d["stock"]).transform("max") + 1
+    buy = pd.Series(is_buy(d["action"]))
+    key = d["stock"] + "\0" + split.astype(str)
+
+    first_buy = d["action"].where(buy).groupby(key).transform("first")
+    keep = (first_buy == Action.BUY).to_numpy()
+    d = d[keep].assign(
+        _key=key[keep],
+        _split=split[keep],
+        _n_splits=n_splits[keep],
+        _buy=buy[keep],
+        _qidx=_quarter_index(d.loc[keep, "quarter"]),
+    )
+    d["_signed"] = np.where(d["_buy"], d["shares"], -d["shares"])
+
+    g = d.groupby("_key", sort=False)
+    episodes = g.agg(
+        ticker=("stock", "first"),
+        split=("_split", "first"),
+        n_splits=("_n_splits", "first"),
+        period=("quarter", "first"),
+        first_q=("_qidx", "first"),
+        shares=("_signed", "sum"),
+    )
+    last_sell_q = d["_qidx"].where(~d["_buy"]).groupby(d["_key"], sort=False).max()
+    now = pd.Period(pd.Timestamp.now(), freq="Q")
+    holding = episodes["shares"] > 0
+    end_q = np.where(holding, now.year * 4 + now.quarter, last_sell_q.reindex(episodes.index))
+    episodes["holding_period"] = np.abs(end_q - episodes["first_q"]) / 4.0
+    episodes["holding"] = holding
+    episodes["label"] = np.where(
+        episodes["n_splits"] > 1,
+        episodes["ticker"] + (episodes["split"] + 1).astype(str),
+        episodes["ticker"],
+    )
+    episodes = episodes.reset_index(drop=True)[
+        ["ticker", "label", "period", "holding_period", "holding", "shares"]
+    ]
+
+    rows = d.assign(episode=g.ngroup().to_numpy())
+    rows = rows.drop(columns=[c for c in rows.columns if c.startswith("_")])
+    return rows.sort_values("episode", kind="stable").reset_index(drop=True), episodes
+
+
+# Scenario name -> (price column buys are costed at, price column sells exit at).
+MODES = {
+    "best": ("price_p10", "price_p90"),
+    "worst": ("price_p90", "price_p10"),
+    "avg": ("price_p50", "price_p50"),
+}
 
 
 def ticker_stats_to_df(ticker_stats):
     rows = []
-    for ticker, stats_list in ticker_stats.items():
-        irr_best, cost_best, ret_best = stats_list[0]
-        irr_worst, cost_worst, ret_worst = stats_list[1]
-        irr_avg, cost_avg, ret_avg = stats_list[2]
-        holding_period = stats_list[-3]
-        holding = stats_list[-2]
-        period = stats_list[-1]
-        rows.append(
-            {
-                "period": period,
-                "ticker": ticker,
-                "irr_best": irr_best,
-                "cost_best": cost_best,
-                "ret_best": ret_best,
-                "irr_worst": irr_worst,
-                "cost_worst": cost_worst,
-                "ret_worst": ret_worst,
-                "irr_avg": irr_avg,
-                "cost_avg": cost_avg,
-                "ret_avg": ret_avg,
-                "holding_period": holding_period,
-                "holding": holding,
-            }
-        )
+    for ticker, entry in ticker_stats.items():
+        row = {"period": entry["period"], "ticker": ticker}
+        for label, (irr, cost, ret) in entry["results"].items():
+            row[f"irr_{label}"] = irr
+            row[f"cost_{label}"] = cost
+            row[f"ret_{label}"] = ret
+        row["holding_period"] = entry["holding_period"]
+        row["holding"] = entry["holding"]
+        rows.append(row)
     return pd.DataFrame(rows)
 
 
@@ -66,7 +125,20 @@ def _build_cash_flows(buys, sells, ccol, ecol, shares_holding, unrealized_price,
     return flows
 
 
-def compute_stats(df):
+def compute_stats(df, price_fn=None, modes=None):
+    """Per-trade stats for one investor's enriched activity.
+
+    *price_fn* maps a ticker to its current price (or None) for positions
+    still held; defaults to a live Yahoo lookup. *modes* maps a scenario
+    name to the (buy, sell) price columns of *df* to use, giving
+    irr_/cost_/ret_<name> columns; defaults to MODES (best/worst/avg).
+    """
+    if price_fn is None:
+        price_fn = fetch_current_price
+    df = ensure_actions(df)
+    if modes is None:
+        modes = MODES
+    price_cols = list(dict.fromkeys(col for pair in modes.values() for col in pair))
     ticker_stats = {}
     now = datetime.now()
 
@@ -75,20 +147,18 @@ def compute_stats(df):
         stock_splits = split_by_sells(stock_hist)
 
         for idx, split in enumerate(stock_splits):
-            buys = split[split["activity"].str.startswith(("Add", "Buy"))]
-            sells = split[~split["activity"].str.startswith(("Add", "Buy"))]
-            if buys.empty or buys.iloc[-1].activity != "Buy":
+            buy = is_buy(split["action"])
+            buys = split[buy]
+            sells = split[~buy]
+            if buys.empty or buys["action"].iloc[-1] != Action.BUY:
                 continue
 
             buys = buys.copy()
             sells = sells.copy()
 
-            for q in [10, 50, 90]:
-                buys[f"cost_p{q}"] = buys.shares * buys[f"price_p{q}"] / 1e6
-                sells[f"exit_p{q}"] = sells.shares * sells[f"price_p{q}"] / 1e6
-
-            cost_cols = {q: f"cost_p{q}" for q in [10, 90, 50]}
-            exit_cols = {q: f"exit_p{q}" for q in [10, 90, 50]}
+            for col in price_cols:
+                buys[f"cost_{col}"] = buys.shares * buys[col] / 1e6
+                sells[f"exit_{col}"] = sells.shares * sells[col] / 1e6
 
             min_q = split.iloc[-1].quarter
             shares_still_holding = buys.shares.sum() - sells.shares.sum()
@@ -96,7 +166,8 @@ def compute_stats(df):
             holding = False
 
             if shares_still_holding > 0:
-                unrealized_price = fetch_current_price(ticker)
+                with span("compute.current_price", ticker):
+                    unrealized_price = price_fn(ticker)
                 current_q = pd.Period(pd.Timestamp.now(), freq="Q")
                 max_q = f"Q{current_q.quarter} {current_q.year}"
                 holding = True
@@ -105,13 +176,11 @@ def compute_stats(df):
 
             holding_period = quarter_diff_years(min_q, max_q)
 
-            # best (q=10 cost, q=90 exit), worst (q=90 cost, q=10 exit), avg (q=50, q=50)
-            mode_map = {"best": (10, 90), "worst": (90, 10), "avg": (50, 50)}
             results = {}
 
-            for label, (cq, eq) in mode_map.items():
-                ccol = cost_cols[cq]
-                ecol = exit_cols[eq]
+            for label, (cost_price, exit_price) in modes.items():
+                ccol = f"cost_{cost_price}"
+                ecol = f"exit_{exit_price}"
                 cost = buys[ccol].sum()
 
                 flows = _build_cash_flows(
@@ -119,7 +188,8 @@ def compute_stats(df):
                     shares_still_holding, unrealized_price, now,
                 )
 
-                irr = compute_xirr(flows) if len(flows) >= 2 else 0.0
+                with span("compute.xirr", ticker):
+                    irr = compute_xirr(flows) if len(flows) >= 2 else 0.0
 
                 total_inflows = sum(a for _, a in flows if a > 0)
                 ret = (total_inflows / cost - 1) if cost > 0 else 0.0
@@ -127,14 +197,12 @@ def compute_stats(df):
                 results[label] = (irr, cost, ret)
 
             use_ticker = ticker + str(idx + 1) if len(stock_splits) > 1 else ticker
-            ticker_stats[use_ticker] = [
-                list(results["best"]),
-                list(results["worst"]),
-                list(results["avg"]),
-                holding_period,
-                holding,
-                min_q,
-            ]
+            ticker_stats[use_ticker] = {
+                "results": results,
+                "holding_period": holding_period,
+                "holding": holding,
+                "period": min_q,
+            }
 
     stats = ticker_stats_to_df(ticker_stats)
     stats.replace([np.inf, -np.inf], np.nan, inplace=True)
@@ -0,0 +1,134 @@
+"""
+Every investor's trades in one set of contiguous, typed arrays.
+
+stats/ files are per investor and read back as float64 and string
+columns. The store concatenates them once into one array per column,
+sized to what the column holds:
+
+    ticker, period, other text   category codes (int16, or int32 past 32k
+                                 labels) and one label array per column
+    holding                      bool (text in the CSV)
+    holding_period               float32, whole quarters, exact
+    irr_/cost_/ret_* and other   float64: metrics sum and compound them, and
+    numbers                      rankings must not move with float32 rounding
+
+Investor i owns rows offsets[i]:offsets[i + 1] (CSR layout). view() gives
+those rows as numpy slices and frame() as a DataFrame over the same
+memory; neither copies. items() yields (name, frame) pairs like the
+dict of frames it replaces, so code that loops over investors takes
+either.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STATS_DIR = Path(__file__).parent / "stats"
+
+BOOL_COLUMNS = {"holding"}
+FLOAT32_COLUMNS = {"holding_period"}
+
+
+def _as_bool(s: pd.Series) -> np.ndarray:
+    if s.dtype == bool:
+        return s.to_numpy()
+    return s.map(lambda v: str(v).strip().lower() in ("true", "1")).to_numpy(bool)
+
+
+class TradeStore:
+    def __init__(self, names: list[str], offsets: np.ndarray, columns: dict[str, np.ndarray],
+                 categories: dict[str, pd.CategoricalDtype], present: dict[str, np.ndarray]):
+        self.names = list(names)
+        self.offsets = offsets
+        self.columns = columns
+        self.categories = categories
+        # per column, which investors' files had it (older stats lack ret_*)
+        self.present = present
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_frames(cls, frames: dict[str, pd.DataFrame]) -> "TradeStore":
+        names = list(frames)
+        sizes = np.array([len(frames[n]) for n in names], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        df = (pd.concat(frames.values(), ignore_index=True) if names
+              else pd.DataFrame())
+        columns, categories = {}, {}
+        present = {col: np.array([col in frames[n].columns for n in names], dtype=bool) for col in df.columns}
+        for col in df.columns:
+            s = df[col]
+            if col in BOOL_COLUMNS or s.dtype == bool:
+                columns[col] = _as_bool(s)
+            elif col in FLOAT32_COLUMNS:
+                columns[col] = s.to_numpy(np.float32)
+            elif pd.api.types.is_numeric_dtype(s):
+                columns[col] = s.to_numpy(np.float64)
+            else:
+                codes, labels = pd.factorize(s, sort=True)
+                columns[col] = codes.astype(np.int16 if len(labels) < 2**15 else np.int32)
+                categories[col] = pd.CategoricalDtype(labels)
+        return cls(names, offsets, columns, categories, present)
+
+    @classmethod
+    def load(cls, stats_dir: Path = STATS_DIR, names: list[str] | None = None) -> "TradeStore":
+        """Every stats/ file (or *names*), read once."""
+        if names is None:
+            names = [p.stem for p in sorted(stats_dir.glob("*.csv"))]
+        return cls.from_frames({n: pd.read_csv(stats_dir / f"{n}.csv") for n in names})
+
+    # ── shape ───────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        labels = sum(t.categories.memory_usage(deep=True) for t in self.categories.values())
+        return sum(a.nbytes for a in self.columns.values()) + self.offsets.nbytes + labels
+
+    # ── per investor, zero-copy ─────────────────────────────────────────
+
+    def rows(self, name: str) -> slice:
+        i = self._index[name]
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def view(self, name: str) -> dict[str, np.ndarray]:
+        """*name*'s rows of each of its columns (codes for text columns); slices, not copies."""
+        rows, i = self.rows(name), self._index[name]
+        return {col: a[rows] for col, a in self.columns.items() if self.present[col][i]}
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """*name*'s trades as a DataFrame over the store's arrays; text columns are categoricals."""
+        return self._frame(self.view(name))
+
+    def items(self):
+        for name in self.names:
+            yield name, self.frame(name)
+
+    def _frame(self, arrays: dict[str, np.ndarray]) -> pd.DataFrame:
+        data = {}
+        for col, a in arrays.items():
+            dtype = self.categories.get(col)
+            data[col] = pd.Categorical.from_codes(a, dtype=dtype) if dtype is not None else a
+        return pd.DataFrame(data, copy=False)
+
+    # ── whole store ─────────────────────────────────────────────────────
+
+    def padded(self) -> tuple[np.ndarray, np.ndarray]:
+        """(idx, keep): one row per investor of trade indices, padded to the largest.
+
+        ``np.where(keep, a[idx], np.nan)`` turns any column into the
+        (investors, trades) input batch_metrics takes.
+        """
+        sizes = self.sizes
+        cols = np.arange(sizes.max(initial=0))[None, :]
+        keep = cols < sizes[:, None]
+        return np.where(keep, self.offsets[:-1, None] + cols, 0), keep
@@ -1,64 +1,205 @@
-import yfinance as yf
+import socket
+import sys
+import threading
+import time
+
 import pandas as pd
 
+from negative_cache import NegativeCache, is_transient, is_transient_message
+from profiling import span
+from tickers import normalize_ticker
+
 MAX_SANE_PRICE = 1_000_000
 
+# tickers Yahoo had nothing for; checked before every lookup below
+UNPRICEABLE = NegativeCache()
+
+YAHOO_HOST = ("query2.finance.yahoo.com", 443)
+REACHABLE_TTL = 60.0
+_reachable = {"at": float("-inf"), "ok": False}
+_reachable_lock = threading.Lock()
+
+
+def yahoo_reachable() -> bool:
+    """Whether Yahoo's API host accepts a connection; re-probed at most once a minute.
+
+    yfinance reports DNS and connection failures as "possibly delisted"
+    or "no timezone found", so those errors alone say nothing about the
+    ticker. Failures are only recorded in UNPRICEABLE while this is True.
+    """
+    with _reachable_lock:
+        now = time.monotonic()
+        if now - _reachable["at"] >= REACHABLE_TTL:
+            try:
+                socket.create_connection(YAHOO_HOST, timeout=3).close()
+                _reachable["ok"] = True
+            except OSError:
+                _reachable["ok"] = False
+            _reachable["at"] = now
+        return _reachable["ok"]
+
+
+def _record_failure(ticker, reason):
+    if yahoo_reachable():
+        UNPRICEABLE.record_failure(ticker, reason)
+
 
 def _sanitize_prices(prices):
     return prices[(prices > 0) & (prices <= MAX_SANE_PRICE)]
 
 
+QUANTILE_GRID = [i / 20 for i in range(21)]  # 0%, 5%, …, 100%
+GRID_COLUMNS = [f"price_p{i * 5}" for i in range(21)]
+SUMMARY_COLUMNS = GRID_COLUMNS + ["price_first", "price_last", "price_mean", "n_days"]
+
+
+def quarter_price_summary(prices, ticker, periods, ticker_col="stock"):
+    """Compact per-quarter distribution of one ticker's daily closes.
+
+    Columns: period, the QUANTILE_GRID as price_p0 … price_p100, the
+    quarter's first and last close, mean close, trading days (n_days), and
+    *ticker_col*. *periods* are the quarters to emit NaN rows for when no
+    usable price exists.
+    """
+    prices = _sanitize_prices(prices)
+    if prices.empty:
+        out = pd.DataFrame({"period": periods})
+        for col in SUMMARY_COLUMNS:
+            out[col] = 0 if col == "n_days" else float("nan")
+        out[ticker_col] = ticker
+        return out
+    by_quarter = prices.groupby(prices.index.to_period("Q"))
+    grid = by_quarter.quantile(QUANTILE_GRID).unstack()
+    grid.columns = GRID_COLUMNS
+    grid["price_first"] = by_quarter.first()
+    grid["price_last"] = by_quarter.last()
+    grid["price_mean"] = by_quarter.mean()
+    grid["n_days"] = by_quarter.size()
+    out = grid.rename_axis("period").reset_index()
+    out[ticker_col] = ticker
+    return out
+
+
+def quarter_price_stats(prices, ticker, periods, ticker_col="stock"):
+    """p10/p50/p90 of daily closes per calendar quarter for one ticker.
+
+    *periods* are the quarters to emit NaN rows for when no usable price exists.
+    """
+    summary = quarter_price_summary(prices, ticker, periods, ticker_col)
+    return summary[["period", "price_p10", "price_p90", "price_p50", ticker_col]]
+
+
+def download_close_history(ticker, start, end):
+    """Daily auto-adjusted closes for one ticker; empty if Yahoo has none.
+
+    Uses ``Ticker.history`` rather than ``yf.download`` because the latter
+    keeps module-global state and is unsafe to call from several threads.
+    Rate-limit errors propagate so a scheduler can back off and retry.
+    Tickers in the UNPRICEABLE cache are skipped without a request.
+    """
+    import yfinance as yf
+
+    from scheduler import rate_limit_delay
+
+    ticker = normalize_ticker(ticker)
+    if UNPRICEABLE.skip(ticker):
+        return pd.Series(dtype=float)
+    with span("yahoo.download", ticker):
+        try:
+            hist = yf.Ticker(ticker).history(
+                start=start, end=end, auto_adjust=True, raise_errors=True,
+            )
+        except Exception as e:
+            if rate_limit_delay(e) is not None:
+                raise
+            if not is_transient(e):
+                _record_failure(ticker, f"{type(e).__name__}: {e}")
+            return pd.Series(dtype=float)
+    prices = hist["Close"].dropna() if "Close" in hist else pd.Series(dtype=float)
+    if prices.empty:
+        _record_failure(ticker, "no price history")
+    else:
+        UNPRICEABLE.record_success(ticker)
+    if getattr(prices.index, "tz", None) is not None:
+        prices.index = prices.index.tz_localize(None)
+    return prices
+
+
+def ticker_quarter_stats(ticker, start, end, periods, ticker_col="stock", provider=None):
+    """Download one ticker and reduce it to its quarterly price summary.
+
+    Closes come from *provider* (see providers.py) when given, else Yahoo.
+    """
+    if provider is not None:
+        prices = provider.history([ticker], start, end)[ticker]
+    else:
+        prices = download_close_history(ticker, start, end)
+    with span("yahoo.quantiles", ticker):
+        return quarter_price_summary(prices, ticker, periods, ticker_col)
+
+
 def add_yahoo_quarter_price_stats_batch(
     df,
     ticker_col="stock",
     quarter_col="quarter",
+    submit=None,
+    checkpoint=None,
+    summary_dir=None,
+    provider=None,
 ):
+    """Add price_p10/p90/p50 for each row's ticker and quarter.
+
+    *submit(fn, *args)* returning a Future lets the caller run the per-ticker
+    downloads on its own executor; by default they run one after another.
+    With a *checkpoint*, tickers staged by an earlier attempt are reused and
+    each new ticker's stats are staged as soon as its download finishes.
+    With a *summary_dir*, each ticker's full quarterly summary (see
+    quarter_price_summary) is also merged into price_summary's store there.
+    A *provider* replaces the Yahoo download as the source of daily closes.
+    """
     df = df.copy()
     df["_period"] = pd.PeriodIndex(
         df[quarter_col].str.replace(r"(Q[1-4])\s*(\d{4})", r"\2\1", regex=True),
         freq="Q",
     )
-    stats = []
-    for ticker in df[ticker_col].unique():
-        start_date = df["_period"].min().start_time
-        end_date = df["_period"].max().end_time
-        prices = yf.download(
-            ticker,
-            start=start_date,
-            end=end_date,
-            progress=False,
-            auto_adjust=True,
-        )["Close"].dropna()
-        if isinstance(prices, pd.DataFrame):
-            prices = prices.iloc[:, 0]
-        prices = _sanitize_prices(prices)
-        if prices.empty:
-            q_stats = pd.DataFrame(
-                {
-                    "period": df["_period"].unique(),
-                    "price_p10": float("nan"),
-                    "price_p90": float("nan"),
-                    "price_p50": float("nan"),
-                    ticker_col: ticker,
-                }
-            )
-            stats.append(q_stats)
-            continue
-        q_prices = prices.to_frame("price").assign(period=lambda x: x.index.to_period("Q"))
-        q_stats = (
-            q_prices.groupby("period")["price"]
-            .agg(
-                price_p10=lambda x: x.quantile(0.10),
-                price_p90=lambda x: x.quantile(0.90),
-                price_p50=lambda x: x.quantile(0.50),
-            )
-            .reset_index()
-        )
-        q_stats[ticker_col] = ticker
-        stats.append(q_stats)
+    start_date = df["_period"].min().start_time
+    end_date = df["_period"].max().end_time
+    periods = df["_period"].unique()
+    tickers = df[ticker_col].unique()
+    staged = {}
+
+    def fetch(t, *args):
+        return ticker_quarter_stats(t, *args, provider=provider)
+
+    if checkpoint is not None:
+        # Only stats with at least one priced day are staged: an all-NaN
+        # result may be a network blip and must be fetched again on rerun.
+        for t in tickers:
+            cached = checkpoint.load_ticker(t)
+            if (cached is not None and set(SUMMARY_COLUMNS) <= set(cached.columns)
+                    and cached["n_days"].sum() > 0):
+                staged[t] = cached
+
+        def fetch(t, *args):
+            stats = ticker_quarter_stats(t, *args, provider=provider)
+            if stats["n_days"].sum() > 0:
+                checkpoint.save_ticker(t, stats)
+            return stats
+
+    todo = [t for t in tickers if t not in staged]
+    if submit is None:
+        stats = [fetch(t, start_date, end_date, periods, ticker_col) for t in todo]
+    else:
+        futures = [submit(fetch, t, start_date, end_date, periods, ticker_col) for t in todo]
+        stats = [f.result() for f in futures]
+    stats.extend(staged.values())
     stats_df = pd.concat(stats, ignore_index=True)
+    if summary_dir is not None:
+        import price_summary
+
+        price_summary.save_summaries(stats_df, summary_dir, ticker_col)
     df = df.merge(
-        stats_df,
+        stats_df[["period", "price_p10", "price_p90", "price_p50", ticker_col]],
         left_on=[ticker_col, "_period"],
         right_on=[ticker_col, "period"],
         how="left",
@@ -68,12 +209,61 @@ def add_yahoo_quarter_price_stats_batch(
 
 
 def fetch_current_price(ticker):
+    import yfinance as yf
+
+    new_ticker = normalize_ticker(ticker)
+    if UNPRICEABLE.skip(new_ticker):
+        return None
     try:
-        new_ticker = ticker.replace(".", "-")
-        stock_yf = yf.Ticker(new_ticker)
-        hist = stock_yf.history(period="5d")
-        if not hist.empty:
-            return hist["Close"].iloc[-1]
+        with span("yahoo.current_price", new_ticker):
+            hist = yf.Ticker(new_ticker).history(period="5d", raise_errors=True)
+    except Exception as e:
+        if not is_transient(e):
+            _record_failure(new_ticker, f"{type(e).__name__}: {e}")
         return None
-    except Exception:
+    if hist.empty:
+        _record_failure(new_ticker, "no recent price")
         return None
+    UNPRICEABLE.record_success(new_ticker)
+    return hist["Close"].iloc[-1]
+
+
+def fetch_current_prices(tickers, chunk_size=200):
+    """Latest close for many tickers in a few bulk requests.
+
+    One ``yf.download`` per *chunk_size* tickers instead of a history call
+    each; tickers Yahoo returns nothing for are left out of the result
+    and recorded in UNPRICEABLE, and tickers already there are not asked for.
+    Tickers whose download failed on the network are left out but not recorded.
+    """
+    import yfinance as yf
+
+    symbols = {}
+    for t in dict.fromkeys(tickers):
+        symbols.setdefault(normalize_ticker(t), []).append(t)
+    symbols = {s: ts for s, ts in symbols.items() if not UNPRICEABLE.skip(s)}
+    out = {}
+    batch = list(symbols)
+    for i in range(0, len(batch), chunk_size):
+        chunk = batch[i:i + chunk_size]
+        with span("yahoo.current_prices", f"{len(chunk)} tickers"):
+            try:
+                hist = yf.download(chunk, period="5d", auto_adjust=True, group_by="column",
+                                   progress=False, threads=False)
+            except Exception:
+                continue
+        if hist.empty or "Close" not in hist:
+            continue    # nothing came back at all: more likely the network than the tickers
+        close = hist["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(chunk[0])
+        last = close.ffill().iloc[-1].dropna()
+        # per ticker, filled by older yfinance; 1.x neither fills nor imports it
+        errors = getattr(sys.modules.get("yfinance.shared"), "_ERRORS", None) or {}
+        for s in chunk:
+            if s in last.index:
+                out.update(dict.fromkeys(symbols[s], float(last[s])))
+                UNPRICEABLE.record_success(s)
+            elif not is_transient_message(str(errors.get(s, ""))):
+                _record_failure(s, "no recent price")
+    return out